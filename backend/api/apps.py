@@ -5,3 +5,6 @@ class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
     verbose_name = "API Интерфейс"
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
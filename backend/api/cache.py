@@ -0,0 +1,195 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from .replicas import read_from_primary
+
+TAG_KEY_PREFIX = "response-cache:tag:"
+RESPONSE_KEY_PREFIX = "response-cache:"
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш ограниченного размера в памяти процесса."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ResponseCache:
+    """Двухуровневый кэш готовых ответов API.
+
+    Первый уровень — LRU в памяти процесса, второй — общий бэкенд Django
+    (RESPONSE_CACHE_ALIAS). Инвалидация по тегам: у каждого тега есть
+    версия в общем кэше, и она входит в ключ ответа, поэтому смена
+    версии делает недоступными все ответы с этим тегом во всех процессах.
+    Для этого бэкенд должен быть общим для процессов (проверка api.E002).
+    """
+
+    def __init__(self):
+        self._local = None
+
+    @property
+    def enabled(self):
+        return settings.RESPONSE_CACHE_ENABLED
+
+    @property
+    def shared(self):
+        return caches[settings.RESPONSE_CACHE_ALIAS]
+
+    @property
+    def local(self):
+        if self._local is None:
+            self._local = LRUCache(settings.RESPONSE_CACHE_LOCAL_SIZE)
+        return self._local
+
+    def get_tag_versions(self, tags):
+        """Версии тегов — время их последней инвалидации в наносекундах."""
+        keys = [f"{TAG_KEY_PREFIX}{tag}" for tag in tags]
+        versions = self.shared.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self.shared.add(key, time.time_ns(), None)
+                versions[key] = self.shared.get(key)
+        return [versions[key] for key in keys]
+
+    def make_key(self, request, tags):
+        """Ключ из адреса, отсортированных параметров, формата и версий тегов.
+
+        Схема и хост входят в ключ, потому что ответы содержат абсолютные
+        ссылки на изображения и страницы.
+        """
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        raw = "|".join(
+            (
+                request.scheme,
+                request.get_host(),
+                request.path,
+                urlencode(params),
+                request.accepted_renderer.format,
+                *map(str, self.get_tag_versions(tags)),
+            )
+        )
+        return RESPONSE_KEY_PREFIX + hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, response):
+        value = (
+            response.status_code,
+            response["Content-Type"],
+            response.content,
+        )
+        self.local.set(key, value)
+        self.shared.set(key, value, settings.RESPONSE_CACHE_TIMEOUT)
+
+    def invalidate(self, *tags):
+        """Меняет версии тегов после фиксации текущей транзакции.
+
+        Иначе параллельный запрос мог бы до фиксации закэшировать старые
+        данные уже под новой версией.
+        """
+        transaction.on_commit(
+            lambda: self.shared.set_many(
+                {f"{TAG_KEY_PREFIX}{tag}": time.time_ns() for tag in tags},
+                None,
+            )
+        )
+
+
+response_cache = ResponseCache()
+
+
+class AnonymousResponseCacheMixin:
+    """Кэширует ответы выбранных действий для анонимных пользователей.
+
+    cache_tags — теги, при инвалидации которых ответ устаревает,
+    cached_actions — действия вьюсета, ответы которых кэшируются.
+    При промахе ответ строится по данным primary: версия тегов меняется
+    сразу после фиксации изменения, и отстающая реплика положила бы в кэш
+    устаревший ответ под новой версией.
+    """
+
+    cache_tags = ()
+    cached_actions = ("list", "retrieve")
+
+    def _is_response_cacheable(self, request):
+        return (
+            response_cache.enabled
+            and self.action in self.cached_actions
+            and request.method == "GET"
+            and not request.user.is_authenticated
+        )
+
+    def _get_cached_response(self, handler, request, *args, **kwargs):
+        if not self._is_response_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        key = response_cache.make_key(request, self.cache_tags)
+        cached = response_cache.get(key)
+        if cached is not None:
+            status_code, content_type, content = cached
+            response = HttpResponse(
+                content, status=status_code, content_type=content_type
+            )
+            response["X-Cache"] = "HIT"
+            return response
+
+        with read_from_primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: response_cache.set(key, rendered)
+            )
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
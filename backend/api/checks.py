@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+
+@register()
+def check_database_connections(app_configs, **kwargs):
+    """Проверяет настройки пула и что процессам gunicorn хватит соединений.
+
+    Каждый поток запросов и обработки изображений держит своё соединение,
+    с пулом — не больше его max_size на процесс.
+    """
+    errors = []
+    for alias, database in settings.DATABASES.items():
+        pool = database.get("OPTIONS", {}).get("pool")
+        if pool and database.get("CONN_MAX_AGE", 0) != 0:
+            # Django отказывается открывать такое соединение.
+            errors.append(
+                Error(
+                    f"База {alias!r}: пул соединений несовместим с "
+                    "CONN_MAX_AGE, отличным от 0.",
+                    hint="Задайте CONN_MAX_AGE = 0 или выключите "
+                    "DB_POOL_ENABLED.",
+                    id="api.E003",
+                )
+            )
+    pool = settings.DATABASES["default"].get("OPTIONS", {}).get("pool")
+    if pool and not is_psycopg3:
+        errors.append(
+            Error(
+                "Пул соединений требует psycopg 3.",
+                hint="Установите psycopg[pool] или выключите DB_POOL_ENABLED.",
+                id="api.E001",
+            )
+        )
+    if isinstance(pool, dict) and "max_size" in pool:
+        per_process = pool["max_size"]
+    else:
+        per_process = (
+            settings.GUNICORN_THREADS + settings.IMAGE_PROCESSING_WORKERS
+        )
+    total = settings.WEB_CONCURRENCY * per_process
+    if total > settings.DB_MAX_CONNECTIONS:
+        errors.append(
+            Warning(
+                f"Процессы gunicorn могут открыть до {total} соединений, "
+                f"больше DB_MAX_CONNECTIONS = {settings.DB_MAX_CONNECTIONS}.",
+                hint="Уменьшите WEB_CONCURRENCY, GUNICORN_THREADS или "
+                "DB_POOL_MAX_SIZE.",
+                id="api.W001",
+            )
+        )
+    return errors
+
+
+@register()
+def check_response_cache(app_configs, **kwargs):
+    """Проверяет, что версии тегов кэша ответов общие для процессов.
+
+    В кэше в памяти процесса инвалидация из одного процесса gunicorn или
+    из команды manage.py не видна остальным, и они отдают устаревшие
+    ответы без ограничения по времени.
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return []
+    backend = settings.CACHES[settings.RESPONSE_CACHE_ALIAS]["BACKEND"]
+    if backend != "django.core.cache.backends.locmem.LocMemCache":
+        return []
+    return [
+        Error(
+            "Кэш ответов включён, но кэш "
+            f"{settings.RESPONSE_CACHE_ALIAS!r} хранится в памяти процесса.",
+            hint="Задайте REDIS_URL или выключите RESPONSE_CACHE_ENABLED.",
+            id="api.E002",
+        )
+    ]
@@ -0,0 +1,137 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    quote_etag,
+)
+from django.utils.http import http_date
+
+
+def get_table_version_key(model):
+    return f"table-version:{model._meta.label_lower}"
+
+
+def get_table_version(model):
+    """Версия таблицы, меняющаяся при добавлении и удалении строк."""
+    key = get_table_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_table_version(model):
+    """Меняет версию таблицы после фиксации транзакции."""
+    key = get_table_version_key(model)
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+class ConditionalGetMixin:
+    """Поддержка ETag и Last-Modified для действий list и retrieve.
+
+    Валидаторы вычисляются без сериализации: для объекта — по его
+    updated_at, для списка — по наибольшему updated_at (индекс) и версии
+    таблицы, которая меняется сигналами при добавлении и удалении строк.
+    Изменения связанных данных, влияющих на ответ, отмечаются обновлением
+    updated_at сигналами. Для авторизованного пользователя
+    к ним добавляется relations_updated_at, меняющийся при изменении
+    избранного, списка покупок и подписок. Если клиент прислал актуальный
+    If-None-Match или If-Modified-Since, возвращается 304 без выборки
+    и сериализации.
+    """
+
+    conditional_actions = ("list", "retrieve")
+
+    def _get_object_validators(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = (
+                self.queryset.model.objects.filter(
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+                )
+                .values_list("updated_at", flat=True)
+                .first()
+            )
+        except (TypeError, ValueError):
+            return None
+        if updated_at is None:
+            return None
+        return updated_at, (updated_at,)
+
+    def _get_list_validators(self):
+        model = self.queryset.model
+        last_modified = model.objects.aggregate(
+            last_modified=Max("updated_at")
+        )["last_modified"]
+        return last_modified, (last_modified, get_table_version(model))
+
+    def get_validators(self, request):
+        """Возвращает (ETag, Last-Modified) или None, если их нет."""
+        if self.action == "retrieve":
+            state = self._get_object_validators()
+        else:
+            state = self._get_list_validators()
+        if state is None:
+            return None
+
+        last_modified, parts = state
+        user = request.user
+        if user.is_authenticated:
+            relations_updated_at = user.relations_updated_at
+            parts += (user.pk, relations_updated_at)
+            if relations_updated_at and (
+                last_modified is None or relations_updated_at > last_modified
+            ):
+                last_modified = relations_updated_at
+
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        raw = repr((request.path, params, request.accepted_renderer.format))
+        raw += repr(parts)
+        etag = quote_etag(hashlib.sha256(raw.encode()).hexdigest())
+        return etag, last_modified
+
+    def _get_conditional_response(self, handler, request, *args, **kwargs):
+        if (
+            self.action not in self.conditional_actions
+            or request.method not in ("GET", "HEAD")
+        ):
+            return handler(request, *args, **kwargs)
+
+        validators = self.get_validators(request)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
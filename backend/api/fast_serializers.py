@@ -0,0 +1,212 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import BooleanField, Exists, OuterRef, Value
+
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import Subscription, User
+
+from .images import THUMBNAIL_VARIANT, image_srcset, image_url
+from .serializers import UserSerializer
+
+USER_MODEL_FIELDS = tuple(
+    field
+    for field in UserSerializer.Meta.fields
+    if field not in ("is_subscribed", "avatar")
+)
+USER_VALUES = (
+    *USER_MODEL_FIELDS,
+    "is_subscribed",
+    "avatar",
+    "avatar_variants",
+)
+RECIPE_VALUES = (
+    "id",
+    "is_favorited",
+    "is_in_shopping_cart",
+    "name",
+    "image",
+    "image_variants",
+    "text",
+    "cooking_time",
+    # Поля для курсора RecipePagination, в ответ не попадают.
+    "pub_date",
+    "favorites_count",
+)
+RECIPE_MINIFIED_VALUES = (
+    "id",
+    "name",
+    "image",
+    "image_variants",
+    "cooking_time",
+)
+
+
+class FastReadMixin:
+    """Быстрое чтение без полей DRF для действий из fast_read_actions.
+
+    Для действия list вызывается fast_list: его обязан определить
+    вьюсет, у которого list есть в fast_read_actions. Остальные
+    действия проверяют use_fast_read() сами. Ответ собирается из
+    словарей .values() функциями этого модуля и совпадает с ответом
+    обычных сериализаторов.
+    Чтобы отключить быстрый путь для вьюсета, задайте
+    fast_read_actions = (), для всего API —
+    FAST_READ_SERIALIZERS_ENABLED = False.
+    """
+
+    fast_read_actions = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "list" in cls.fast_read_actions and not hasattr(cls, "fast_list"):
+            raise ImproperlyConfigured(
+                f"{cls.__name__}: list есть в fast_read_actions, "
+                "но fast_list не реализован."
+            )
+
+    def use_fast_read(self):
+        return (
+            settings.FAST_READ_SERIALIZERS_ENABLED
+            and self.action in self.fast_read_actions
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.use_fast_read():
+            return self.fast_list(request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+
+def serialize_user(row, request, prefix=""):
+    """Пользователь в формате UserSerializer из полей с префиксом prefix."""
+    data = {field: row[prefix + field] for field in USER_MODEL_FIELDS}
+    data["is_subscribed"] = row[prefix + "is_subscribed"]
+    data["avatar"] = image_url(
+        User._meta.get_field("avatar").storage,
+        row[prefix + "avatar"],
+        row[prefix + "avatar_variants"],
+        request,
+    )
+    return data
+
+
+def recipe_values(queryset, request):
+    """Строки рецептов с полями RECIPE_VALUES и данными автора.
+
+    Признак подписки на автора вычисляется в том же запросе, поэтому
+    для страницы рецептов нужен ещё только запрос ингредиентов.
+    """
+    user = request.user
+    if user.is_authenticated:
+        is_subscribed = Exists(
+            Subscription.objects.filter(user=user, author=OuterRef("author"))
+        )
+    else:
+        is_subscribed = Value(False, output_field=BooleanField())
+    return queryset.annotate(author__is_subscribed=is_subscribed).values(
+        *RECIPE_VALUES, *(f"author__{field}" for field in USER_VALUES)
+    )
+
+
+def get_recipe_ingredients(recipe_ids):
+    """Ингредиенты рецептов в формате IngredientInRecipeSerializer."""
+    ingredients = defaultdict(list)
+    rows = (
+        IngredientInRecipe.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("pk")
+        .values_list(
+            "recipe_id",
+            "ingredient_id",
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            "amount",
+        )
+    )
+    for recipe_id, ingredient_id, name, unit, amount in rows:
+        ingredients[recipe_id].append(
+            {
+                "id": ingredient_id,
+                "name": name,
+                "measurement_unit": unit,
+                "amount": amount,
+            }
+        )
+    return ingredients
+
+
+def serialize_recipes(rows, request):
+    """Страница рецептов в формате RecipeReadSerializer.
+
+    rows — строки из recipe_values(). Ингредиенты загружаются одним
+    запросом на всю страницу.
+    """
+    rows = list(rows)
+    ingredients = get_recipe_ingredients([row["id"] for row in rows])
+    storage = Recipe._meta.get_field("image").storage
+    return [
+        {
+            "id": row["id"],
+            "author": serialize_user(row, request, prefix="author__"),
+            "ingredients": ingredients[row["id"]],
+            "is_favorited": row["is_favorited"],
+            "is_in_shopping_cart": row["is_in_shopping_cart"],
+            "name": row["name"],
+            "image": image_url(
+                storage, row["image"], row["image_variants"], request
+            ),
+            "text": row["text"],
+            "cooking_time": row["cooking_time"],
+        }
+        for row in rows
+    ]
+
+
+def serialize_recipes_minified(rows, request):
+    """Рецепты в формате RecipeMinifiedSerializer."""
+    storage = Recipe._meta.get_field("image").storage
+    return [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "image": image_url(
+                storage, row["image"], row["image_variants"], request
+            ),
+            "image_thumbnail": image_url(
+                storage,
+                row["image"],
+                row["image_variants"],
+                request,
+                THUMBNAIL_VARIANT,
+            ),
+            "image_srcset": image_srcset(
+                storage, row["image_variants"], request
+            ),
+            "cooking_time": row["cooking_time"],
+        }
+        for row in rows
+    ]
+
+
+def serialize_subscriptions(rows, recipes, request):
+    """Страница подписок в формате SubscriptionSerializer.
+
+    rows — словари авторов с полями USER_VALUES и recipes_count,
+    recipes — queryset превью рецептов этих авторов.
+    """
+    rows = list(rows)
+    previews = defaultdict(list)
+    for recipe in recipes.filter(
+        author_id__in=[row["id"] for row in rows]
+    ).values("author_id", *RECIPE_MINIFIED_VALUES):
+        previews[recipe["author_id"]].append(recipe)
+
+    data = []
+    for row in rows:
+        author = serialize_user(row, request)
+        author["recipes"] = serialize_recipes_minified(
+            previews[row["id"]], request
+        )
+        author["recipes_count"] = row["recipes_count"]
+        data.append(author)
+    return data
@@ -1,4 +1,12 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db.models import F
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
 from recipes.models import Ingredient, Recipe
 
@@ -17,6 +25,7 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipe
@@ -37,3 +46,50 @@ class RecipeFilter(filters.FilterSet):
         return self._filter_user_relation(
             queryset, name, value, "in_shopping_cart_of"
         )
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, ингредиентам и описанию.
+
+        Если полнотекстовый поиск ничего не нашёл, выполняется поиск
+        по триграммному сходству со словами названия, чтобы учесть
+        опечатки.
+        Релевантность сохраняется в аннотации search_rank.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+
+        query = SearchQuery(
+            value,
+            search_type="websearch",
+            config=settings.RECIPE_SEARCH_CONFIG,
+        )
+        matches = queryset.filter(search_vector=query)
+        if matches.exists():
+            return matches.annotate(
+                search_rank=SearchRank(F("search_vector"), query)
+            )
+
+        return queryset.filter(name__trigram_word_similar=value).annotate(
+            search_rank=TrigramWordSimilarity(value, "name")
+        )
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Сортирует результаты поиска по релевантности по умолчанию.
+
+    К любой сортировке добавляется id в том же направлении, что и
+    последнее поле: порядок рецептов с равными значениями не меняется
+    между запросами и совпадает с индексами (поле, id).
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or ordering[-1].lstrip("-") in ("id", "pk"):
+            return ordering
+        return [*ordering, "-id" if ordering[-1].startswith("-") else "id"]
+
+    def get_default_ordering(self, view):
+        if view.request.query_params.get("search", "").strip():
+            return ["-search_rank", "-pub_date"]
+        return super().get_default_ordering(view)
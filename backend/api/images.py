@@ -0,0 +1,242 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from recipes.models import Recipe
+from users.models import User
+
+from .cache import response_cache
+from .storage import lock_file_name
+
+DISPLAY_VARIANT = "large"
+THUMBNAIL_VARIANT = "small"
+CACHE_TAGS = {"recipes.recipe": "recipes", "users.user": "users"}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix="image-processing",
+        )
+    return _executor
+
+
+def get_variants_field(field_name):
+    return f"{field_name}_variants"
+
+
+def _build_url(storage, name, request):
+    url = storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def image_url(storage, name, variants, request, variant=DISPLAY_VARIANT):
+    """Ссылка на вариант изображения, а пока его нет — на оригинал."""
+    rendition = (variants or {}).get(variant)
+    if rendition:
+        name = rendition["name"]
+    if not name:
+        return None
+    return _build_url(storage, name, request)
+
+
+def image_srcset(storage, variants, request):
+    """Значение srcset из всех вариантов или None до их готовности."""
+    if not variants:
+        return None
+    return ", ".join(
+        f"{_build_url(storage, rendition['name'], request)} "
+        f"{rendition['width']}w"
+        for rendition in sorted(
+            variants.values(), key=lambda rendition: rendition["width"]
+        )
+    )
+
+
+def render_variants(storage, name):
+    """Сохраняет уменьшенные копии изображения без метаданных.
+
+    Для каждого размера из IMAGE_VARIANT_SIZES изображение вписывается
+    в квадрат со стороной size и перекодируется в IMAGE_VARIANT_FORMAT.
+    Возвращает {название варианта: {"name", "width", "height"}}.
+    """
+    image_format = settings.IMAGE_VARIANT_FORMAT
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    with storage.open(name) as file, Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert(
+                "RGBA" if "transparency" in image.info else "RGB"
+            )
+        variants = {}
+        renditions = {}
+        for variant, size in settings.IMAGE_VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+            # Изображение меньше нескольких размеров не уменьшается,
+            # и эти варианты совпадают: файл сохраняется один раз.
+            if resized.size in renditions:
+                variants[variant] = dict(renditions[resized.size])
+                continue
+            buffer = io.BytesIO()
+            resized.save(
+                buffer,
+                image_format,
+                quality=settings.IMAGE_VARIANT_QUALITY,
+            )
+            variants[variant] = {
+                "name": storage.save(
+                    os.path.join(
+                        directory,
+                        "variants",
+                        f"{stem}_{variant}.{image_format.lower()}",
+                    ),
+                    ContentFile(buffer.getvalue()),
+                ),
+                "width": resized.width,
+                "height": resized.height,
+            }
+            renditions[resized.size] = variants[variant]
+    return variants
+
+
+def _is_referenced(model, lookups, exclude_pk=None):
+    queryset = model.objects.filter(**lookups)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return queryset.exists()
+
+
+def delete_variants(model, field_name, variants, exclude_pk=None, keep=()):
+    """Удаляет файлы вариантов, если на них не ссылаются другие строки.
+
+    Имена файлов строятся по содержимому, поэтому одинаковые
+    изображения разных строк делят одни и те же варианты. Файлы
+    с именами из keep не удаляются.
+    """
+    if not variants or _is_referenced(
+        model, {get_variants_field(field_name): variants}, exclude_pk
+    ):
+        return
+    storage = model._meta.get_field(field_name).storage
+    for rendition in variants.values():
+        if rendition["name"] not in keep:
+            storage.delete(rendition["name"])
+
+
+def delete_image(instance, field_name):
+    """Удаляет файл изображения экземпляра, если он больше не нужен.
+
+    Поле экземпляра очищается, а файл после фиксации транзакции
+    удаляется, если на него не ссылается ни одна строка модели.
+    Ссылки проверяются под lock_file_name, поэтому файл, который
+    параллельная транзакция только что сохранила для новой строки,
+    удаляется, только если эта транзакция не зафиксировалась.
+    """
+    file = getattr(instance, field_name)
+    if not file:
+        return
+    model, storage, name = type(instance), file.storage, file.name
+
+    def delete_unreferenced():
+        # Новое изображение с тем же содержимым получает то же имя.
+        with transaction.atomic():
+            lock_file_name(name)
+            if not _is_referenced(model, {field_name: name}):
+                storage.delete(name)
+
+    transaction.on_commit(delete_unreferenced)
+    setattr(instance, field_name, None)
+
+
+def process_image(model, pk, field_name):
+    """Создаёт варианты изображения и сохраняет их имена в модели.
+
+    Варианты записываются, только если изображение и его варианты
+    не сменились, пока шла обработка; прежние варианты после этого
+    удаляются. При ошибке чтения изображения клиенты продолжают
+    получать оригинал. Возвращает True, если варианты сохранены.
+    """
+    variants_field = get_variants_field(field_name)
+    name, old_variants = (
+        model.objects.filter(pk=pk)
+        .values_list(field_name, variants_field)
+        .first()
+    ) or (None, None)
+    if not name:
+        return False
+    storage = model._meta.get_field(field_name).storage
+    try:
+        variants = render_variants(storage, name)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        return False
+    updated = model.objects.filter(
+        pk=pk, **{field_name: name, variants_field: old_variants}
+    ).update(**{variants_field: variants}, updated_at=timezone.now())
+    if not updated:
+        delete_variants(model, field_name, variants)
+        return False
+    delete_variants(
+        model,
+        field_name,
+        old_variants,
+        exclude_pk=pk,
+        keep={rendition["name"] for rendition in variants.values()},
+    )
+    if model is User:
+        # Аватар автора выводится и в его рецептах.
+        Recipe.objects.filter(author_id=pk).update(updated_at=timezone.now())
+    response_cache.invalidate(CACHE_TAGS[model._meta.label_lower])
+    return True
+
+
+def process_image_in_worker(*args):
+    close_old_connections()
+    try:
+        return process_image(*args)
+    finally:
+        connections.close_all()
+
+
+def schedule_image_processing(instance, field_name):
+    """Ставит обработку изображения в очередь после фиксации транзакции.
+
+    Имена прежних вариантов сразу убираются из строки, и до готовности
+    новых сериализаторы отдают оригинал. Сами файлы удаляются только
+    после фиксации, чтобы при откате на них не остались ссылки. При
+    IMAGE_PROCESSING_ASYNC = False обработка выполняется в текущем потоке.
+    """
+    model = type(instance)
+    variants_field = get_variants_field(field_name)
+    old_variants = getattr(instance, variants_field)
+    setattr(instance, variants_field, {})
+    model.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+    if old_variants:
+        # Регистрируется раньше обработки: варианты того же изображения
+        # получат те же имена и будут созданы заново.
+        transaction.on_commit(
+            lambda: delete_variants(model, field_name, old_variants)
+        )
+    if not getattr(instance, field_name):
+        return
+
+    args = (type(instance), instance.pk, field_name)
+    if settings.IMAGE_PROCESSING_ASYNC:
+        transaction.on_commit(
+            lambda: get_executor().submit(process_image_in_worker, *args)
+        )
+    else:
+        transaction.on_commit(lambda: process_image(*args))
@@ -0,0 +1,70 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+MAX_CHAR = chr(0x10FFFF)
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти для автодополнения по префиксу.
+
+    Названия хранятся в отсортированном массиве в casefold-виде, поиск
+    по префиксу выполняется двумя бинарными поисками. Индекс строится
+    при первом обращении, сбрасывается сигналами модели Ingredient и
+    перестраивается по истечении INGREDIENT_INDEX_TTL, чтобы изменения
+    из других процессов тоже подхватывались.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    @property
+    def enabled(self):
+        return settings.INGREDIENT_INDEX_ENABLED
+
+    def invalidate(self):
+        self._data = None
+
+    def build(self):
+        rows = sorted(
+            (name.casefold(), name, pk, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+        )
+        keys = [row[0] for row in rows]
+        items = [
+            {"id": pk, "name": name, "measurement_unit": measurement_unit}
+            for _, name, pk, measurement_unit in rows
+        ]
+        expires_at = time.monotonic() + settings.INGREDIENT_INDEX_TTL
+        self._data = (keys, items, expires_at)
+        return self._data
+
+    def _get_data(self):
+        data = self._data
+        if data is not None and data[2] > time.monotonic():
+            return data
+        with self._lock:
+            data = self._data
+            if data is None or data[2] <= time.monotonic():
+                data = self.build()
+        return data
+
+    def search(self, prefix="", limit=None):
+        """Возвращает ингредиенты, чьи названия начинаются с prefix."""
+        keys, items, _ = self._get_data()
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_right(keys, prefix + MAX_CHAR, lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return items[start:end]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,330 @@
+import base64
+import io
+import json
+import math
+import platform
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.images import delete_variants
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+
+def percentile(values, fraction):
+    """Процентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 120, 40)).save(buffer, "JPEG")
+    return (
+        "data:image/jpeg;base64,"
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+class Command(BaseCommand):
+    """Команда для замера задержек и числа SQL-запросов основных API."""
+
+    help = (
+        "Выполняет сценарии API через тестовый клиент Django на текущей "
+        "базе и сохраняет p50/p95 и число SQL-запросов в JSON. С "
+        "--compare сравнивает результат с сохранённым и завершается "
+        "ошибкой при регрессии. Созданные рецепты и токен затем удаляются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=30,
+            help="Число замеров каждого сценария.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Число прогревочных запросов без замера.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Email пользователя, от имени которого идут запросы. "
+            "По умолчанию — пользователь с подписками и корзиной.",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            default=[],
+            help="Запустить только указанные сценарии.",
+        )
+        parser.add_argument("--output", help="Сохранить результат в JSON.")
+        parser.add_argument(
+            "--compare", help="JSON с прошлым результатом для сравнения."
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Допустимый рост p95 при сравнении, доля.",
+        )
+
+    def _get_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            user = (
+                User.objects.filter(
+                    follower__isnull=False, shopping_cart__isnull=False
+                )
+                .order_by("pk")
+                .first()
+            )
+        if user is None:
+            raise CommandError(
+                "Нет подходящего пользователя. Сгенерируйте данные "
+                "командой generate_data или укажите --user."
+            )
+        return user
+
+    def _get_scenarios(self, user, recipe_name):
+        recipe = Recipe.objects.order_by("-favorites_count", "pk").first()
+        if recipe is None:
+            raise CommandError("В базе нет рецептов.")
+        author = (
+            User.objects.annotate(total=Count("recipes"))
+            .order_by("-total", "pk")
+            .first()
+        )
+        word = recipe.name.split()[0]
+        ingredients = [
+            {"id": pk, "amount": 100}
+            for pk in Ingredient.objects.order_by("pk").values_list(
+                "pk", flat=True
+            )[:8]
+        ]
+        recipe_data = {
+            "name": recipe_name,
+            "text": "Описание",
+            "cooking_time": 30,
+            "image": make_image(),
+            "ingredients": ingredients,
+        }
+        return {
+            "recipes-list-anonymous": ("get", "/api/recipes/", None, False),
+            "recipes-list": ("get", "/api/recipes/", None, True),
+            "recipes-list-page": (
+                "get",
+                "/api/recipes/?page=5&limit=6",
+                None,
+                True,
+            ),
+            "recipes-list-author": (
+                "get",
+                f"/api/recipes/?author={author.pk}",
+                None,
+                True,
+            ),
+            "recipes-list-favorited": (
+                "get",
+                "/api/recipes/?is_favorited=1",
+                None,
+                True,
+            ),
+            "recipes-list-in-cart": (
+                "get",
+                "/api/recipes/?is_in_shopping_cart=1",
+                None,
+                True,
+            ),
+            "recipes-search": (
+                "get",
+                f"/api/recipes/?search={word}",
+                None,
+                True,
+            ),
+            "recipes-detail": (
+                "get",
+                f"/api/recipes/{recipe.pk}/",
+                None,
+                True,
+            ),
+            "users-subscriptions": (
+                "get",
+                "/api/users/subscriptions/?recipes_limit=3",
+                None,
+                True,
+            ),
+            "shopping-cart-download": (
+                "get",
+                "/api/recipes/download_shopping_cart/",
+                None,
+                True,
+            ),
+            "recipes-create": ("post", "/api/recipes/", recipe_data, True),
+        }
+
+    def _request(self, client, method, url, data, headers):
+        if data is None:
+            response = getattr(client, method)(url, headers=headers)
+        else:
+            response = getattr(client, method)(
+                url,
+                json.dumps(data),
+                content_type="application/json",
+                headers=headers,
+            )
+        if response.streaming:
+            b"".join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(
+                f"{method.upper()} {url}: ответ {response.status_code}."
+            )
+
+    def _measure(self, client, scenario, headers, repeat, warmup):
+        method, url, data, authenticated = scenario
+        headers = headers if authenticated else {}
+        for _ in range(warmup):
+            self._request(client, method, url, data, headers)
+        durations = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                self._request(client, method, url, data, headers)
+                durations.append((time.perf_counter() - started) * 1000)
+        return {
+            "p50_ms": round(percentile(durations, 0.5), 2),
+            "p95_ms": round(percentile(durations, 0.95), 2),
+            "mean_ms": round(statistics.fmean(durations), 2),
+            "queries": len(queries),
+        }
+
+    def _run(self, options, user, token, recipe_name):
+        headers = {"Authorization": f"Token {token.key}"}
+        scenarios = self._get_scenarios(user, recipe_name)
+        unknown = set(options["scenarios"]) - scenarios.keys()
+        if unknown:
+            raise CommandError(
+                f"Неизвестные сценарии: {', '.join(sorted(unknown))}."
+            )
+        client = Client()
+        results = {}
+        for name, scenario in scenarios.items():
+            if options["scenarios"] and name not in options["scenarios"]:
+                continue
+            results[name] = self._measure(
+                client,
+                scenario,
+                headers,
+                options["repeat"],
+                options["warmup"],
+            )
+            self._write_row(name, results[name])
+        return {
+            "created": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "repeat": options["repeat"],
+            "data": {
+                "users": User.objects.count(),
+                "recipes": Recipe.objects.count(),
+            },
+            "scenarios": results,
+        }
+
+    def _clear(self, user, recipe_name):
+        """Удаляет рецепты, созданные замером, и их изображения.
+
+        Изображения и их варианты удаляются, только если на них
+        не ссылаются другие рецепты.
+        """
+        recipes = Recipe.objects.filter(author=user, name=recipe_name)
+        images = list(
+            recipes.values_list("image", "image_variants").distinct()
+        )
+        recipes.delete()
+        storage = Recipe._meta.get_field("image").storage
+        for name, variants in images:
+            delete_variants(Recipe, "image", variants)
+            if name and not Recipe.objects.filter(image=name).exists():
+                storage.delete(name)
+
+    def _write_row(self, name, result):
+        self.stdout.write(
+            f"{name:<28}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            f"{result['queries']:>10}"
+        )
+
+    def _compare(self, baseline, report, threshold):
+        """Печатает сравнение и возвращает список регрессий."""
+        regressions = []
+        self.stdout.write(
+            f"\n{'сценарий':<28}{'p95 было':>10}{'p95 стало':>11}"
+            f"{'запросы':>12}"
+        )
+        for name, result in report["scenarios"].items():
+            old = baseline["scenarios"].get(name)
+            if old is None:
+                continue
+            self.stdout.write(
+                f"{name:<28}{old['p95_ms']:>10.2f}{result['p95_ms']:>11.2f}"
+                f"{old['queries']:>6} → {result['queries']:<4}"
+            )
+            if result["queries"] > old["queries"]:
+                regressions.append(
+                    f"{name}: запросов {old['queries']} → "
+                    f"{result['queries']}"
+                )
+            if result["p95_ms"] > old["p95_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{name}: p95 {old['p95_ms']} → {result['p95_ms']} мс"
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)
+
+        self.stdout.write(
+            f"{'сценарий':<28}{'p50, мс':>10}{'p95, мс':>10}"
+            f"{'запросы':>10}"
+        )
+        # Запросы идут вне общей транзакции, как и в работе: иначе
+        # atomic() добавлял бы запросы SAVEPOINT, обработчики on_commit
+        # не выполнялись бы, а чтение шло бы только с основной базы.
+        # Созданное замером удаляется после него.
+        user = self._get_user(options["user"])
+        token, token_created = Token.objects.get_or_create(user=user)
+        recipe_name = f"benchmark-api-{uuid.uuid4().hex[:12]}"
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                report = self._run(options, user, token, recipe_name)
+        finally:
+            self._clear(user, recipe_name)
+            if token_created:
+                token.delete()
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if baseline is not None:
+            regressions = self._compare(baseline, report, options["threshold"])
+            if regressions:
+                raise CommandError(
+                    "Регрессии производительности:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("Регрессий нет."))
@@ -0,0 +1,129 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import BooleanField, Prefetch, Value
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer, orjson
+from api.serializers import RecipeReadSerializer
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Команда для сравнения скорости JSON-рендереров и парсеров API."""
+
+    help = (
+        "Сериализует страницу рецептов через RecipeReadSerializer и "
+        "замеряет время рендеринга и разбора JSON стандартными классами "
+        "DRF и классами на orjson."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=100,
+            help="Количество рецептов на странице.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=50,
+            help="Число повторов, берётся лучший результат.",
+        )
+
+    def _get_page(self, size):
+        return list(
+            Recipe.objects.prefetch_related(
+                Prefetch(
+                    "recipe_ingredients",
+                    queryset=IngredientInRecipe.objects.select_related(
+                        "ingredient"
+                    ),
+                ),
+                Prefetch(
+                    "author",
+                    queryset=User.objects.annotate(
+                        is_subscribed=Value(False, output_field=BooleanField())
+                    ),
+                ),
+            ).annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )[
+                :size
+            ]
+        )
+
+    def _measure(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def _write_row(self, name, elapsed, baseline=None):
+        speedup = f"{baseline / elapsed:>10.1f}x" if baseline else ""
+        self.stdout.write(f"{name:<32}{elapsed * 1000:>12.2f}{speedup}")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("Пакет orjson не установлен.")
+        recipes = self._get_page(options["size"])
+        if not recipes:
+            raise CommandError(
+                "В базе нет рецептов. Загрузите или сгенерируйте данные."
+            )
+        repeat = options["repeat"]
+
+        data = {
+            "count": len(recipes),
+            "next": None,
+            "previous": None,
+            "results": RecipeReadSerializer(
+                recipes, many=True, context={"request": None}
+            ).data,
+        }
+        serialize_time = self._measure(
+            lambda: RecipeReadSerializer(
+                recipes, many=True, context={"request": None}
+            ).data,
+            repeat,
+        )
+        standard, fast = JSONRenderer(), ORJSONRenderer()
+        payload = standard.render(data)
+        if fast.render(data) != payload:
+            raise CommandError("Результаты рендереров не совпадают.")
+
+        self.stdout.write(
+            f"Рецептов: {len(recipes)}, размер ответа: "
+            f"{len(payload) / 1024:.1f} КБ, повторов: {repeat}."
+        )
+        self.stdout.write(f"{'этап':<32}{'время, мс':>12}{'ускорение':>11}")
+        self._write_row("RecipeReadSerializer.data", serialize_time)
+
+        render_time = self._measure(lambda: standard.render(data), repeat)
+        self._write_row("JSONRenderer", render_time)
+        self._write_row(
+            "ORJSONRenderer",
+            self._measure(lambda: fast.render(data), repeat),
+            render_time,
+        )
+
+        parse_time = self._measure(
+            lambda: JSONParser().parse(io.BytesIO(payload)), repeat
+        )
+        self._write_row("JSONParser", parse_time)
+        self._write_row(
+            "ORJSONParser",
+            self._measure(
+                lambda: ORJSONParser().parse(io.BytesIO(payload)), repeat
+            ),
+            parse_time,
+        )
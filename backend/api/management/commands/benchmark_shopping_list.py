@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.renderers import SHOPPING_LIST_RENDERERS
+
+DEFAULT_SIZES = (10, 1000, 50000)
+
+
+class Command(BaseCommand):
+    """Команда для замера скорости выгрузки списка покупок."""
+
+    help = (
+        "Замеряет пропускную способность рендереров списка покупок "
+        "на синтетических списках разного размера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=DEFAULT_SIZES,
+            help="Количество строк в списке покупок.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Число повторов, берётся лучший результат.",
+        )
+
+    def _generate_items(self, size):
+        for index in range(size):
+            yield (f"Ингредиент {index:06d}", "г", index % 1000 + 1)
+
+    def _measure(self, renderer, size, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            total_bytes = sum(
+                len(chunk)
+                for chunk in renderer.stream(self._generate_items(size))
+            )
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, total_bytes
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'формат':<8}{'строк':>10}{'время, мс':>12}"
+            f"{'строк/с':>14}{'размер, КБ':>13}"
+        )
+        for renderer_class in SHOPPING_LIST_RENDERERS:
+            renderer = renderer_class()
+            for size in options["sizes"]:
+                elapsed, total_bytes = self._measure(
+                    renderer, size, options["repeat"]
+                )
+                self.stdout.write(
+                    f"{renderer.format:<8}{size:>10}{elapsed * 1000:>12.1f}"
+                    f"{size / elapsed:>14.0f}{total_bytes / 1024:>13.1f}"
+                )
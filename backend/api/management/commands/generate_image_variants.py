@@ -0,0 +1,78 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from api.images import get_variants_field, process_image_in_worker
+from recipes.models import Recipe
+from users.models import User
+
+IMAGE_FIELDS = ((Recipe, "image"), (User, "avatar"))
+
+
+class Command(BaseCommand):
+    """Команда для создания вариантов уже загруженных изображений."""
+
+    help = (
+        "Создаёт уменьшенные копии изображений рецептов и аватаров, "
+        "у которых их ещё нет."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересоздать варианты для всех изображений.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Число потоков обработки.",
+        )
+
+    def _process(self, executor, model, field_name, pks, window):
+        """Обрабатывает изображения, держа в очереди не больше window задач.
+
+        executor.map сразу ставит в очередь все первичные ключи, и на
+        больших таблицах очередь занимает память, а чтение ключей
+        не ждёт обработки. Возвращает число обработанных и пропущенных.
+        """
+        results = {True: 0, False: 0}
+        pending = set()
+        for pk in pks:
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[future.result()] += 1
+            pending.add(
+                executor.submit(process_image_in_worker, model, pk, field_name)
+            )
+        for future in wait(pending).done:
+            results[future.result()] += 1
+        return results[True], results[False]
+
+    def handle(self, *args, **options):
+        window = options["workers"] * 2
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for model, field_name in IMAGE_FIELDS:
+                queryset = model.objects.exclude(
+                    **{f"{field_name}__isnull": True}
+                ).exclude(**{field_name: ""})
+                if not options["force"]:
+                    queryset = queryset.filter(
+                        **{get_variants_field(field_name): {}}
+                    )
+                pks = queryset.order_by("pk").values_list("pk", flat=True)
+                processed, skipped = self._process(
+                    executor,
+                    model,
+                    field_name,
+                    pks.iterator(chunk_size=1000),
+                    window,
+                )
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"{model._meta.verbose_name_plural}: обработано "
+                        f"{processed}, пропущено {skipped}."
+                    )
+                )
@@ -0,0 +1,501 @@
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import connections
+
+from .uploads import upload_metrics
+
+logger = logging.getLogger(__name__)
+
+# Статистика пула psycopg: (ключ, метрика, тип, множитель, описание).
+POOL_STATS = (
+    (
+        "pool_max",
+        "foodgram_db_pool_max_size",
+        "gauge",
+        1,
+        "Максимальный размер пула соединений.",
+    ),
+    (
+        "pool_size",
+        "foodgram_db_pool_size",
+        "gauge",
+        1,
+        "Соединения пула, включая выданные.",
+    ),
+    (
+        "pool_available",
+        "foodgram_db_pool_available",
+        "gauge",
+        1,
+        "Свободные соединения пула.",
+    ),
+    (
+        "requests_waiting",
+        "foodgram_db_pool_requests_waiting",
+        "gauge",
+        1,
+        "Потоки, ожидающие соединение.",
+    ),
+    (
+        "requests_num",
+        "foodgram_db_pool_requests_total",
+        "counter",
+        1,
+        "Запросы соединений из пула.",
+    ),
+    (
+        "requests_wait_ms",
+        "foodgram_db_pool_request_wait_seconds_total",
+        "counter",
+        0.001,
+        "Суммарное ожидание соединений из пула.",
+    ),
+    (
+        "requests_errors",
+        "foodgram_db_pool_request_errors_total",
+        "counter",
+        1,
+        "Запросы соединений, не дождавшиеся их.",
+    ),
+    (
+        "connections_num",
+        "foodgram_db_pool_connections_total",
+        "counter",
+        1,
+        "Соединения PostgreSQL, открытые пулом.",
+    ),
+    (
+        "connections_errors",
+        "foodgram_db_pool_connection_errors_total",
+        "counter",
+        1,
+        "Ошибки открытия соединений пулом.",
+    ),
+    (
+        "connections_lost",
+        "foodgram_db_pool_connections_lost_total",
+        "counter",
+        1,
+        "Соединения, отброшенные пулом при проверке.",
+    ),
+)
+
+METRIC_FIELDS = (
+    "requests",
+    "duration",
+    "queries",
+    "db",
+    "serialize",
+    "render",
+)
+
+
+class RequestMetrics:
+    """Замеры одного запроса: SQL-запросы и время по этапам.
+
+    Экземпляр служит обёрткой execute_wrapper для всех подключений к БД.
+    Время представления без учёта БД считается временем сериализации:
+    в представлениях API на неё приходится почти вся работа Python.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.view_finished_at = None
+        self.view_db = 0.0
+        self.render_finished_at = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+    def view_finished(self):
+        self.view_finished_at = time.perf_counter()
+        self.view_db = self.db
+
+    def render_finished(self):
+        self.render_finished_at = time.perf_counter()
+
+    def get_timings(self):
+        """Длительности этапов в секундах."""
+        finished = time.perf_counter()
+        timings = {"duration": finished - self.started, "db": self.db}
+        if self.view_finished_at is not None:
+            timings["serialize"] = max(
+                self.view_finished_at - self.started - self.view_db, 0.0
+            )
+            if self.render_finished_at is not None:
+                timings["render"] = (
+                    self.render_finished_at - self.view_finished_at
+                )
+        return timings
+
+
+@contextmanager
+def wrap_connections(wrapper):
+    """Устанавливает execute_wrapper на все подключения к БД."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class ObservedStream:
+    """Содержимое потокового ответа с кодом вокруг его отдачи.
+
+    Потоковый ответ выполняет запросы к БД уже после выхода из
+    middleware, во время отдачи. Контекст из make_context открыт от
+    первой порции до конца отдачи, on_close вызывается один раз, когда
+    поток исчерпан или закрыт, в том числе до первой порции.
+    """
+
+    def __init__(self, content, make_context, on_close):
+        self._source = content
+        self._content = iter(content)
+        self._make_context = make_context
+        self._on_close = on_close
+        self._stack = None
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        if self._stack is None:
+            self._stack = ExitStack()
+            self._stack.enter_context(self._make_context())
+        try:
+            return next(self._content)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._source, "close", None)
+            if close is not None:
+                close()
+        finally:
+            try:
+                if self._stack is not None:
+                    self._stack.close()
+            finally:
+                self._on_close()
+
+
+def observe_stream(response, make_context, on_close):
+    """Оборачивает содержимое потокового ответа в ObservedStream.
+
+    Возвращает False для обычных и асинхронных ответов: их содержимое
+    уже готово или отдаётся вне потока запроса.
+    """
+    if not response.streaming or response.is_async:
+        return False
+    response.streaming_content = ObservedStream(
+        response.streaming_content, make_context, on_close
+    )
+    return True
+
+
+class EndpointMetrics:
+    """Накопленные метрики по действиям API в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._budget_exceeded = {}
+
+    def record(self, action, method, queries, timings):
+        with self._lock:
+            totals = self._totals.setdefault(
+                (action, method), dict.fromkeys(METRIC_FIELDS, 0)
+            )
+            totals["requests"] += 1
+            totals["queries"] += queries
+            for name, value in timings.items():
+                totals[name] += value
+
+    def record_budget_exceeded(self, action):
+        with self._lock:
+            self._budget_exceeded[action] = (
+                self._budget_exceeded.get(action, 0) + 1
+            )
+
+    def snapshot(self):
+        with self._lock:
+            return (
+                {key: dict(totals) for key, totals in self._totals.items()},
+                dict(self._budget_exceeded),
+            )
+
+
+endpoint_metrics = EndpointMetrics()
+
+
+class ConnectionMetrics:
+    """Подключения Django к базам данных в памяти процесса.
+
+    Без пула каждое подключение открывает соединение PostgreSQL, так что
+    по счётчику видно, работает ли CONN_MAX_AGE. С пулом это выдачи
+    соединений из пула.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def record(self, alias):
+        with self._lock:
+            self._counters[alias] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+connection_metrics = ConnectionMetrics()
+
+
+def get_pool_stats():
+    """Статистика пулов соединений psycopg по псевдонимам баз."""
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+    return stats
+
+
+def get_action_name(request):
+    """Имя маршрута вида recipes-list, по нему ищется бюджет запросов."""
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+    return match.url_name or match.view_name
+
+
+def get_query_budget(action, method):
+    """Бюджет SQL-запросов из QUERY_BUDGETS или None, если не задан."""
+    return settings.QUERY_BUDGETS.get(action, {}).get(method)
+
+
+def format_server_timing(metrics, timings):
+    parts = [f'db;dur={timings["db"] * 1000:.1f};desc="{metrics.queries} q"']
+    for name in ("serialize", "render"):
+        if name in timings:
+            parts.append(f"{name};dur={timings[name] * 1000:.1f}")
+    parts.append(f"total;dur={timings['duration'] * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL-запросы и время обработки каждого запроса.
+
+    Итоги копятся в endpoint_metrics по имени маршрута и методу. При
+    SERVER_TIMING_ENABLED они также отдаются в заголовке Server-Timing;
+    для потокового ответа он отражает время до начала отдачи.
+    Превышение бюджета из QUERY_BUDGETS пишется в лог и в метрику.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+
+        metrics = request.metrics = RequestMetrics()
+        with wrap_connections(metrics):
+            response = self.get_response(request)
+
+        # Запросы потокового ответа выполняются во время отдачи, поэтому
+        # его итоги записываются, когда поток исчерпан или закрыт.
+        if not observe_stream(
+            response,
+            partial(wrap_connections, metrics),
+            partial(self.record, request, metrics),
+        ):
+            self.record(request, metrics)
+        if settings.SERVER_TIMING_ENABLED:
+            response["Server-Timing"] = format_server_timing(
+                metrics, metrics.get_timings()
+            )
+        return response
+
+    def record(self, request, metrics):
+        """Записывает итоги запроса и проверяет бюджет запросов."""
+        action = get_action_name(request)
+        timings = metrics.get_timings()
+        endpoint_metrics.record(
+            action, request.method, metrics.queries, timings
+        )
+        budget = get_query_budget(action, request.method)
+        if budget is not None and metrics.queries > budget:
+            endpoint_metrics.record_budget_exceeded(action)
+            logger.warning(
+                "%s %s: %d SQL-запросов при бюджете %d",
+                request.method,
+                request.path,
+                metrics.queries,
+                budget,
+            )
+
+
+class RequestMetricsMixin:
+    """Отмечает конец работы представления DRF и конец рендеринга.
+
+    Без этого RequestMetricsMiddleware знает только общее время запроса
+    и время в БД.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        metrics = getattr(request, "metrics", None)
+        if metrics is not None:
+            metrics.view_finished()
+            if hasattr(response, "add_post_render_callback"):
+                response.add_post_render_callback(
+                    lambda response: metrics.render_finished()
+                )
+        return response
+
+
+def _escape_label(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_labels(**labels):
+    values = ",".join(
+        f'{name}="{_escape_label(value)}"' for name, value in labels.items()
+    )
+    return f"{{{values}}}"
+
+
+def render_prometheus():
+    """Метрики процесса в текстовом формате Prometheus."""
+    totals, budget_exceeded = endpoint_metrics.snapshot()
+    families = (
+        ("requests", "foodgram_http_requests_total", "counter", "Запросы."),
+        (
+            "duration",
+            "foodgram_http_request_duration_seconds_total",
+            "counter",
+            "Суммарное время обработки запросов.",
+        ),
+        (
+            "queries",
+            "foodgram_db_queries_total",
+            "counter",
+            "SQL-запросы.",
+        ),
+        (
+            "db",
+            "foodgram_db_duration_seconds_total",
+            "counter",
+            "Суммарное время SQL-запросов.",
+        ),
+        (
+            "serialize",
+            "foodgram_serialize_duration_seconds_total",
+            "counter",
+            "Суммарное время представлений без учёта БД.",
+        ),
+        (
+            "render",
+            "foodgram_render_duration_seconds_total",
+            "counter",
+            "Суммарное время рендеринга ответов.",
+        ),
+    )
+    lines = []
+    for field, name, metric_type, description in families:
+        lines += [
+            f"# HELP {name} {description}",
+            f"# TYPE {name} {metric_type}",
+        ]
+        for (action, method), values in sorted(totals.items()):
+            lines.append(
+                f"{name}{_format_labels(action=action, method=method)} "
+                f"{values[field]}"
+            )
+
+    name = "foodgram_query_budget_exceeded_total"
+    lines += [
+        f"# HELP {name} Запросы сверх бюджета QUERY_BUDGETS.",
+        f"# TYPE {name} counter",
+    ]
+    for action, count in sorted(budget_exceeded.items()):
+        lines.append(f"{name}{_format_labels(action=action)} {count}")
+
+    name = "foodgram_db_connects_total"
+    lines += [
+        f"# HELP {name} Подключения к БД: новые соединения или выдачи "
+        "из пула.",
+        f"# TYPE {name} counter",
+    ]
+    for alias, count in sorted(connection_metrics.snapshot().items()):
+        lines.append(f"{name}{_format_labels(database=alias)} {count}")
+
+    pools = get_pool_stats()
+    if pools:
+        for key, name, metric_type, scale, description in POOL_STATS:
+            lines += [
+                f"# HELP {name} {description}",
+                f"# TYPE {name} {metric_type}",
+            ]
+            for alias, stats in sorted(pools.items()):
+                # Счётчики psycopg_pool появляются после первого события.
+                value = stats.get(key, 0) * scale
+                lines.append(f"{name}{_format_labels(database=alias)} {value}")
+
+    uploads = upload_metrics.snapshot()
+    for kind, name, label, description in (
+        (
+            "uploads",
+            "foodgram_image_uploads_total",
+            "source",
+            "Принятые изображения.",
+        ),
+        (
+            "bytes",
+            "foodgram_image_upload_bytes_total",
+            "source",
+            "Объём принятых изображений.",
+        ),
+        (
+            "rejected",
+            "foodgram_image_uploads_rejected_total",
+            "reason",
+            "Отклонённые изображения.",
+        ),
+    ):
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+        for (counter_kind, value), count in sorted(uploads.items()):
+            if counter_kind == kind:
+                lines.append(
+                    f"{name}{_format_labels(**{label: value})} {count}"
+                )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,236 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def get_count_cache_key(model):
+    return f"pagination-count:v2:{model._meta.label_lower}"
+
+
+def invalidate_table_count(model):
+    cache.delete(get_count_cache_key(model))
+
+
+def estimate_table_count(model, using):
+    """Оценка числа строк по статистике планировщика PostgreSQL."""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] >= 0 else None
+
+
+def get_table_count(queryset, exact=False):
+    """Число строк в таблице и признак оценки: из кэша, по reltuples или
+    точным COUNT(*).
+
+    Для больших таблиц используется оценка reltuples, для небольших и
+    при exact — точный подсчёт. Результат кэшируется на
+    PAGINATION_COUNT_CACHE_TTL.
+    """
+    key = get_count_cache_key(queryset.model)
+    cached = None if exact else cache.get(key)
+    if cached is None:
+        count = None
+        if not exact:
+            count = estimate_table_count(queryset.model, queryset.db)
+        estimated = (
+            count is not None
+            and count >= settings.PAGINATION_COUNT_ESTIMATE_FROM
+        )
+        if not estimated:
+            count = queryset.count()
+        cached = (count, estimated)
+        cache.set(key, cached, settings.PAGINATION_COUNT_CACHE_TTL)
+    return cached
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, не выполняющий COUNT(*) для нефильтрованных списков.
+
+    Оценка может быть меньше реального числа строк, поэтому для
+    последней страницы по оценке и страниц за ней число строк
+    пересчитывается точно, иначе хвост списка был бы недоступен.
+    """
+
+    count_is_estimate = False
+
+    def _is_table_queryset(self):
+        queryset = self.object_list
+        return (
+            isinstance(queryset, QuerySet)
+            and not queryset.query.where
+            and not queryset.query.distinct
+        )
+
+    @cached_property
+    def count(self):
+        if self._is_table_queryset():
+            count, self.count_is_estimate = get_table_count(self.object_list)
+            return count
+        return super().count
+
+    def validate_number(self, number):
+        try:
+            number = super().validate_number(number)
+        except EmptyPage:
+            if not self.count_is_estimate:
+                raise
+        else:
+            if not self.count_is_estimate or number < self.num_pages:
+                return number
+        self.count, self.count_is_estimate = get_table_count(
+            self.object_list, exact=True
+        )
+        self.__dict__.pop("num_pages", None)
+        return super().validate_number(number)
+
+
+class CustomPageNumberPagination(PageNumberPagination):
+    page_size_query_param = "limit"
+    django_paginator_class = CachedCountPaginator
+
+
+class RecipePagination(CustomPageNumberPagination):
+    """Постраничная пагинация с опциональным курсорным режимом.
+
+    По умолчанию работает как CustomPageNumberPagination. Курсорный режим
+    включается параметром ?pagination=cursor: вместо OFFSET и COUNT(*)
+    выборка продолжается с последней записи по ключу (поле сортировки, id),
+    для которого есть составной индекс.
+    """
+
+    mode_query_param = "pagination"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Некорректный курсор."
+    cursor_fields = {
+        "pub_date": datetime.fromisoformat,
+        "name": str,
+        "cooking_time": int,
+        "favorites_count": int,
+    }
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_cursor_mode(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        ordering = self._get_ordering(queryset)
+        field = ordering.lstrip("-")
+        descending = ordering.startswith("-")
+        queryset = queryset.order_by(ordering, "-id" if descending else "id")
+
+        position = self._decode_cursor(request, ordering)
+        if position is not None:
+            value, pk = position
+            if descending:
+                queryset = queryset.filter(
+                    Q(**{f"{field}__lt": value})
+                    | Q(**{field: value, "id__lt": pk}),
+                    **{f"{field}__lte": value},
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(**{f"{field}__gt": value})
+                    | Q(**{field: value, "id__gt": pk}),
+                    **{f"{field}__gte": value},
+                )
+
+        page_size = self.get_page_size(request)
+        results = list(queryset[: page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        self.next_position = None
+        if self.has_next:
+            last = self.page[-1]
+            if isinstance(last, dict):
+                self.next_position = (last[field], last["id"], ordering)
+            else:
+                self.next_position = (getattr(last, field), last.pk, ordering)
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_next_link(self):
+        if not getattr(self, "cursor_mode", False):
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self._encode_cursor(*self.next_position),
+        )
+
+    def _get_ordering(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        ordering = ordering[0] if ordering else "-pub_date"
+        if (
+            not isinstance(ordering, str)
+            or ordering.lstrip("-") not in self.cursor_fields
+        ):
+            fields = ", ".join(self.cursor_fields)
+            raise ValidationError(
+                {
+                    "ordering": "Курсорная пагинация поддерживает только "
+                    f"сортировку по полям: {fields}."
+                }
+            )
+        return ordering
+
+    def _encode_cursor(self, value, pk, ordering):
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = json.dumps([ordering, value, pk], ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def _decode_cursor(self, request, ordering):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor_ordering, value, pk = json.loads(
+                base64.urlsafe_b64decode(encoded.encode())
+            )
+            value = self.cursor_fields[ordering.lstrip("-")](value)
+            pk = int(pk)
+        except (
+            binascii.Error,
+            KeyError,
+            TypeError,
+            UnicodeDecodeError,
+            ValueError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor_ordering != ordering:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
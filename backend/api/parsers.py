@@ -0,0 +1,27 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """JSON-парсер на orjson; без orjson работает как JSONParser.
+
+    orjson принимает только UTF-8, поэтому тело в другой кодировке
+    предварительно перекодируется. NaN и Infinity, как и в строгом
+    режиме JSONParser, считаются ошибкой.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get("encoding", "utf-8")
+        data = stream.read()
+        try:
+            if encoding.lower().replace("_", "-") not in ("utf-8", "utf8"):
+                data = data.decode(encoding).encode()
+            return orjson.loads(data)
+        except (ValueError, LookupError) as exc:
+            raise ParseError(f"JSON parse error - {exc}")
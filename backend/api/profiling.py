@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache, partial
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .metrics import get_action_name, observe_stream, wrap_connections
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME_RE = re.compile(r"^\d{8}T\d{12}-\d+\.json$")
+SUMMARY_SUFFIX = ".summary"
+# Поля профиля, которых нет в сводке: они занимают почти весь файл.
+DETAIL_FIELDS = ("stacks", "queries")
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename):
+    """Путь к файлу относительно ближайшего каталога из sys.path."""
+    for prefix in sorted(filter(None, sys.path), key=len, reverse=True):
+        if filename.startswith(prefix + os.sep):
+            return os.path.relpath(filename, prefix)
+    return filename
+
+
+def collapse_stack(frame):
+    """Стек кадра в свёрнутом формате flamegraph: снаружи внутрь через «;»."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} "
+            f"({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик стеков зарегистрированных потоков.
+
+    Фоновый поток раз в interval секунд снимает стеки потоков, которые
+    сейчас обрабатывают профилируемые запросы. В отличие от cProfile
+    накладные расходы не зависят от числа вызовов функций, поэтому так
+    можно профилировать все запросы и сохранять только медленные.
+    """
+
+    def __init__(self):
+        self._stacks = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        with self._condition:
+            self._stacks[threading.get_ident()] = Counter()
+            # После fork поток-сэмплер родителя в дочернем процессе
+            # не существует, поэтому проверяется is_alive.
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="stack-sampler", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def stop(self):
+        """Прекращает сэмплирование потока и возвращает его стеки."""
+        with self._condition:
+            return self._stacks.pop(threading.get_ident(), Counter())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stacks:
+                    self._condition.wait()
+            time.sleep(settings.PROFILING_INTERVAL)
+            frames = sys._current_frames()
+            with self._condition:
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse_stack(frame)] += 1
+            del frames
+
+
+sampler = StackSampler()
+
+
+class QueryLog:
+    """Обёртка execute_wrapper, запоминающая SQL-запросы и их время."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            if len(self.queries) < self.limit:
+                self.queries.append(
+                    {
+                        "sql": sql,
+                        "duration": time.perf_counter() - started,
+                        "many": many,
+                    }
+                )
+
+
+def get_profiles_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def get_summary_name(name):
+    """Имя файла сводки профиля: поля без стеков и SQL-запросов."""
+    return name.removesuffix(".json") + SUMMARY_SUFFIX + ".json"
+
+
+def _write_json(path, data):
+    temporary = path.with_name(f".{path.name}.tmp")
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def save_profile(profile):
+    """Сохраняет профиль и его сводку в PROFILING_DIR, удаляет самые старые.
+
+    Имя файла начинается с времени запроса, поэтому сортировка по имени
+    совпадает с сортировкой по времени. Сводка пишется после профиля,
+    так что профиль из списка всегда можно открыть.
+    """
+    directory = get_profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{timezone.now():%Y%m%dT%H%M%S%f}-{os.getpid()}.json"
+    _write_json(directory / name, profile)
+    _write_json(
+        directory / get_summary_name(name),
+        {
+            key: value
+            for key, value in profile.items()
+            if key not in DETAIL_FIELDS
+        },
+    )
+
+    names = sorted(
+        path.name
+        for path in directory.iterdir()
+        if PROFILE_NAME_RE.match(path.name)
+    )
+    for old in names[: -settings.PROFILING_MAX_FILES]:
+        # Сначала удаляется сводка, чтобы список не ссылался на
+        # удалённый профиль.
+        for path in (directory / get_summary_name(old), directory / old):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                # Файл уже удалил другой процесс.
+                pass
+    return name
+
+
+def load_profile(name):
+    """Профиль по имени файла или None, если его нет."""
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    try:
+        with open(get_profiles_dir() / name, encoding="utf-8") as file:
+            profile = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    profile["name"] = name
+    return profile
+
+
+def load_summaries():
+    """Сводки всех сохранённых профилей, без стеков и SQL-запросов."""
+    directory = get_profiles_dir()
+    if not directory.is_dir():
+        return []
+    summaries = []
+    for path in directory.iterdir():
+        name = path.name.replace(SUMMARY_SUFFIX, "", 1)
+        if name == path.name or not PROFILE_NAME_RE.match(name):
+            continue
+        try:
+            with open(path, encoding="utf-8") as file:
+                summary = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        summary["name"] = name
+        summaries.append(summary)
+    return summaries
+
+
+def get_worst_profiles(limit):
+    """Самые долгие сохранённые запросы, до limit на каждый маршрут.
+
+    Возвращает список пар ((метод, маршрут), профили), отсортированный
+    по самому долгому запросу маршрута. Читаются только сводки.
+    """
+    endpoints = defaultdict(list)
+    for summary in load_summaries():
+        endpoints[(summary["method"], summary["action"])].append(summary)
+    worst = [
+        (
+            endpoint,
+            sorted(
+                profiles, key=lambda profile: profile["duration"], reverse=True
+            )[:limit],
+        )
+        for endpoint, profiles in endpoints.items()
+    ]
+    worst.sort(key=lambda item: item[1][0]["duration"], reverse=True)
+    return worst
+
+
+def format_collapsed(stacks):
+    """Стеки профиля в текстовом формате flamegraph.pl и speedscope."""
+    return "".join(
+        f"{stack} {count}\n"
+        for stack, count in sorted(
+            stacks.items(), key=lambda item: item[1], reverse=True
+        )
+    )
+
+
+class ProfilingMiddleware:
+    """Профилирует часть запросов и сохраняет стеки и SQL-запросы.
+
+    Включается PROFILING_ENABLED. Сохраняются случайные запросы с
+    вероятностью PROFILING_SAMPLE_RATE и все запросы дольше
+    PROFILING_SLOW_THRESHOLD секунд; чтобы поймать медленные, при
+    заданном пороге сэмплируется каждый запрос. Потоковый ответ
+    профилируется до конца его отдачи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+        sampled = random.random() < settings.PROFILING_SAMPLE_RATE
+        if not sampled and not settings.PROFILING_SLOW_THRESHOLD:
+            return self.get_response(request)
+
+        queries = QueryLog(settings.PROFILING_MAX_QUERIES)
+        started_at = timezone.now()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            with wrap_connections(queries):
+                response = self.get_response(request)
+        except BaseException:
+            sampler.stop()
+            raise
+
+        finish = partial(
+            self.finish,
+            request,
+            response,
+            queries,
+            sampled,
+            started_at,
+            started,
+        )
+        if not observe_stream(
+            response, partial(wrap_connections, queries), finish
+        ):
+            finish()
+        return response
+
+    def finish(self, request, response, queries, sampled, started_at, started):
+        """Останавливает сэмплирование и сохраняет профиль, если нужно."""
+        stacks = sampler.stop()
+        duration = time.perf_counter() - started
+        if not sampled and duration < settings.PROFILING_SLOW_THRESHOLD:
+            return
+        profile = {
+            "action": get_action_name(request),
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "started": started_at.isoformat(),
+            "duration": duration,
+            "sampled": sampled,
+            "interval": settings.PROFILING_INTERVAL,
+            "query_count": queries.count,
+            "queries": queries.queries,
+            "stacks": stacks,
+        }
+        try:
+            save_profile(profile)
+        except OSError:
+            logger.exception("Не удалось сохранить профиль запроса")
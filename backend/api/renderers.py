@@ -0,0 +1,202 @@
+import csv
+import json
+import tempfile
+from abc import ABCMeta, abstractmethod
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+SHOPPING_LIST_TITLE = "Список покупок для Foodgram:"
+STREAM_CHUNK_LINES = 500
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def _orjson_default(obj):
+    """Типы, которые orjson не сериализует сам, — как в JSONEncoder DRF."""
+    if isinstance(obj, Decimal) and not api_settings.COERCE_DECIMAL_TO_STRING:
+        return float(obj)
+    return JSONEncoder().default(obj)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """JSON-рендерер на orjson с тем же результатом, что и JSONRenderer.
+
+    Даты и время передаются в JSONEncoder DRF, чтобы формат совпадал
+    со стандартным рендерером; Decimal и ленивые строки обрабатываются
+    так же. Кириллица выводится как есть, в UTF-8. Если orjson
+    не установлен или клиент запросил отступы, используется JSONRenderer.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(
+            accepted_media_type or "", renderer_context or {}
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        ret = orjson.dumps(data, default=_orjson_default, option=self.options)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+            ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(renderers.BaseRenderer, metaclass=ABCMeta):
+    """Базовый рендерер списка покупок.
+
+    Список отдаётся потоково через stream(), который принимает итератор
+    кортежей (название, единица измерения, количество) и склеивает
+    строки из iter_lines(). Метод render() используется только для
+    ответов с ошибками и возвращает JSON.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(
+            data, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+
+    @abstractmethod
+    def iter_lines(self, items):
+        """Строки документа для кортежей списка покупок."""
+
+    def stream(self, items):
+        """Склеивает строки в блоки, чтобы не отдавать их по одной."""
+        buffer = []
+        for line in self.iter_lines(items):
+            buffer.append(line)
+            if len(buffer) >= STREAM_CHUNK_LINES:
+                yield "".join(buffer).encode(self.charset)
+                buffer.clear()
+        if buffer:
+            yield "".join(buffer).encode(self.charset)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+    def iter_lines(self, items):
+        yield f"{SHOPPING_LIST_TITLE}\n\n"
+        for name, unit, amount in items:
+            yield f"- {name} ({unit}) — {amount}\n"
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def iter_lines(self, items):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(("name", "measurement_unit", "amount"))
+        for item in items:
+            yield writer.writerow(item)
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = "application/json"
+    format = "json"
+
+    def iter_lines(self, items):
+        separator = "["
+        for name, unit, amount in items:
+            yield separator + json.dumps(
+                {"name": name, "measurement_unit": unit, "amount": amount},
+                ensure_ascii=False,
+            )
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    """Рендерер списка покупок в PDF (требуется reportlab).
+
+    В отличие от остальных форматов, PDF не потоковый: Canvas держит
+    в памяти все страницы до save(), и только затем документ
+    записывается во временный файл (на диск при превышении
+    SHOPPING_LIST_PDF_SPOOL_SIZE) и отдаётся блоками. Пик памяти растёт
+    линейно с числом строк, примерно 250 байт на строку: около 3 МБ
+    на 10 000 строк и 13 МБ на 50 000 (tracemalloc). Строк не больше,
+    чем ингредиентов в справочнике, поэтому это допустимо.
+    """
+
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+    font_name = "ShoppingListFont"
+    font_size = 11
+    margin = 50
+
+    def _register_font(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+            )
+
+    def iter_lines(self, items):
+        for name, unit, amount in items:
+            yield f"- {name} ({unit}) — {amount}"
+
+    def stream(self, items):
+        self._register_font()
+        with tempfile.SpooledTemporaryFile(
+            max_size=settings.SHOPPING_LIST_PDF_SPOOL_SIZE
+        ) as file:
+            pdf = canvas.Canvas(file, pagesize=A4)
+            width, height = A4
+            line_height = self.font_size * 1.5
+            pdf.setFont(self.font_name, self.font_size + 3)
+            y = height - self.margin
+            pdf.drawString(self.margin, y, SHOPPING_LIST_TITLE)
+            y -= line_height * 2
+            pdf.setFont(self.font_name, self.font_size)
+            for line in self.iter_lines(items):
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(self.font_name, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(self.margin, y, line)
+                y -= line_height
+            pdf.save()
+
+            file.seek(0)
+            while chunk := file.read(FILE_CHUNK_SIZE):
+                yield chunk
+
+
+SHOPPING_LIST_RENDERERS = [
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+]
+if canvas is not None:
+    SHOPPING_LIST_RENDERERS.append(ShoppingListPDFRenderer)
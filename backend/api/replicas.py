@@ -0,0 +1,81 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+# Реплика, выбранная для текущего запроса, или None — читать с primary.
+_read_alias = ContextVar("read_alias", default=None)
+
+
+@contextmanager
+def read_from_primary():
+    """Читает с primary внутри блока, даже если запрос читает с реплики."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Направляет чтение на реплику, выбранную ReplicaMiddleware.
+
+    Вне запросов (команды, фоновые потоки) и внутри транзакции на
+    primary чтение идёт с primary, запись — всегда на primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и primary.
+        return True
+
+
+class ReplicaMiddleware:
+    """Выбирает реплику для чтения в безопасных запросах.
+
+    После изменяющего запроса клиент получает cookie REPLICA_PIN_COOKIE
+    на REPLICA_PIN_SECONDS секунд и всё это время читает с primary,
+    чтобы видеть свои изменения, пока они не дошли до реплик. Время
+    отдачи потоковых ответов читается с primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = settings.DB_REPLICAS
+        if not replicas:
+            return self.get_response(request)
+
+        alias = None
+        if (
+            request.method in SAFE_METHODS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        ):
+            alias = random.choice(replicas)
+        token = _read_alias.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -1,6 +1,5 @@
 from django.db import transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 from recipes.models import (
@@ -11,9 +10,66 @@ from recipes.models import (
     Ingredient,
     IngredientInRecipe,
     Recipe,
+    ShoppingListItem,
 )
 from users.models import User
 
+from .images import (
+    DISPLAY_VARIANT,
+    THUMBNAIL_VARIANT,
+    get_variants_field,
+    image_srcset,
+    image_url,
+    schedule_image_processing,
+)
+from .signals import paused_sync
+from .uploads import prepare_image_upload
+
+
+class ImageVariantField(serializers.ReadOnlyField):
+    """Ссылка на обработанный вариант изображения или на оригинал."""
+
+    def __init__(self, variant=DISPLAY_VARIANT, **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance
+
+    def to_representation(self, instance):
+        return image_url(
+            instance._meta.get_field(self.source).storage,
+            getattr(instance, self.source).name,
+            getattr(instance, get_variants_field(self.source)),
+            self.context.get("request"),
+            self.variant,
+        )
+
+
+class ImageUploadField(serializers.ImageField):
+    """Изображение строкой base64 (data URI) или файлом multipart.
+
+    base64 декодируется по частям во временный файл, размер и
+    разрешение проверяются до декодирования пикселей.
+    """
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(prepare_image_upload(data))
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """Значение srcset из готовых вариантов изображения."""
+
+    def get_attribute(self, instance):
+        return instance
+
+    def to_representation(self, instance):
+        return image_srcset(
+            instance._meta.get_field(self.source).storage,
+            getattr(instance, get_variants_field(self.source)),
+            self.context.get("request"),
+        )
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -24,17 +80,19 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class UserSerializer(DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
-    avatar = serializers.ImageField(read_only=True)
+    avatar = ImageVariantField()
 
     class Meta(DjoserUserSerializer.Meta):
         model = User
         fields = DjoserUserSerializer.Meta.fields + ("is_subscribed", "avatar")
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         user = self.context.get("request").user
         return (
             user.is_authenticated
-            and user.following.filter(author=obj).exists()
+            and user.follower.filter(author=obj).exists()
         )
 
 
@@ -71,7 +129,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField(read_only=True)
+    image = ImageVariantField()
 
     class Meta:
         model = Recipe
@@ -88,6 +146,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         user = self.context.get("request").user
         return (
             user.is_authenticated
@@ -95,6 +155,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         user = self.context.get("request").user
         return (
             user.is_authenticated
@@ -104,7 +166,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    image = Base64ImageField(required=True, allow_null=False)
+    image = ImageUploadField(required=True, allow_null=False)
     ingredients = RecipeIngredientCreateSerializer(
         many=True, allow_empty=False
     )
@@ -157,9 +219,24 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return data
 
     def _set_ingredients(self, recipe, ingredients_data):
-        """Вспомогательный метод для создания/обновления ингредиентов."""
+        """Вспомогательный метод для создания/обновления ингредиентов.
+
+        Если рецепт уже лежит в чьих-то списках покупок, разница
+        в количествах применяется к агрегированным спискам одним пакетом,
+        а не сигналами по каждой строке.
+        """
         if self.instance:
-            recipe.ingredients.clear()
+            amounts = {
+                ing_data["id"].id: ing_data["amount"]
+                for ing_data in ingredients_data
+            }
+            for ingredient_id, amount in recipe.recipe_ingredients.values_list(
+                "ingredient_id", "amount"
+            ):
+                amounts[ingredient_id] = amounts.get(ingredient_id, 0) - amount
+            ShoppingListItem.objects.apply_recipe_amounts(recipe.pk, amounts)
+            with paused_sync():
+                recipe.ingredients.clear()
 
         IngredientInRecipe.objects.bulk_create(
             [
@@ -186,6 +263,8 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         self._set_ingredients(recipe, ingredients_data)
 
         recipe.save()
+        schedule_image_processing(recipe, "image")
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
         return recipe
 
     @transaction.atomic
@@ -199,7 +278,11 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         if image is not None:
             instance.image = image
 
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        if image is not None:
+            schedule_image_processing(instance, "image")
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+        return instance
 
     def to_representation(self, instance):
         """Используем ReadSerializer для вывода
@@ -210,34 +293,50 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(read_only=True)
+    image = ImageVariantField()
+    image_thumbnail = ImageVariantField(
+        source="image", variant=THUMBNAIL_VARIANT
+    )
+    image_srcset = ImageSrcsetField(source="image")
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = (
+            "id",
+            "name",
+            "image",
+            "image_thumbnail",
+            "image_srcset",
+            "cooking_time",
+        )
         read_only_fields = fields
 
 
 class SubscriptionSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ("recipes", "recipes_count")
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
-    def get_recipes(self, obj):
-        request = self.context.get("request")
+    @staticmethod
+    def parse_recipes_limit(request):
+        """Возвращает значение recipes_limit из запроса или None."""
         limit = request.query_params.get("recipes_limit")
-        recipes = obj.recipes.all()
+        try:
+            limit = int(limit)
+        except (ValueError, TypeError):
+            return None
+        return limit if limit >= 0 else None
 
-        if limit:
-            try:
-                recipes = recipes[: int(limit)]
-            except (ValueError, TypeError):
-                pass
+    def get_recipes(self, obj):
+        if hasattr(obj, "recipes_preview"):
+            recipes = obj.recipes_preview
+        else:
+            limit = self.parse_recipes_limit(self.context.get("request"))
+            recipes = obj.recipes.all()
+            if limit is not None:
+                recipes = recipes[:limit]
 
         serializer = RecipeMinifiedSerializer(
             recipes, many=True, context=self.context
@@ -245,9 +344,22 @@ class SubscriptionSerializer(UserSerializer):
         return serializer.data
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source="ingredient.id")
+    name = serializers.ReadOnlyField(source="ingredient.name")
+    measurement_unit = serializers.ReadOnlyField(
+        source="ingredient.measurement_unit"
+    )
+    amount = serializers.ReadOnlyField(source="total_amount")
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ("id", "name", "measurement_unit", "amount")
+
+
 class SetAvatarSerializer(serializers.Serializer):
-    avatar = Base64ImageField(required=True)
+    avatar = ImageUploadField(required=True)
 
 
 class SetAvatarResponseSerializer(serializers.Serializer):
-    avatar = serializers.ImageField(read_only=True)
+    avatar = ImageVariantField()
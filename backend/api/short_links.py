@@ -0,0 +1,94 @@
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Case, F, PositiveBigIntegerField, Value, When
+
+from recipes.models import ShortLink
+
+from .cache import LRUCache
+
+
+class ShortLinkResolver:
+    """Разрешение коротких ссылок и пакетный учёт переходов.
+
+    Код ищется сначала в LRU в памяти процесса, затем в БД. При удалении
+    ссылки код вытесняется из LRU сигналом; в других процессах он может
+    остаться, но коды не переиспользуются, поэтому такая ссылка ведёт на
+    удалённый рецепт, а не на чужой. Переходы
+    копятся в памяти и записываются одним UPDATE, когда их набирается
+    SHORT_LINK_HITS_FLUSH_SIZE или с прошлой записи прошло
+    SHORT_LINK_HITS_FLUSH_INTERVAL секунд, а также при остановке процесса.
+    """
+
+    def __init__(self):
+        self._cache = None
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = LRUCache(settings.SHORT_LINK_CACHE_SIZE)
+        return self._cache
+
+    def resolve(self, code):
+        """Возвращает (id ссылки, id рецепта) или None, если кода нет."""
+        entry = self.cache.get(code)
+        if entry is None:
+            entry = (
+                ShortLink.objects.filter(code=code)
+                .values_list("pk", "recipe_id")
+                .first()
+            )
+            if entry is not None:
+                self.cache.set(code, entry)
+        return entry
+
+    def evict(self, code):
+        self.cache.delete(code)
+
+    def record_hit(self, link_id):
+        with self._lock:
+            self._hits[link_id] += 1
+            self._pending += 1
+            due = (
+                self._pending >= settings.SHORT_LINK_HITS_FLUSH_SIZE
+                or time.monotonic() - self._flushed_at
+                >= settings.SHORT_LINK_HITS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные переходы в БД одним запросом."""
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+        if not hits:
+            return
+        try:
+            ShortLink.objects.filter(pk__in=hits).update(
+                hits=F("hits")
+                + Case(
+                    *(
+                        When(pk=link_id, then=Value(count))
+                        for link_id, count in hits.items()
+                    ),
+                    output_field=PositiveBigIntegerField(),
+                )
+            )
+        except DatabaseError:
+            with self._lock:
+                self._hits.update(hits)
+                self._pending += sum(hits.values())
+
+
+short_link_resolver = ShortLinkResolver()
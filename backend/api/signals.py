@@ -0,0 +1,300 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    ShortLink,
+)
+from users.models import Subscription, User
+
+from .cache import response_cache
+from .conditional import bump_table_version
+from .ingredient_index import ingredient_index
+from .metrics import connection_metrics
+from .pagination import invalidate_table_count
+from .short_links import short_link_resolver
+
+# Внутри paused_sync() сигналы не обновляют денормализованные данные:
+# вызывающий код применяет изменения сам, одним пакетом.
+_sync_paused = ContextVar("sync_paused", default=False)
+
+
+# Теги кэша ответов, в которых участвуют счётчики моделей.
+COUNTER_CACHE_TAGS = {Recipe: "recipes", User: "users"}
+
+
+@contextmanager
+def paused_sync():
+    """Отключает обновление списков покупок и счётчиков внутри блока."""
+    token = _sync_paused.set(True)
+    try:
+        yield
+    finally:
+        _sync_paused.reset(token)
+
+
+def is_deleted_with(origin, *models):
+    """Удаляется ли объект каскадом вместе с объектом одной из models."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+def adjust_counter(model, pk, field, delta):
+    """Атомарно изменяет денормализованный счётчик через F().
+
+    update() не отправляет сигналы и не обновляет auto_now, поэтому
+    updated_at для ETag и кэш ответов со счётчиком обновляются здесь.
+    """
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}, updated_at=timezone.now()
+    )
+    response_cache.invalidate(COUNTER_CACHE_TAGS[model])
+
+
+def touch_user_relations(user_id):
+    """Отмечает изменение избранного, списка покупок или подписок."""
+    User.objects.filter(pk=user_id).update(relations_updated_at=timezone.now())
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    """Считает подключения к БД для метрик."""
+    connection_metrics.record(connection.alias)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Сбрасывает индекс автодополнения при изменении ингредиентов."""
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+def update_recipe_search_vectors(sender, instance, created, **kwargs):
+    """Обновляет поисковые векторы рецептов при переименовании ингредиента."""
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update_search_vector()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created=False, **kwargs):
+    """Отмечает изменёнными рецепты с изменённым ингредиентом."""
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update(
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, created, update_fields, **kwargs):
+    """Отмечает изменёнными рецепты автора при изменении его профиля."""
+    if created or (
+        update_fields is not None and set(update_fields) == {"last_login"}
+    ):
+        return
+    Recipe.objects.filter(author=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_list_count(sender, created=True, **kwargs):
+    """Сбрасывает число строк для пагинации и версию таблицы для ETag."""
+    if created:
+        invalidate_table_count(sender)
+        bump_table_version(sender)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def invalidate_recipe_responses(sender, **kwargs):
+    """Сбрасывает кэш ответов с рецептами."""
+    response_cache.invalidate("recipes")
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_responses(sender, **kwargs):
+    """Сбрасывает кэш ответов с ингредиентами."""
+    response_cache.invalidate("ingredients")
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_responses(sender, update_fields=None, **kwargs):
+    """Сбрасывает кэш ответов с данными пользователей.
+
+    Обновление только last_login при входе на ответы не влияет.
+    """
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    response_cache.invalidate("users")
+
+
+@receiver(post_delete, sender=ShortLink)
+def evict_short_link(sender, instance, **kwargs):
+    """Убирает код удалённой ссылки, в том числе вместе с рецептом, из LRU."""
+    short_link_resolver.evict(instance.code)
+
+
+@receiver(pre_save, sender=ShoppingCart)
+@receiver(pre_save, sender=IngredientInRecipe)
+def remember_shopping_list_source(sender, instance, **kwargs):
+    """Запоминает прежнее состояние строки для пересчёта списков."""
+    instance._previous_state = (
+        sender.objects.filter(pk=instance.pk).values().first()
+        if instance.pk is not None and not _sync_paused.get()
+        else None
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def sync_shopping_list_on_cart_save(sender, instance, **kwargs):
+    """Учитывает добавленный или изменённый рецепт в списке покупок."""
+    if _sync_paused.get():
+        return
+    previous = getattr(instance, "_previous_state", None)
+    if previous is not None:
+        ShoppingListItem.objects.remove_recipe(
+            previous["user_id"], previous["recipe_id"]
+        )
+    ShoppingListItem.objects.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def sync_shopping_list_on_cart_delete(sender, instance, origin, **kwargs):
+    """Убирает рецепт из списка покупок.
+
+    При удалении рецепта или пользователя строки корзины удаляются
+    каскадом: рецепт убирается из всех списков сразу, а список удалённого
+    пользователя удаляется вместе с ним.
+    """
+    if _sync_paused.get() or is_deleted_with(origin, Recipe, User):
+        return
+    ShoppingListItem.objects.remove_recipe(
+        instance.user_id, instance.recipe_id
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def sync_shopping_lists_on_recipe_delete(sender, instance, **kwargs):
+    """Убирает удаляемый рецепт из списков покупок всех пользователей."""
+    if not _sync_paused.get():
+        ShoppingListItem.objects.remove_recipe_for_all(instance.pk)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def sync_shopping_lists_on_ingredient_save(sender, instance, **kwargs):
+    """Применяет изменение состава рецепта к спискам покупок."""
+    if _sync_paused.get():
+        return
+    previous = getattr(instance, "_previous_state", None)
+    if previous is not None:
+        ShoppingListItem.objects.apply_recipe_amounts(
+            previous["recipe_id"],
+            {previous["ingredient_id"]: -previous["amount"]},
+        )
+    ShoppingListItem.objects.apply_recipe_amounts(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}
+    )
+
+
+@receiver(pre_delete, sender=IngredientInRecipe)
+def sync_shopping_lists_on_ingredient_delete(
+    sender, instance, origin, **kwargs
+):
+    """Убирает удаляемый ингредиент рецепта из списков покупок.
+
+    При удалении рецепта он убирается из списков целиком, а строки
+    списков с удалённым ингредиентом удаляются каскадом.
+    """
+    if _sync_paused.get() or is_deleted_with(origin, Recipe, User, Ingredient):
+        return
+    ShoppingListItem.objects.apply_recipe_amounts(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+# Счётчик рецепта для каждой модели связи пользователя с рецептом.
+RECIPE_RELATION_COUNTERS = {
+    Favorite: "favorites_count",
+    ShoppingCart: "in_carts_count",
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def count_added_recipe_relation(sender, instance, created, **kwargs):
+    """Увеличивает счётчик избранного или списков покупок у рецепта."""
+    if created and not _sync_paused.get():
+        adjust_counter(
+            Recipe, instance.recipe_id, RECIPE_RELATION_COUNTERS[sender], 1
+        )
+        touch_user_relations(instance.user_id)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def count_removed_recipe_relation(sender, instance, origin, **kwargs):
+    """Уменьшает счётчик избранного или списков покупок у рецепта.
+
+    При удалении самого рецепта его счётчики не обновляются.
+    """
+    if not _sync_paused.get() and not is_deleted_with(origin, Recipe):
+        adjust_counter(
+            Recipe, instance.recipe_id, RECIPE_RELATION_COUNTERS[sender], -1
+        )
+        touch_user_relations(instance.user_id)
+
+
+@receiver(post_save, sender=Subscription)
+def count_added_follower(sender, instance, created, **kwargs):
+    """Увеличивает счётчик подписчиков автора."""
+    if created and not _sync_paused.get():
+        adjust_counter(User, instance.author_id, "followers_count", 1)
+        touch_user_relations(instance.user_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def count_removed_follower(sender, instance, **kwargs):
+    """Уменьшает счётчик подписчиков автора."""
+    if not _sync_paused.get():
+        adjust_counter(User, instance.author_id, "followers_count", -1)
+        touch_user_relations(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def count_added_recipe(sender, instance, created, **kwargs):
+    """Увеличивает счётчик рецептов автора."""
+    if created and not _sync_paused.get():
+        adjust_counter(User, instance.author_id, "recipes_count", 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_removed_recipe(sender, instance, origin, **kwargs):
+    """Уменьшает счётчик рецептов автора, если удаляется не он сам."""
+    if not _sync_paused.get() and not is_deleted_with(origin, User):
+        adjust_counter(User, instance.author_id, "recipes_count", -1)
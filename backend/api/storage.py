@@ -0,0 +1,62 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import DEFAULT_DB_ALIAS, connections
+
+HASH_LENGTH = 32
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+HASHED_NAME_RE = re.compile(rf"(^|/)[0-9a-f]{{{HASH_LENGTH}}}\.\w+$")
+
+
+def is_content_addressed(name):
+    """Имя файла получено из хеша его содержимого."""
+    return HASHED_NAME_RE.search(name) is not None
+
+
+def lock_file_name(name, using=DEFAULT_DB_ALIAS):
+    """Блокирует имя файла до конца текущей транзакции.
+
+    Берётся при сохранении уже существующего файла и при удалении
+    файла без ссылок: удаление ждёт фиксации строки, которая только
+    что сослалась на файл, а сохранение после удаления пишет файл
+    заново. Вне транзакции блокировка сразу снимается.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", [name]
+        )
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по хешу содержимого.
+
+    Каталог из upload_to сохраняется, имя файла заменяется на
+    SHA-256 содержимого с исходным расширением. Файл с одинаковым
+    содержимым записывается один раз, а изменённый получает новое имя,
+    поэтому ссылки на медиафайлы можно кэшировать бессрочно. Если файл
+    уже есть, его существование перепроверяется под lock_file_name:
+    параллельное удаление могло решить, что на него никто не ссылается.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            return super().save(name, content, max_length)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(
+            directory, f"{digest.hexdigest()[:HASH_LENGTH]}{extension}"
+        )
+        if self.exists(name):
+            lock_file_name(name)
+            if self.exists(name):
+                return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from .metrics import get_query_budget
+
+
+@contextmanager
+def assert_query_budget(action, method="GET", using=DEFAULT_DB_ALIAS):
+    """Падает, если код в блоке выполнил больше запросов, чем в бюджете.
+
+    Бюджет берётся из QUERY_BUDGETS по имени маршрута и методу:
+
+        with assert_query_budget("recipes-list"):
+            client.get("/api/recipes/")
+    """
+    budget = get_query_budget(action, method)
+    if budget is None:
+        raise AssertionError(f"Для {method} {action} не задан бюджет.")
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    if len(context) > budget:
+        queries = "\n".join(
+            f"{number}. {query['sql']}"
+            for number, query in enumerate(context.captured_queries, 1)
+        )
+        raise AssertionError(
+            f"{method} {action}: {len(context)} SQL-запросов при бюджете "
+            f"{budget}.\n{queries}"
+        )
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.checks import check_database_connections, check_response_cache
+
+LOCMEM = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+REDIS = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://localhost:6379/0",
+    }
+}
+
+
+class ResponseCacheCheckTests(SimpleTestCase):
+    """Кэш ответов требует общего для процессов кэша."""
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True, CACHES=LOCMEM)
+    def test_enabled_with_local_memory_cache(self):
+        errors = check_response_cache(None)
+
+        self.assertEqual([error.id for error in errors], ["api.E002"])
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True, CACHES=REDIS)
+    def test_enabled_with_shared_cache(self):
+        self.assertEqual(check_response_cache(None), [])
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False, CACHES=LOCMEM)
+    def test_disabled(self):
+        self.assertEqual(check_response_cache(None), [])
+
+
+def make_databases(conn_max_age, pool):
+    options = {"pool": {"max_size": 4}} if pool else {}
+    return {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "CONN_MAX_AGE": conn_max_age,
+            "OPTIONS": options,
+        }
+    }
+
+
+@override_settings(
+    WEB_CONCURRENCY=2,
+    GUNICORN_THREADS=2,
+    IMAGE_PROCESSING_WORKERS=2,
+    DB_MAX_CONNECTIONS=90,
+)
+class DatabaseConnectionsCheckTests(SimpleTestCase):
+    """Настройки соединений с БД, с которыми Django не запустится."""
+
+    def get_error_ids(self, conn_max_age, pool):
+        with override_settings(DATABASES=make_databases(conn_max_age, pool)):
+            return [error.id for error in check_database_connections(None)]
+
+    def test_pool_with_persistent_connections(self):
+        self.assertEqual(self.get_error_ids(60, pool=True), ["api.E003"])
+        self.assertEqual(self.get_error_ids(None, pool=True), ["api.E003"])
+
+    def test_pool_without_persistent_connections(self):
+        self.assertEqual(self.get_error_ids(0, pool=True), [])
+
+    def test_persistent_connections_without_pool(self):
+        self.assertEqual(self.get_error_ids(60, pool=False), [])
+
+    @mock.patch("api.checks.is_psycopg3", False)
+    def test_pool_requires_psycopg3(self):
+        self.assertEqual(self.get_error_ids(0, pool=True), ["api.E001"])
+
+    @override_settings(WEB_CONCURRENCY=30)
+    def test_too_many_connections(self):
+        # 30 процессов по max_size = 4 соединения.
+        self.assertEqual(self.get_error_ids(0, pool=True), ["api.W001"])
@@ -0,0 +1,92 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class ListValidatorsTests(APITestCase):
+    """ETag списка рецептов меняется при любом изменении, влияющем на него."""
+
+    url = "/api/recipes/?ordering=-favorites_count"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.fan = (
+            User.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                first_name=name,
+                last_name=name,
+                password="password",
+            )
+            for name in ("author", "fan")
+        )
+        cls.first, cls.second = (
+            Recipe.objects.create(
+                author=cls.author,
+                name=name,
+                text=name,
+                cooking_time=10,
+                image="recipes/images/test.jpg",
+            )
+            for name in ("Первый", "Второй")
+        )
+
+    def get_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def assertNotModified(self, etag):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def assertModified(self, etag):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_list_not_modified(self):
+        self.assertNotModified(self.get_etag())
+
+    def test_favorite_changes_anonymous_etag(self):
+        etag = self.get_etag()
+
+        self.client.force_authenticate(self.fan)
+        response = self.client.post(f"/api/recipes/{self.second.pk}/favorite/")
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(None)
+
+        self.assertModified(etag)
+
+    def test_delete_changes_etag(self):
+        etag = self.get_etag()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.delete()
+
+        self.assertModified(etag)
+
+    def test_create_changes_etag(self):
+        etag = self.get_etag()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                author=self.author,
+                name="Третий",
+                text="Третий",
+                cooking_time=5,
+                image="recipes/images/test.jpg",
+            )
+
+        self.assertModified(etag)
+
+    def test_list_validators_do_not_count_rows(self):
+        etag = self.get_etag()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertNotModified(etag)
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("COUNT(", queries[0]["sql"])
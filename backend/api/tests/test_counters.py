@@ -0,0 +1,115 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+class CounterSyncTests(TestCase):
+    """Счётчики обновляются при любых изменениях, в том числе из админки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.author, cls.fan = (
+            User.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                first_name=name,
+                last_name=name,
+                password="password",
+                is_staff=name == "admin",
+                is_superuser=name == "admin",
+            )
+            for name in ("admin", "author", "fan")
+        )
+        cls.recipe, cls.other_recipe = (
+            Recipe.objects.create(
+                author=cls.author,
+                name=name,
+                text=name,
+                cooking_time=10,
+                image="recipes/images/test.jpg",
+            )
+            for name in ("Суп", "Рагу")
+        )
+
+    def get_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        author = User.objects.get(pk=self.author.pk)
+        return {
+            "favorites_count": recipe.favorites_count,
+            "in_carts_count": recipe.in_carts_count,
+            "recipes_count": author.recipes_count,
+            "followers_count": author.followers_count,
+        }
+
+    def assertCounters(self, **expected):
+        counters = self.get_counters()
+        self.assertEqual(counters, {**counters, **expected})
+        call_command("reconcile_counters", stdout=StringIO())
+        self.assertEqual(self.get_counters(), counters)
+
+    def test_recipes_counted(self):
+        self.assertCounters(recipes_count=2)
+
+        self.other_recipe.delete()
+
+        self.assertCounters(recipes_count=1)
+
+    def test_relations_counted(self):
+        Favorite.objects.create(user=self.fan, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.fan, recipe=self.recipe)
+        Subscription.objects.create(user=self.fan, author=self.author)
+        self.assertCounters(
+            favorites_count=1, in_carts_count=1, followers_count=1
+        )
+
+        Favorite.objects.filter(user=self.fan).delete()
+        ShoppingCart.objects.filter(user=self.fan).delete()
+        Subscription.objects.filter(user=self.fan).delete()
+        self.assertCounters(
+            favorites_count=0, in_carts_count=0, followers_count=0
+        )
+
+    def test_deleted_user_relations_uncounted(self):
+        Favorite.objects.create(user=self.fan, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.fan, recipe=self.recipe)
+        Subscription.objects.create(user=self.fan, author=self.author)
+
+        self.fan.delete()
+
+        self.assertCounters(
+            favorites_count=0, in_carts_count=0, followers_count=0
+        )
+
+    def test_admin_changes_counted(self):
+        self.client.force_login(self.admin)
+
+        response = self.client.post(
+            "/admin/recipes/favorite/add/",
+            {"user": self.fan.pk, "recipe": self.recipe.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(favorites_count=1)
+
+        response = self.client.post(
+            "/admin/recipes/favorite/",
+            {
+                "action": "delete_selected",
+                "_selected_action": Favorite.objects.values_list(
+                    "pk", flat=True
+                ),
+                "post": "yes",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(favorites_count=0)
+
+        response = self.client.post(
+            f"/admin/recipes/recipe/{self.other_recipe.pk}/delete/",
+            {"post": "yes"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(recipes_count=1)
@@ -0,0 +1,177 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Value
+from django.test import SimpleTestCase, override_settings
+from rest_framework import viewsets
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.fast_serializers import FastReadMixin
+from api.filters import RecipeOrderingFilter
+from api.views import RecipeViewSet
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+)
+from users.models import Subscription, User
+
+VARIANTS = {
+    name: {"name": f"recipes/images/test_{name}.webp", "width": width}
+    for name, width in (("large", 1280), ("medium", 640), ("small", 320))
+}
+
+
+class FastReadParityTests(APITestCase):
+    """Быстрый путь отдаёт то же, что и сериализаторы DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.cook, cls.baker = (
+            User.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                first_name=name,
+                last_name=name,
+                password="password",
+            )
+            for name in ("reader", "cook", "baker")
+        )
+        User.objects.filter(pk=cls.baker.pk).update(
+            avatar="users/avatars/baker.jpg"
+        )
+        salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        flour = Ingredient.objects.create(name="мука", measurement_unit="г")
+        recipes = []
+        for number in range(6):
+            author = cls.cook if number % 2 else cls.baker
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f"Рецепт {number}",
+                text="Описание",
+                cooking_time=number + 1,
+                image=f"recipes/images/test_{number}.jpg",
+                image_variants=VARIANTS if number % 3 == 0 else {},
+            )
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=salt, amount=number + 1
+            )
+            if number % 2:
+                IngredientInRecipe.objects.create(
+                    recipe=recipe, ingredient=flour, amount=100
+                )
+            recipes.append(recipe)
+        Favorite.objects.create(user=cls.reader, recipe=recipes[0])
+        Favorite.objects.create(user=cls.reader, recipe=recipes[3])
+        ShoppingCart.objects.create(user=cls.reader, recipe=recipes[1])
+        Subscription.objects.create(user=cls.reader, author=cls.cook)
+        Subscription.objects.create(user=cls.reader, author=cls.baker)
+        for author in (cls.cook, cls.baker):
+            User.objects.filter(pk=author.pk).update(
+                recipes_count=Recipe.objects.filter(author=author).count()
+            )
+
+    def get_both(self, url):
+        """Ответы быстрого пути и сериализаторов DRF на один запрос."""
+        responses = []
+        for enabled in (True, False):
+            with override_settings(FAST_READ_SERIALIZERS_ENABLED=enabled):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            responses.append(response)
+        return responses
+
+    def assertSameResponses(self, urls):
+        for url in urls:
+            with self.subTest(url=url):
+                fast, regular = self.get_both(url)
+                self.assertTrue(regular.json()["results"])
+                self.assertEqual(fast.content, regular.content)
+
+    def test_recipes_anonymous(self):
+        self.assertSameResponses(
+            (
+                "/api/recipes/",
+                "/api/recipes/?limit=2&page=2",
+                f"/api/recipes/?author={self.cook.pk}",
+                "/api/recipes/?ordering=cooking_time",
+                "/api/recipes/?pagination=cursor&limit=4",
+            )
+        )
+
+    def test_recipes_authenticated(self):
+        self.client.force_authenticate(self.reader)
+
+        self.assertSameResponses(
+            (
+                "/api/recipes/",
+                "/api/recipes/?is_favorited=1",
+                "/api/recipes/?is_in_shopping_cart=1",
+                f"/api/recipes/?author={self.baker.pk}&is_favorited=1",
+                "/api/recipes/?ordering=-favorites_count",
+            )
+        )
+
+    def test_subscriptions(self):
+        self.client.force_authenticate(self.reader)
+
+        self.assertSameResponses(
+            (
+                "/api/users/subscriptions/",
+                "/api/users/subscriptions/?recipes_limit=2",
+                "/api/users/subscriptions/?recipes_limit=0",
+                "/api/users/subscriptions/?limit=1&page=2",
+            )
+        )
+
+
+class FastReadMixinTests(SimpleTestCase):
+    def test_fast_list_required_for_list(self):
+        with self.assertRaises(ImproperlyConfigured):
+
+            class BrokenViewSet(FastReadMixin, viewsets.ViewSet):
+                fast_read_actions = ("list",)
+
+    def test_fast_list_optional_for_other_actions(self):
+        class DetailViewSet(FastReadMixin, viewsets.ViewSet):
+            fast_read_actions = ("retrieve",)
+
+        self.assertFalse(hasattr(DetailViewSet, "fast_list"))
+
+
+class RecipeOrderingTests(SimpleTestCase):
+    """Рецепты с равными значениями сортировки упорядочены по id."""
+
+    def get_order_by(self, url):
+        view = RecipeViewSet(
+            request=Request(APIRequestFactory().get(url)),
+            format_kwarg=None,
+        )
+        # Ранг поиска добавляет фильтр поиска, здесь он не нужен.
+        queryset = Recipe.objects.annotate(search_rank=Value(0.0))
+        return (
+            RecipeOrderingFilter()
+            .filter_queryset(view.request, queryset, view)
+            .query.order_by
+        )
+
+    def test_id_added_in_last_field_direction(self):
+        for url, order_by in (
+            ("/api/recipes/", ("-pub_date", "-id")),
+            (
+                "/api/recipes/?ordering=favorites_count",
+                ("favorites_count", "id"),
+            ),
+            (
+                "/api/recipes/?ordering=-favorites_count",
+                ("-favorites_count", "-id"),
+            ),
+            (
+                "/api/recipes/?ordering=name,-pub_date",
+                ("name", "-pub_date", "-id"),
+            ),
+            ("/api/recipes/?search=суп", ("-search_rank", "-pub_date", "-id")),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.get_order_by(url), order_by)
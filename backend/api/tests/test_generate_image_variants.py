@@ -0,0 +1,43 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.management.commands.generate_image_variants import Command
+from recipes.models import Recipe
+
+
+class ProcessWindowTests(SimpleTestCase):
+    """Ключи читаются не быстрее, чем обрабатываются изображения."""
+
+    def test_pending_tasks_bounded(self):
+        lock = threading.Lock()
+        finished = 0
+        ahead = []
+
+        def process(model, pk, field_name):
+            nonlocal finished
+            time.sleep(0.002)
+            with lock:
+                finished += 1
+            return pk % 3 != 0
+
+        def read_pks():
+            for pk in range(1, 41):
+                with lock:
+                    ahead.append(pk - 1 - finished)
+                yield pk
+
+        with mock.patch(
+            "api.management.commands.generate_image_variants."
+            "process_image_in_worker",
+            side_effect=process,
+        ), ThreadPoolExecutor(max_workers=2) as executor:
+            result = Command()._process(
+                executor, Recipe, "image", read_pks(), window=4
+            )
+
+        self.assertEqual(result, (27, 13))
+        self.assertLessEqual(max(ahead), 4)
@@ -0,0 +1,227 @@
+import base64
+import io
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from api.images import (
+    delete_image,
+    process_image,
+    render_variants,
+    schedule_image_processing,
+)
+from users.models import User
+
+
+def make_image(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 300), color).save(buffer, "JPEG")
+    return ContentFile(buffer.getvalue(), name="avatar.jpg")
+
+
+class ScheduleImageProcessingTests(TestCase):
+    """Прежние варианты удаляются только после фиксации транзакции."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_PROCESSING_ASYNC=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            first_name="user",
+            last_name="user",
+            password="password",
+        )
+        self.user.avatar.save("avatar.jpg", make_image("red"))
+        self.assertTrue(process_image(User, self.user.pk, "avatar"))
+        self.user.refresh_from_db()
+        self.old_variants = self.user.avatar_variants
+        self.storage = self.user.avatar.storage
+
+    def assertVariantsExist(self, variants, exists=True):
+        for rendition in variants.values():
+            self.assertEqual(self.storage.exists(rendition["name"]), exists)
+
+    def replace_avatar(self):
+        self.user.avatar.save("avatar.jpg", make_image("blue"), save=False)
+        self.user.save(update_fields=["avatar", "updated_at"])
+        schedule_image_processing(self.user, "avatar")
+
+    def test_rollback_keeps_old_variants(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self.replace_avatar()
+                    raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_variants, self.old_variants)
+        self.assertVariantsExist(self.old_variants)
+
+    def test_commit_replaces_variants(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.replace_avatar()
+            self.assertVariantsExist(self.old_variants)
+        for callback in callbacks:
+            callback()
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar_variants)
+        self.assertNotEqual(self.user.avatar_variants, self.old_variants)
+        self.assertVariantsExist(self.old_variants, exists=False)
+        self.assertVariantsExist(self.user.avatar_variants)
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=False)
+class AvatarUploadTests(APITestCase):
+    """Повторная загрузка того же аватара не удаляет его файл."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            first_name="user",
+            last_name="user",
+            password="password",
+        )
+        self.client.force_authenticate(self.user)
+
+    def put_avatar(self, color):
+        image = make_image(color).read()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                "/api/users/me/avatar/",
+                {
+                    "avatar": "data:image/jpeg;base64,"
+                    + base64.b64encode(image).decode()
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        return self.user.avatar.name
+
+    def test_same_avatar_again(self):
+        name = self.put_avatar("red")
+
+        self.assertEqual(self.put_avatar("red"), name)
+        self.assertTrue(self.user.avatar.storage.exists(name))
+
+    def test_new_avatar_deletes_old_file(self):
+        old_name = self.put_avatar("red")
+
+        new_name = self.put_avatar("blue")
+
+        self.assertNotEqual(new_name, old_name)
+        self.assertFalse(self.user.avatar.storage.exists(old_name))
+        self.assertTrue(self.user.avatar.storage.exists(new_name))
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=False)
+class ConcurrentImageDeleteTests(TransactionTestCase):
+    """Удаление файла без ссылок ждёт транзакцию, сохранившую его."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.old_owner, self.new_owner = (
+            User.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                first_name=name,
+                last_name=name,
+                password="password",
+            )
+            for name in ("old", "new")
+        )
+        self.old_owner.avatar.save("avatar.jpg", make_image("red"))
+        self.name = self.old_owner.avatar.name
+
+    def in_thread(self, target):
+        def run():
+            try:
+                target()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        return thread
+
+    def test_delete_waits_for_new_reference(self):
+        saved, commit = threading.Event(), threading.Event()
+
+        def save_same_image():
+            with transaction.atomic():
+                self.new_owner.avatar.save("avatar.jpg", make_image("red"))
+                saved.set()
+                commit.wait(5)
+
+        def delete_old_avatar():
+            with transaction.atomic():
+                delete_image(self.old_owner, "avatar")
+                self.old_owner.save(update_fields=["avatar", "updated_at"])
+
+        saver = self.in_thread(save_same_image)
+        self.assertTrue(saved.wait(5))
+        deleter = self.in_thread(delete_old_avatar)
+        deleter.join(0.5)
+        self.assertTrue(deleter.is_alive())
+        commit.set()
+        saver.join(5)
+        deleter.join(5)
+
+        self.new_owner.refresh_from_db()
+        self.assertEqual(self.new_owner.avatar.name, self.name)
+        self.assertTrue(self.new_owner.avatar.storage.exists(self.name))
+
+    def test_save_restores_deleted_file(self):
+        storage = self.old_owner.avatar.storage
+        storage.delete(self.name)
+
+        self.new_owner.avatar.save("avatar.jpg", make_image("red"))
+
+        self.assertEqual(self.new_owner.avatar.name, self.name)
+        self.assertTrue(storage.exists(self.name))
+
+
+class RenderVariantsTests(TestCase):
+    def test_small_image_saved_once(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            user = User(username="user")
+            user.avatar.save("avatar.jpg", make_image("red"), save=False)
+            with mock.patch.object(
+                user.avatar.storage, "save", wraps=user.avatar.storage.save
+            ) as save:
+                variants = render_variants(
+                    user.avatar.storage, user.avatar.name
+                )
+
+        self.assertEqual(save.call_count, 2)
+        self.assertEqual(variants["medium"], variants["large"])
+        self.assertNotEqual(variants["small"], variants["medium"])
@@ -0,0 +1,96 @@
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from api.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+
+@override_settings(INGREDIENT_INDEX_TTL=300)
+class IngredientIndexTests(TestCase):
+    """Поиск по индексу ингредиентов в памяти и его сброс."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit="г")
+            for name in (
+                "соль",
+                "Соль морская",
+                "сахар",
+                "Straße-Brot",
+                "яблоко",
+            )
+        )
+
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.addCleanup(ingredient_index.invalidate)
+
+    def names(self, prefix="", limit=None):
+        return [
+            item["name"] for item in ingredient_index.search(prefix, limit)
+        ]
+
+    def test_casefold_prefix(self):
+        for prefix, names in (
+            ("соль", ["соль", "Соль морская"]),
+            ("СОЛЬ М", ["Соль морская"]),
+            ("с", ["сахар", "соль", "Соль морская"]),
+            ("STRASS", ["Straße-Brot"]),
+            ("хлеб", []),
+        ):
+            with self.subTest(prefix=prefix):
+                self.assertEqual(self.names(prefix), names)
+
+    def test_limit(self):
+        self.assertEqual(self.names("с", limit=2), ["сахар", "соль"])
+
+    def test_items_match_api_format(self):
+        salt = Ingredient.objects.get(name="соль")
+
+        self.assertEqual(
+            ingredient_index.search("соль", 1),
+            [{"id": salt.pk, "name": "соль", "measurement_unit": "г"}],
+        )
+
+    def test_rebuilt_after_ttl(self):
+        self.assertEqual(self.names("перец"), [])
+        # bulk_create не отправляет сигналы, как и изменения,
+        # сделанные другими процессами.
+        Ingredient.objects.bulk_create(
+            [Ingredient(name="перец", measurement_unit="г")]
+        )
+
+        self.assertEqual(self.names("перец"), [])
+        with mock.patch(
+            "api.ingredient_index.time.monotonic",
+            return_value=time.monotonic() + 301,
+        ):
+            self.assertEqual(self.names("перец"), ["перец"])
+
+    def test_invalidated_on_save_and_delete(self):
+        self.assertEqual(self.names("перец"), [])
+
+        pepper = Ingredient.objects.create(name="перец", measurement_unit="г")
+        self.assertEqual(self.names("перец"), ["перец"])
+
+        pepper.name = "перец чёрный"
+        pepper.save()
+        self.assertEqual(self.names("перец"), ["перец чёрный"])
+
+        pepper.delete()
+        self.assertEqual(self.names("перец"), [])
+
+    def test_api_uses_index(self):
+        self.names()
+
+        # Остаётся только запрос времени изменения для ETag.
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/ingredients/?name=СОЛЬ")
+
+        self.assertEqual(
+            [item["name"] for item in response.json()],
+            ["соль", "Соль морская"],
+        )
@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api.metrics import ObservedStream, endpoint_metrics, render_prometheus
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, ShoppingCart
+from users.models import User
+
+POOL_STATS = {
+    "default": {
+        "pool_min": 1,
+        "pool_max": 4,
+        "pool_size": 3,
+        "pool_available": 1,
+        "requests_waiting": 2,
+        "requests_num": 120,
+        "requests_wait_ms": 1500,
+    },
+    "replica_1": {"pool_max": 4, "pool_size": 1, "pool_available": 1},
+}
+
+
+class PoolMetricsTests(SimpleTestCase):
+    """Статистика пула соединений в формате Prometheus."""
+
+    def render(self, stats):
+        with mock.patch("api.metrics.get_pool_stats", return_value=stats):
+            return render_prometheus().splitlines()
+
+    def test_pool_stats(self):
+        lines = self.render(POOL_STATS)
+
+        for line in (
+            "# TYPE foodgram_db_pool_max_size gauge",
+            'foodgram_db_pool_max_size{database="default"} 4',
+            'foodgram_db_pool_size{database="default"} 3',
+            'foodgram_db_pool_available{database="default"} 1',
+            'foodgram_db_pool_requests_waiting{database="default"} 2',
+            "# TYPE foodgram_db_pool_requests_total counter",
+            'foodgram_db_pool_requests_total{database="default"} 120',
+            'foodgram_db_pool_request_wait_seconds_total{database="default"}'
+            " 1.5",
+            'foodgram_db_pool_size{database="replica_1"} 1',
+            # Счётчики, которых ещё нет в статистике, равны нулю.
+            'foodgram_db_pool_requests_total{database="replica_1"} 0',
+        ):
+            self.assertIn(line, lines)
+
+    def test_without_pool(self):
+        lines = self.render({})
+
+        self.assertFalse(any("foodgram_db_pool" in line for line in lines))
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True)
+class StreamingMetricsTests(APITestCase):
+    """Запросы потокового ответа учитываются после его отдачи."""
+
+    action = ("recipes-download-shopping-cart", "GET")
+    url = "/api/recipes/download_shopping_cart/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="buyer@example.com",
+            username="buyer",
+            first_name="buyer",
+            last_name="buyer",
+            password="password",
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user,
+            name="Суп",
+            text="Суп",
+            cooking_time=10,
+            image="recipes/images/test.jpg",
+        )
+        IngredientInRecipe.objects.create(
+            recipe=recipe,
+            ingredient=Ingredient.objects.create(
+                name="соль", measurement_unit="г"
+            ),
+            amount=10,
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def get_totals(self):
+        totals, _ = endpoint_metrics.snapshot()
+        return totals.get(self.action, {"requests": 0, "queries": 0})
+
+    def test_queries_counted_after_stream_consumed(self):
+        before = self.get_totals()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+            self.assertEqual(self.get_totals(), before)
+            content = b"".join(response.streaming_content)
+
+        self.assertIn("соль".encode(), content)
+        after = self.get_totals()
+        self.assertEqual(after["requests"], before["requests"] + 1)
+        self.assertEqual(after["queries"] - before["queries"], len(queries))
+
+
+class ObservedStreamTests(SimpleTestCase):
+    """Код вокруг отдачи потока выполняется ровно один раз."""
+
+    def setUp(self):
+        self.events = []
+
+    @contextmanager
+    def context(self):
+        self.events.append("enter")
+        yield
+        self.events.append("exit")
+
+    def make_stream(self, content):
+        return ObservedStream(
+            content, self.context, lambda: self.events.append("close")
+        )
+
+    def test_exhausted(self):
+        stream = self.make_stream([b"a", b"b"])
+
+        self.assertEqual(list(stream), [b"a", b"b"])
+        stream.close()
+
+        self.assertEqual(self.events, ["enter", "exit", "close"])
+
+    def test_closed_before_first_chunk(self):
+        content = mock.MagicMock()
+        stream = self.make_stream(content)
+
+        stream.close()
+        stream.close()
+
+        content.close.assert_called_once_with()
+        self.assertEqual(self.events, ["close"])
+        self.assertEqual(list(stream), [])
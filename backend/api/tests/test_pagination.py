@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.pagination import CachedCountPaginator
+from recipes.models import Ingredient
+
+
+@override_settings(PAGINATION_COUNT_ESTIMATE_FROM=0)
+class CachedCountPaginatorTests(TestCase):
+    """Оценка числа строк не должна скрывать конец списка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"ингредиент {i}", measurement_unit="г")
+            for i in range(10)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def get_paginator(self):
+        return CachedCountPaginator(Ingredient.objects.order_by("pk"), 3)
+
+    @mock.patch("api.pagination.estimate_table_count", return_value=4)
+    def test_underestimate_is_replaced_on_last_page(self, estimate):
+        paginator = self.get_paginator()
+        self.assertEqual(paginator.count, 4)
+
+        page = paginator.page(2)
+
+        self.assertEqual(paginator.count, 10)
+        self.assertTrue(page.has_next())
+
+    @mock.patch("api.pagination.estimate_table_count", return_value=4)
+    def test_pages_after_estimate_are_reachable(self, estimate):
+        page = self.get_paginator().page(4)
+
+        self.assertEqual(len(page), 1)
+        self.assertFalse(page.has_next())
+        # Точное число закэшировано и используется следующими запросами.
+        self.assertEqual(self.get_paginator().count, 10)
+
+    @mock.patch("api.pagination.estimate_table_count", return_value=100)
+    def test_estimate_used_before_last_page(self, estimate):
+        paginator = self.get_paginator()
+
+        with self.assertNumQueries(1):
+            page = paginator.page(1)
+            list(page)
+
+        self.assertEqual(paginator.count, 100)
@@ -0,0 +1,246 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api.profiling import get_worst_profiles, load_profile, save_profile
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, ShoppingCart
+from users.models import User
+
+
+def make_profile(action="recipes-list", duration=0.5):
+    return {
+        "action": action,
+        "method": "GET",
+        "path": "/api/recipes/",
+        "status": 200,
+        "started": "2026-10-17T00:00:00+00:00",
+        "duration": duration,
+        "sampled": False,
+        "interval": 0.005,
+        "query_count": 1,
+        "queries": [{"sql": "SELECT 1", "duration": 0.001, "many": False}],
+        "stacks": {"main (manage.py:1);list (api/views.py:1)": 3},
+    }
+
+
+class ProfilesDirMixin:
+    """Профили сохраняются во временный каталог теста."""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(PROFILING_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get_profiles(self):
+        return [
+            profile
+            for _, profiles in get_worst_profiles(100)
+            for profile in profiles
+        ]
+
+
+class ProfileStorageTests(ProfilesDirMixin, TestCase):
+    """Сохранение профилей, их сводок и ротация файлов."""
+
+    @override_settings(PROFILING_MAX_FILES=3)
+    def test_save_profile_rotation(self):
+        started = datetime(2026, 10, 17, tzinfo=timezone.utc)
+        with mock.patch(
+            "api.profiling.timezone.now",
+            side_effect=[started + timedelta(seconds=n) for n in range(5)],
+        ):
+            names = [
+                save_profile(make_profile(duration=number))
+                for number in range(5)
+            ]
+
+        self.assertEqual(
+            sorted(profile["name"] for profile in self.get_profiles()),
+            names[2:],
+        )
+        self.assertIsNone(load_profile(names[0]))
+        # Профиль и сводка на каждый из трёх оставшихся запросов.
+        self.assertEqual(len(os.listdir(self.directory)), 6)
+
+    def test_worst_profiles_read_summaries_only(self):
+        for action, duration in (
+            ("recipes-list", 0.2),
+            ("recipes-list", 0.9),
+            ("recipes-list", 0.5),
+            ("users-list", 0.7),
+        ):
+            save_profile(make_profile(action, duration))
+
+        with mock.patch("api.profiling.load_profile") as load:
+            worst = get_worst_profiles(2)
+
+        load.assert_not_called()
+        self.assertEqual(
+            [
+                (endpoint, [profile["duration"] for profile in profiles])
+                for endpoint, profiles in worst
+            ],
+            [
+                (("GET", "recipes-list"), [0.9, 0.5]),
+                (("GET", "users-list"), [0.7]),
+            ],
+        )
+        summary = worst[0][1][0]
+        self.assertNotIn("stacks", summary)
+        self.assertEqual(
+            load_profile(summary["name"])["stacks"],
+            {"main (manage.py:1);list (api/views.py:1)": 3},
+        )
+
+
+@override_settings(
+    PROFILING_ENABLED=True,
+    PROFILING_SAMPLE_RATE=0,
+    PROFILING_SLOW_THRESHOLD=0,
+)
+class ProfilingMiddlewareTests(ProfilesDirMixin, APITestCase):
+    """Какие запросы профилируются и что попадает в профиль."""
+
+    url = "/api/ingredients/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="buyer@example.com",
+            username="buyer",
+            first_name="buyer",
+            last_name="buyer",
+            password="password",
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user,
+            name="Суп",
+            text="Суп",
+            cooking_time=10,
+            image="recipes/images/test.jpg",
+        )
+        IngredientInRecipe.objects.create(
+            recipe=recipe,
+            ingredient=Ingredient.objects.create(
+                name="соль", measurement_unit="г"
+            ),
+            amount=10,
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def test_disabled_without_sampling_and_threshold(self):
+        self.client.get(self.url)
+
+        self.assertEqual(self.get_profiles(), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request_saved(self):
+        self.client.get(self.url)
+
+        (profile,) = self.get_profiles()
+        self.assertEqual(
+            (profile["action"], profile["method"], profile["sampled"]),
+            ("ingredients-list", "GET", True),
+        )
+        self.assertGreater(load_profile(profile["name"])["query_count"], 0)
+
+    @override_settings(PROFILING_SLOW_THRESHOLD=60)
+    def test_fast_request_not_saved(self):
+        self.client.get(self.url)
+
+        self.assertEqual(self.get_profiles(), [])
+
+    @override_settings(PROFILING_SLOW_THRESHOLD=1e-9)
+    def test_slow_request_saved(self):
+        self.client.get(self.url)
+
+        (profile,) = self.get_profiles()
+        self.assertFalse(profile["sampled"])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_streaming_response_profiled_until_sent(self):
+        self.client.force_authenticate(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/recipes/download_shopping_cart/")
+            self.assertEqual(self.get_profiles(), [])
+            b"".join(response.streaming_content)
+
+        (profile,) = self.get_profiles()
+        self.assertEqual(profile["query_count"], len(queries))
+
+
+class ProfileAdminTests(ProfilesDirMixin, TestCase):
+    """Страницы профилей в админке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.user = (
+            User.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                first_name=name,
+                last_name=name,
+                password="password",
+                is_staff=name == "admin",
+                is_superuser=name == "admin",
+            )
+            for name in ("admin", "user")
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.name = save_profile(make_profile())
+
+    def test_staff_only(self):
+        self.client.force_login(self.user)
+
+        for url in ("/admin/profiles/", f"/admin/profiles/{self.name}/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_profiles_list(self):
+        self.client.force_login(self.admin)
+
+        response = self.client.get("/admin/profiles/")
+
+        self.assertContains(response, f"/admin/profiles/{self.name}/")
+        self.assertContains(response, "recipes-list")
+
+    def test_profile_detail(self):
+        self.client.force_login(self.admin)
+
+        response = self.client.get(f"/admin/profiles/{self.name}/")
+
+        self.assertContains(response, "SELECT 1")
+        self.assertContains(response, "list (api/views.py:1)")
+
+    def test_profile_collapsed_stacks(self):
+        self.client.force_login(self.admin)
+
+        response = self.client.get(
+            f"/admin/profiles/{self.name}/", {"format": "collapsed"}
+        )
+
+        self.assertEqual(
+            response.content.decode(),
+            "main (manage.py:1);list (api/views.py:1) 3\n",
+        )
+
+    def test_unknown_profile(self):
+        self.client.force_login(self.admin)
+
+        for name in ("20260101T000000000000-1.json", "..%2Fsettings.py"):
+            with self.subTest(name=name):
+                response = self.client.get(f"/admin/profiles/{name}/")
+                self.assertEqual(response.status_code, 404)
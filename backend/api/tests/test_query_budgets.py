@@ -0,0 +1,195 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITransactionTestCase
+
+from api.testing import assert_query_budget
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from users.models import Subscription, User
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 120, 40)).save(buffer, "JPEG")
+    return (
+        "data:image/jpeg;base64,"
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+class QueryBudgetTests(APITransactionTestCase):
+    """Действия API укладываются в бюджеты QUERY_BUDGETS.
+
+    Каждое действие выполняется на странице из нескольких объектов,
+    чтобы N+1 запросов превысили бюджет. Тесты идут вне общей транзакции,
+    как и реальные запросы: иначе atomic() внутри действий добавлял бы
+    запросы SAVEPOINT, а обработчики on_commit не выполнялись бы.
+    """
+
+    def setUp(self):
+        self.reader, self.author, self.other = (
+            User.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                first_name=name,
+                last_name=name,
+                password="password",
+            )
+            for name in ("reader", "author", "other")
+        )
+        self.token = Token.objects.create(user=self.reader)
+        self.author_token = Token.objects.create(user=self.author)
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f"соль {number}", measurement_unit="г")
+            for number in range(5)
+        )
+        self.recipes = []
+        for number in range(6):
+            recipe = Recipe.objects.create(
+                author=self.author if number % 2 else self.other,
+                name=f"Рецепт {number}",
+                text="Описание",
+                cooking_time=10,
+                image=f"recipes/images/test_{number}.jpg",
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=10
+                )
+                for ingredient in ingredients[: number % 4 + 2]
+            )
+            self.recipes.append(recipe)
+        self.ingredient = ingredients[0]
+        self.recipe = self.recipes[1]
+        for recipe in self.recipes[2:5]:
+            Favorite.objects.create(user=self.reader, recipe=recipe)
+            ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        ShoppingListItem.objects.rebuild()
+        Subscription.objects.create(user=self.reader, author=self.other)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def request(self, action, method, url, data=None):
+        with assert_query_budget(action, method):
+            response = getattr(self.client, method.lower())(
+                url, data, format="json"
+            )
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, response)
+        return response
+
+    def test_all_budgeted_actions_covered(self):
+        tested = {
+            name.removeprefix("test_").replace("_", "-")
+            for name in dir(self)
+            if name.startswith("test_")
+        }
+        for action in settings.QUERY_BUDGETS:
+            self.assertTrue(
+                any(name.startswith(action) for name in tested), action
+            )
+
+    def test_ingredients_list(self):
+        self.request("ingredients-list", "GET", "/api/ingredients/?name=со")
+
+    def test_ingredients_detail(self):
+        self.request(
+            "ingredients-detail",
+            "GET",
+            f"/api/ingredients/{self.ingredient.pk}/",
+        )
+
+    def test_recipes_list(self):
+        # Число строк таблицы пагинатор кэширует на
+        # PAGINATION_COUNT_CACHE_TTL, бюджет задан для прогретого кэша.
+        self.client.get("/api/recipes/")
+        self.request("recipes-list", "GET", "/api/recipes/")
+        self.request("recipes-list", "GET", "/api/recipes/?is_favorited=1")
+
+    def test_recipes_list_anonymous(self):
+        self.client.credentials()
+        self.client.get("/api/recipes/")
+        self.request("recipes-list", "GET", "/api/recipes/")
+
+    def test_recipes_detail(self):
+        self.request(
+            "recipes-detail", "GET", f"/api/recipes/{self.recipe.pk}/"
+        )
+
+    def test_recipes_detail_delete(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.author_token.key}"
+        )
+        self.request(
+            "recipes-detail", "DELETE", f"/api/recipes/{self.recipes[3].pk}/"
+        )
+
+    def test_recipes_favorite(self):
+        url = f"/api/recipes/{self.recipe.pk}/favorite/"
+        self.request("recipes-favorite", "POST", url)
+        self.request("recipes-favorite", "DELETE", url)
+
+    def test_recipes_shopping_cart(self):
+        url = f"/api/recipes/{self.recipe.pk}/shopping_cart/"
+        self.request("recipes-shopping-cart", "POST", url)
+        self.request("recipes-shopping-cart", "DELETE", url)
+
+    def test_recipes_download_shopping_cart(self):
+        self.request(
+            "recipes-download-shopping-cart",
+            "GET",
+            "/api/recipes/download_shopping_cart/",
+        )
+
+    def test_recipes_short_link(self):
+        url = f"/api/recipes/{self.recipe.pk}/get-link/"
+        # Первый запрос создаёт ссылку, следующие только читают её.
+        self.request("recipes-short-link", "GET", url)
+        self.request("recipes-short-link", "GET", url)
+
+    def test_users_list(self):
+        self.request("users-list", "GET", "/api/users/")
+
+    def test_users_detail(self):
+        self.request("users-detail", "GET", f"/api/users/{self.author.pk}/")
+
+    def test_users_me(self):
+        self.request("users-me", "GET", "/api/users/me/")
+
+    def test_users_subscriptions(self):
+        self.request(
+            "users-subscriptions",
+            "GET",
+            "/api/users/subscriptions/?recipes_limit=2",
+        )
+
+    def test_users_subscribe(self):
+        url = f"/api/users/{self.author.pk}/subscribe/"
+        self.request("users-subscribe", "POST", url)
+        self.request("users-subscribe", "DELETE", url)
+
+    def test_users_avatar(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        url = "/api/users/me/avatar/"
+        with override_settings(
+            MEDIA_ROOT=media_root, IMAGE_PROCESSING_ASYNC=False
+        ):
+            self.request("users-avatar", "PUT", url, {"avatar": make_image()})
+            self.request("users-avatar", "DELETE", url)
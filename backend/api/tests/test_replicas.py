@@ -0,0 +1,178 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from rest_framework import viewsets
+from rest_framework.response import Response
+from rest_framework.test import APITransactionTestCase
+
+from api.cache import AnonymousResponseCacheMixin, response_cache
+from api.replicas import ReplicaMiddleware, ReplicaRouter
+from recipes.models import Recipe
+from users.models import User
+
+
+class ReadAliasViewSet(viewsets.ViewSet):
+    """Возвращает базу, с которой читаются рецепты."""
+
+    def list(self, request):
+        return Response({"alias": ReplicaRouter().db_for_read(Recipe)})
+
+
+class CachedReadAliasViewSet(AnonymousResponseCacheMixin, ReadAliasViewSet):
+    cache_tags = ("recipes",)
+
+
+@override_settings(DB_REPLICAS=["replica_1"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Выбор базы для чтения и записи в запросах.
+
+    Реплика в тестах не подключается: проверяется только выбор
+    псевдонима. Тесты идут вне общей транзакции, потому что внутри
+    неё чтение всегда идёт с primary.
+    """
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def get_aliases(self, request, inside_atomic=False):
+        """Базы для чтения и записи во время обработки запроса."""
+        aliases = {}
+
+        def get_response(request):
+            if inside_atomic:
+                with transaction.atomic():
+                    aliases["read"] = self.router.db_for_read(Recipe)
+            else:
+                aliases["read"] = self.router.db_for_read(Recipe)
+            aliases["write"] = self.router.db_for_write(Recipe)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(get_response)(request)
+        return aliases, response
+
+    def test_safe_method_reads_from_replica(self):
+        aliases, response = self.get_aliases(self.factory.get("/api/recipes/"))
+
+        self.assertEqual(aliases, {"read": "replica_1", "write": "default"})
+        self.assertNotIn("primary_pin", response.cookies)
+
+    def test_unsafe_method_uses_primary_and_pins_client(self):
+        aliases, response = self.get_aliases(
+            self.factory.post("/api/recipes/")
+        )
+
+        self.assertEqual(aliases, {"read": "default", "write": "default"})
+        cookie = response.cookies["primary_pin"]
+        self.assertEqual(cookie["max-age"], 5)
+        self.assertTrue(cookie["httponly"])
+
+    def test_pinned_client_reads_from_primary(self):
+        request = self.factory.get("/api/recipes/")
+        request.COOKIES["primary_pin"] = "1"
+
+        aliases, _ = self.get_aliases(request)
+
+        self.assertEqual(aliases["read"], "default")
+
+    def test_reads_inside_atomic_go_to_primary(self):
+        aliases, _ = self.get_aliases(
+            self.factory.get("/api/recipes/"), inside_atomic=True
+        )
+
+        self.assertEqual(aliases["read"], "default")
+
+    def test_outside_request_reads_from_primary(self):
+        self.assertEqual(self.router.db_for_read(Recipe), "default")
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_response_cache_filled_from_primary(self):
+        cache.clear()
+        response_cache.local.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(response_cache.local.clear)
+        middleware = ReplicaMiddleware(
+            CachedReadAliasViewSet.as_view({"get": "list"})
+        )
+
+        responses = []
+        for _ in range(2):
+            response = middleware(self.factory.get("/api/recipes/"))
+            if hasattr(response, "render"):
+                response.render()
+            responses.append(response)
+
+        self.assertEqual(
+            [response["X-Cache"] for response in responses], ["MISS", "HIT"]
+        )
+        for response in responses:
+            self.assertJSONEqual(response.content, {"alias": "default"})
+
+    @override_settings(DB_REPLICAS=[])
+    def test_without_replicas(self):
+        aliases, response = self.get_aliases(
+            self.factory.post("/api/recipes/")
+        )
+
+        self.assertEqual(aliases["read"], "default")
+        self.assertNotIn("primary_pin", response.cookies)
+
+
+@skipUnless(
+    settings.DB_REPLICAS and settings.DB_REPLICA_TEST_ISOLATED,
+    "нужна отдельная тестовая база реплики (DB_REPLICA_TEST_ISOLATED)",
+)
+class ReplicaLagTests(APITransactionTestCase):
+    """Чтение с реплики, отстающей от primary.
+
+    Реплика — отдельная тестовая база, в которую записи не попадают,
+    поэтому всё записанное в primary на ней ещё не видно.
+    """
+
+    databases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+    url = "/api/recipes/"
+
+    def setUp(self):
+        author = User.objects.create_user(
+            email="author@example.com",
+            username="author",
+            first_name="author",
+            last_name="author",
+            password="password",
+        )
+        Recipe.objects.create(
+            author=author,
+            name="Рецепт",
+            text="Описание",
+            cooking_time=10,
+            image="recipes/images/test.jpg",
+        )
+        cache.clear()
+        response_cache.local.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(response_cache.local.clear)
+
+    def get_count(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["count"]
+
+    def test_anonymous_client_reads_replica(self):
+        self.assertEqual(self.get_count(), 0)
+
+    def test_pinned_client_reads_primary(self):
+        self.client.cookies[settings.REPLICA_PIN_COOKIE] = "1"
+
+        self.assertEqual(self.get_count(), 1)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_response_cache_not_filled_from_replica(self):
+        self.assertEqual(self.get_count(), 1)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.json()["count"], 1)
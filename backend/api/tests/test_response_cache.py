@@ -0,0 +1,118 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api.cache import response_cache
+from recipes.models import Recipe
+from users.models import User
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class CounterInvalidationTests(APITestCase):
+    """Изменение счётчиков сбрасывает кэш ответов для анонимов."""
+
+    url = "/api/recipes/?ordering=-favorites_count"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.fan = (
+            User.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                first_name=name,
+                last_name=name,
+                password="password",
+            )
+            for name in ("author", "fan")
+        )
+        cls.first, cls.second = (
+            Recipe.objects.create(
+                author=cls.author,
+                name=name,
+                text=name,
+                cooking_time=10,
+                image="recipes/images/test.jpg",
+            )
+            for name in ("Первый", "Второй")
+        )
+        Recipe.objects.filter(pk=cls.first.pk).update(favorites_count=1)
+
+    def setUp(self):
+        cache.clear()
+        response_cache.local.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(response_cache.local.clear)
+
+    def get_names(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [recipe["name"] for recipe in response.json()["results"]]
+
+    def test_favorite_invalidates_anonymous_list(self):
+        self.assertEqual(self.get_names(), ["Первый", "Второй"])
+        self.assertEqual(self.get_names(), ["Первый", "Второй"])
+
+        for user in (self.author, self.fan):
+            self.client.force_authenticate(user)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    f"/api/recipes/{self.second.pk}/favorite/"
+                )
+            self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(None)
+
+        self.assertEqual(self.get_names(), ["Второй", "Первый"])
+
+    @override_settings(ALLOWED_HOSTS=["testserver", "mirror.example.com"])
+    def test_absolute_urls_cached_per_host(self):
+        url = f"/api/recipes/{self.first.pk}/"
+        for host, secure in (
+            ("testserver", False),
+            ("mirror.example.com", False),
+            ("mirror.example.com", True),
+        ):
+            with self.subTest(host=host, secure=secure):
+                response = self.client.get(url, HTTP_HOST=host, secure=secure)
+                self.assertEqual(response["X-Cache"], "MISS")
+                scheme = "https" if secure else "http"
+                self.assertTrue(
+                    response.json()["image"].startswith(f"{scheme}://{host}/")
+                )
+
+    def test_subscription_invalidates_anonymous_user(self):
+        url = f"/api/users/{self.author.pk}/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+        self.client.force_authenticate(self.fan)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/users/{self.author.pk}/subscribe/"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(None)
+
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class DeferredInvalidationTests(TestCase):
+    """Версии тегов меняются только после фиксации транзакции."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_invalidate_waits_for_commit(self):
+        (version,) = response_cache.get_tag_versions(["recipes"])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response_cache.invalidate("recipes")
+            self.assertEqual(
+                response_cache.get_tag_versions(["recipes"]), [version]
+            )
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(
+            response_cache.get_tag_versions(["recipes"]), [version]
+        )
@@ -0,0 +1,82 @@
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import User
+
+
+class RecipeSearchTests(APITestCase):
+    """Поиск рецептов: полнотекстовый и по триграммам при опечатках."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="cook@example.com",
+            username="cook",
+            first_name="cook",
+            last_name="cook",
+            password="password",
+        )
+        beet = Ingredient.objects.create(name="свёкла", measurement_unit="г")
+        cls.recipes = {}
+        for key, name, text, ingredients in (
+            ("title", "Борщ украинский", "Варить два часа.", (beet,)),
+            ("text", "Щи зелёные", "Почти как борщ, но без свёклы.", ()),
+            ("ingredient", "Винегрет", "Нарезать кубиками.", (beet,)),
+            ("lean", "Борщ постный", "Без мяса.", (beet,)),
+            ("other", "Омлет", "Взбить яйца.", ()),
+        ):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=name,
+                text=text,
+                cooking_time=10,
+                image="recipes/images/test.jpg",
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+                for ingredient in ingredients
+            )
+            cls.recipes[key] = recipe.pk
+        Recipe.objects.update_search_vector()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            "/api/recipes/", {"search": query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        ids = {pk: key for key, pk in self.recipes.items()}
+        return [ids[recipe["id"]] for recipe in response.json()["results"]]
+
+    def test_ranked_by_field_weight(self):
+        results = self.search("борщ")
+
+        # Название весит больше описания.
+        self.assertCountEqual(results[:2], ["title", "lean"])
+        self.assertEqual(results[2:], ["text"])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(
+            self.search("борщ", ordering="name"), ["lean", "title", "text"]
+        )
+
+    def test_ingredient_names_searched(self):
+        results = self.search("свёкла")
+
+        # Ингредиент весит больше описания.
+        self.assertCountEqual(results[:3], ["ingredient", "lean", "title"])
+        self.assertEqual(results[3:], ["text"])
+
+    def test_websearch_syntax(self):
+        self.assertCountEqual(self.search("борщ -постный"), ["title", "text"])
+        self.assertEqual(self.search('"борщ украинский"'), ["title"])
+
+    def test_trigram_fallback_on_typo(self):
+        self.assertEqual(self.search("омлетт"), ["other"])
+
+    def test_nothing_found(self):
+        self.assertEqual(self.search("пицца"), [])
+
+    def test_blank_query_ignored(self):
+        self.assertEqual(len(self.search("  ")), len(self.recipes))
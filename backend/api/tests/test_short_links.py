@@ -0,0 +1,45 @@
+from django.test import TestCase
+
+from api.short_links import short_link_resolver
+from recipes.models import Recipe, ShortLink
+from users.models import User
+
+
+class ShortLinkResolverTests(TestCase):
+    """Кэш кодов коротких ссылок."""
+
+    def setUp(self):
+        short_link_resolver.cache.clear()
+        self.addCleanup(short_link_resolver.cache.clear)
+        author = User.objects.create_user(
+            email="author@example.com",
+            username="author",
+            first_name="author",
+            last_name="author",
+            password="password",
+        )
+        self.recipe = Recipe.objects.create(
+            author=author,
+            name="Рецепт",
+            text="Описание",
+            cooking_time=10,
+            image="recipes/images/test.jpg",
+        )
+        self.code = ShortLink.objects.get_code(self.recipe)
+
+    def test_redirect(self):
+        response = self.client.get(f"/s/{self.code}/")
+
+        self.assertRedirects(
+            response,
+            f"/recipes/{self.recipe.pk}",
+            fetch_redirect_response=False,
+        )
+
+    def test_deleted_recipe_is_evicted(self):
+        self.assertIsNotNone(short_link_resolver.resolve(self.code))
+
+        self.recipe.delete()
+
+        self.assertIsNone(short_link_resolver.resolve(self.code))
+        self.assertEqual(self.client.get(f"/s/{self.code}/").status_code, 404)
@@ -0,0 +1,123 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from api.uploads import upload_metrics
+from users.models import User
+
+URL = "/api/users/me/avatar/"
+
+
+def make_image(size=(40, 30), image_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def make_data_uri(content, content_type="image/png"):
+    return f"data:{content_type};base64," + base64.b64encode(content).decode()
+
+
+class ImageUploadTests(APITestCase):
+    """Некорректные изображения отклоняются и учитываются в метриках."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            first_name="user",
+            last_name="user",
+            password="password",
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_PROCESSING_ASYNC=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_authenticate(self.user)
+
+    def upload(self, avatar, format="json"):
+        """Код ответа и прирост счётчиков загрузок за запрос."""
+        before = upload_metrics.snapshot()
+        response = self.client.put(URL, {"avatar": avatar}, format=format)
+        after = upload_metrics.snapshot()
+        return response.status_code, {
+            key: count - before.get(key, 0)
+            for key, count in after.items()
+            if count != before.get(key, 0)
+        }
+
+    def assertRejected(self, avatar, reason, format="json"):
+        self.assertEqual(
+            self.upload(avatar, format), (400, {("rejected", reason): 1})
+        )
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+
+    def test_valid_upload_recorded(self):
+        content = make_image()
+
+        status, counters = self.upload(make_data_uri(content))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            counters,
+            {("uploads", "base64"): 1, ("bytes", "base64"): len(content)},
+        )
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_too_large(self):
+        content = make_image((300, 300), "BMP")
+
+        for avatar, format in (
+            (make_data_uri(content), "json"),
+            (SimpleUploadedFile("avatar.bmp", content), "multipart"),
+        ):
+            with self.subTest(format=format):
+                self.assertRejected(avatar, "too_large", format)
+
+    def test_invalid_base64(self):
+        encoded = make_data_uri(make_image())
+
+        for avatar in (
+            encoded[:-1],
+            encoded[:-4] + "@@@@",
+            "data:image/png;base64,!!!!",
+        ):
+            with self.subTest(avatar=avatar[-8:]):
+                self.assertRejected(avatar, "invalid")
+
+    def test_data_uri_without_base64(self):
+        self.assertRejected(
+            make_data_uri(make_image()).replace(";base64", ""), "invalid"
+        )
+
+    def test_not_an_image(self):
+        self.assertRejected(make_data_uri(b"not an image"), "invalid")
+
+    def test_disallowed_format(self):
+        self.assertRejected(
+            make_data_uri(make_image(image_format="BMP"), "image/bmp"),
+            "format",
+        )
+
+    @override_settings(
+        IMAGE_UPLOAD_MAX_DIMENSION=100, IMAGE_UPLOAD_MAX_PIXELS=5000
+    )
+    def test_resolution_over_limit(self):
+        for size in ((101, 10), (10, 101), (80, 80)):
+            with self.subTest(size=size):
+                self.assertRejected(
+                    make_data_uri(make_image(size)), "dimensions"
+                )
@@ -0,0 +1,163 @@
+import binascii
+import tempfile
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+
+BASE64_CHUNK_SIZE = 64 * 1024
+ALLOWED_FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+WHITESPACE = str.maketrans("", "", " \t\r\n")
+
+
+class UploadMetrics:
+    """Счётчики загрузок изображений в памяти процесса.
+
+    uploads — принятые файлы по источнику (base64 или multipart),
+    bytes — объём принятых данных после декодирования, rejected —
+    отклонённые загрузки по причине.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def record(self, source, size):
+        with self._lock:
+            self._counters[("uploads", source)] += 1
+            self._counters[("bytes", source)] += size
+
+    def reject(self, reason):
+        with self._lock:
+            self._counters[("rejected", reason)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+upload_metrics = UploadMetrics()
+
+
+def _reject(reason, message):
+    upload_metrics.reject(reason)
+    raise ValidationError(message)
+
+
+def _check_size(size):
+    limit = settings.IMAGE_UPLOAD_MAX_BYTES
+    if size > limit:
+        _reject(
+            "too_large",
+            f"Размер изображения не должен превышать {limit // 2**20} МБ.",
+        )
+
+
+def _split_data_uri(data):
+    """Возвращает (content type, позиция начала base64 в строке)."""
+    if data.startswith("data:"):
+        header_end = data.find(",", 0, 256)
+        header = data[:header_end]
+        if header_end == -1 or not header.endswith(";base64"):
+            _reject("invalid", "Некорректный формат data URI.")
+        return header[5:-7] or None, header_end + 1
+    return None, 0
+
+
+def decode_base64_image(data):
+    """Декодирует base64 по частям во временный файл.
+
+    Размер результата оценивается по длине строки ещё до декодирования,
+    поэтому слишком большие изображения отклоняются без выделения памяти
+    под их содержимое. Файлы больше FILE_UPLOAD_MAX_MEMORY_SIZE
+    записываются на диск.
+    """
+    content_type, start = _split_data_uri(data)
+    _check_size((len(data) - start) * 3 // 4 - 2)
+
+    upload = UploadedFile(
+        tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE,
+            dir=settings.FILE_UPLOAD_TEMP_DIR,
+        ),
+        name=str(uuid.uuid4()),
+        content_type=content_type,
+    )
+    leftover = ""
+    try:
+        for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+            end = offset + BASE64_CHUNK_SIZE
+            chunk = leftover + data[offset:end].translate(WHITESPACE)
+            aligned = len(chunk) - len(chunk) % 4
+            leftover = chunk[aligned:]
+            upload.write(
+                binascii.a2b_base64(chunk[:aligned], strict_mode=True)
+            )
+        if leftover:
+            raise binascii.Error("Incorrect padding")
+    except (binascii.Error, ValueError):
+        upload.close()
+        _reject("invalid", "Некорректные данные base64.")
+    upload.size = upload.tell()
+    _check_size(upload.size)
+    upload.seek(0)
+    return upload
+
+
+def check_image(upload):
+    """Проверяет формат и размеры изображения по его заголовку.
+
+    Пиксели при этом не декодируются, поэтому изображения с огромным
+    разрешением отклоняются до того, как займут память.
+    """
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        _reject("invalid", "Загрузите корректное изображение.")
+    finally:
+        upload.seek(0)
+
+    if image_format not in ALLOWED_FORMATS:
+        _reject(
+            "format",
+            "Поддерживаются форматы: "
+            f"{', '.join(sorted(ALLOWED_FORMATS))}.",
+        )
+    max_dimension = settings.IMAGE_UPLOAD_MAX_DIMENSION
+    if (
+        width > max_dimension
+        or height > max_dimension
+        or width * height > settings.IMAGE_UPLOAD_MAX_PIXELS
+    ):
+        _reject(
+            "dimensions",
+            f"Разрешение изображения {width}x{height} слишком велико.",
+        )
+    return ALLOWED_FORMATS[image_format]
+
+
+def prepare_image_upload(data):
+    """Принимает строку base64 или загруженный файл и проверяет его."""
+    if isinstance(data, str):
+        source = "base64"
+        upload = decode_base64_image(data)
+        try:
+            extension = check_image(upload)
+        except ValidationError:
+            upload.close()
+            raise
+        upload.name = f"{upload.name}.{extension}"
+    elif hasattr(data, "read") and hasattr(data, "size"):
+        source = "multipart"
+        _check_size(data.size)
+        check_image(data)
+        upload = data
+    else:
+        _reject("invalid", "Ожидается строка base64 или файл.")
+    upload_metrics.record(source, upload.size)
+    return upload
@@ -1,12 +1,40 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+import mimetypes
+import os
+import posixpath
+from functools import partial
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+    Window,
+    prefetch_related_objects,
+)
+from django.db.models.functions import RowNumber
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.static import serve
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework import filters as drf_filters, status, viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
@@ -20,11 +48,28 @@ from recipes.models import (
     IngredientInRecipe,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
+    ShortLink,
 )
 from users.models import Subscription, User
 
-from .filters import IngredientFilter, RecipeFilter
+from .cache import AnonymousResponseCacheMixin
+from .conditional import ConditionalGetMixin
+from .fast_serializers import (
+    USER_VALUES,
+    FastReadMixin,
+    recipe_values,
+    serialize_recipes,
+    serialize_subscriptions,
+)
+from .filters import IngredientFilter, RecipeFilter, RecipeOrderingFilter
+from .images import delete_image, schedule_image_processing
+from .ingredient_index import ingredient_index
+from .metrics import RequestMetricsMixin, render_prometheus
+from .pagination import CustomPageNumberPagination, RecipePagination
 from .permissions import IsOwnerOrReadOnly
+from .profiling import format_collapsed, get_worst_profiles, load_profile
+from .renderers import SHOPPING_LIST_RENDERERS
 from .serializers import (
     IngredientSerializer,
     RecipeCreateUpdateSerializer,
@@ -32,37 +77,125 @@ from .serializers import (
     RecipeReadSerializer,
     SetAvatarResponseSerializer,
     SetAvatarSerializer,
+    ShoppingListItemSerializer,
     SubscriptionSerializer,
 )
+from .short_links import short_link_resolver
+from .storage import IMMUTABLE_MAX_AGE, is_content_addressed
 
+SHOPPING_LIST_CHUNK_SIZE = 2000
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(
+    RequestMetricsMixin,
+    ConditionalGetMixin,
+    AnonymousResponseCacheMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     pagination_class = None
+    cache_tags = ("ingredients",)
 
+    def _get_limit(self):
+        try:
+            limit = int(self.request.query_params["limit"])
+        except (KeyError, ValueError):
+            return None
+        return limit if limit >= 0 else None
+
+    def list(self, request, *args, **kwargs):
+        return self._get_conditional_response(
+            partial(self._get_cached_response, self._list_ingredients),
+            request,
+            *args,
+            **kwargs,
+        )
 
-class CustomPageNumberPagination(PageNumberPagination):
-    page_size_query_param = "limit"
+    def _list_ingredients(self, request, *args, **kwargs):
+        """Автодополнение по префиксу name с ограничением limit.
 
+        При включённом INGREDIENT_INDEX_ENABLED ответ строится из индекса
+        в памяти, иначе — запросом к БД.
+        """
+        limit = self._get_limit()
+        if ingredient_index.enabled:
+            return Response(
+                ingredient_index.search(
+                    request.query_params.get("name", ""), limit
+                )
+            )
 
-class CustomUserViewSet(DjoserUserViewSet):
+        queryset = self.filter_queryset(self.get_queryset())
+        if limit is not None:
+            queryset = queryset[:limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+
+class CustomUserViewSet(
+    RequestMetricsMixin,
+    ConditionalGetMixin,
+    AnonymousResponseCacheMixin,
+    FastReadMixin,
+    DjoserUserViewSet,
+):
     pagination_class = CustomPageNumberPagination
+    cache_tags = ("users",)
+    cached_actions = ("retrieve",)
+    conditional_actions = ("retrieve",)
+    fast_read_actions = ("subscriptions",)
 
     def get_permissions(self):
         if self.action == "retrieve":
             self.permission_classes = [AllowAny]
         return super().get_permissions()
 
+    @staticmethod
+    def _get_recipes_preview_queryset(request):
+        """Превью рецептов для всей страницы авторов одним запросом.
+
+        Ограничение recipes_limit применяется через ROW_NUMBER() в разрезе
+        автора, поэтому число запросов не растёт с количеством подписок.
+        """
+        recipes = Recipe.objects.all()
+        limit = SubscriptionSerializer.parse_recipes_limit(request)
+        if limit is not None:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F("author"),
+                    order_by=F("pub_date").desc(),
+                )
+            ).filter(row_number__lte=limit)
+        return recipes
+
     @action(
         detail=False, methods=["get"], permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        authors = User.objects.filter(following__user=request.user)
+        authors = (
+            User.objects.filter(following__user=request.user)
+            .annotate(is_subscribed=Value(True, output_field=BooleanField()))
+            .order_by("username")
+        )
+        recipes = self._get_recipes_preview_queryset(request)
+        if self.use_fast_read():
+            page = self.paginate_queryset(
+                authors.values(*USER_VALUES, "recipes_count")
+            )
+            return self.get_paginated_response(
+                serialize_subscriptions(page, recipes, request)
+            )
+
         page = self.paginate_queryset(authors)
+        prefetch_related_objects(
+            page,
+            Prefetch("recipes", queryset=recipes, to_attr="recipes_preview"),
+        )
         serializer = SubscriptionSerializer(
             page, many=True, context={"request": request}
         )
@@ -99,7 +232,9 @@ class CustomUserViewSet(DjoserUserViewSet):
                     {"errors": "Вы уже подписаны на этого пользователя."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            Subscription.objects.create(user=user, author=author)
+            with transaction.atomic():
+                Subscription.objects.create(user=user, author=author)
+            author.followers_count += 1
             serializer = SubscriptionSerializer(
                 author, context={"request": request}
             )
@@ -134,11 +269,13 @@ class CustomUserViewSet(DjoserUserViewSet):
             serializer.is_valid(raise_exception=True)
             avatar_file = serializer.validated_data.get("avatar")
 
-            if user.avatar:
-                user.avatar.delete(save=False)
-
-            user.avatar = avatar_file
-            user.save(update_fields=["avatar"])
+            # Прежний файл удаляется после фиксации, когда строка
+            # уже ссылается на новый.
+            with transaction.atomic():
+                delete_image(user, "avatar")
+                user.avatar = avatar_file
+                user.save(update_fields=["avatar", "updated_at"])
+                schedule_image_processing(user, "avatar")
 
             response_serializer = SetAvatarResponseSerializer(
                 user, context={"request": request}
@@ -153,27 +290,100 @@ class CustomUserViewSet(DjoserUserViewSet):
                     {"errors": "У пользователя нет аватара для удаления."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            user.avatar.delete(save=True)
+            with transaction.atomic():
+                delete_image(user, "avatar")
+                user.save(update_fields=["avatar", "updated_at"])
+                schedule_image_processing(user, "avatar")
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    RequestMetricsMixin,
+    ConditionalGetMixin,
+    AnonymousResponseCacheMixin,
+    FastReadMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    filter_backends = (DjangoFilterBackend, drf_filters.OrderingFilter)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
-    ordering_fields = ["name", "pub_date", "cooking_time"]
+    ordering_fields = ["name", "pub_date", "cooking_time", "favorites_count"]
     ordering = ["-pub_date"]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = RecipePagination
+    cache_tags = ("recipes", "ingredients", "users")
+    fast_read_actions = ("list",)
+
+    def _annotate_user_flags(self, queryset):
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+        )
+
+    def get_queryset(self):
+        """Подгружает связанные данные и флаги пользователя одним запросом.
+
+        Автор, ингредиенты и признаки is_favorited / is_in_shopping_cart /
+        is_subscribed вычисляются на уровне БД, поэтому число запросов
+        на страницу не зависит от её размера.
+        """
+        user = self.request.user
+        queryset = (
+            super()
+            .get_queryset()
+            .prefetch_related(
+                Prefetch(
+                    "recipe_ingredients",
+                    queryset=IngredientInRecipe.objects.select_related(
+                        "ingredient"
+                    ).order_by("pk"),
+                )
+            )
+        )
+
+        if not user.is_authenticated:
+            return self._annotate_user_flags(queryset.select_related("author"))
+
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                "author",
+                queryset=User.objects.annotate(
+                    is_subscribed=Exists(
+                        Subscription.objects.filter(
+                            user=user, author=OuterRef("pk")
+                        )
+                    )
+                ),
+            )
+        )
+        return self._annotate_user_flags(queryset)
+
+    def fast_list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(
+            self._annotate_user_flags(Recipe.objects.all())
+        )
+        page = self.paginate_queryset(recipe_values(queryset, request))
+        return self.get_paginated_response(serialize_recipes(page, request))
 
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
             return RecipeReadSerializer
         return RecipeCreateUpdateSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -197,7 +407,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     {"errors": error_msg_exists},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            related_model.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                related_model.objects.create(user=user, recipe=recipe)
             serializer = RecipeMinifiedSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -244,42 +455,62 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     @action(
-        detail=False, methods=["get"], permission_classes=[IsAuthenticated]
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_RENDERERS,
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        recipe_ids = ShoppingCart.objects.filter(user=user).values_list(
-            "recipe__id", flat=True
-        )
+        """Отдаёт список покупок потоково в формате из ?format=.
 
-        if not recipe_ids:
+        Поддерживаются txt (по умолчанию), csv, json и pdf. Строки берутся
+        из агрегированного списка ShoppingListItem и читаются серверным
+        курсором, поэтому память не зависит от размера списка.
+        """
+        items = ShoppingListItem.objects.filter(user=request.user)
+
+        if not items.exists():
             return Response(
                 {"errors": "Список покупок пуст."},
                 status=status.HTTP_400_BAD_REQUEST,
+                content_type="application/json",
             )
 
         ingredients = (
-            IngredientInRecipe.objects.filter(recipe__id__in=recipe_ids)
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(total_amount=Sum("amount"))
+            items.values_list(
+                "ingredient__name",
+                "ingredient__measurement_unit",
+                "total_amount",
+            )
             .order_by("ingredient__name")
+            .iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
         )
 
-        shopping_list_content = "Список покупок для Foodgram:\n\n"
-        for item in ingredients:
-            name = item["ingredient__name"]
-            unit = item["ingredient__measurement_unit"]
-            amount = item["total_amount"]
-            shopping_list_content += f"- {name} ({unit}) — {amount}\n"
-
-        response = HttpResponse(
-            shopping_list_content, content_type="text/plain"
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients), content_type=content_type
         )
         response["Content-Disposition"] = (
-            'attachment; filename="shopping_list.txt"'
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
         return response
 
+    @action(
+        detail=False, methods=["get"], permission_classes=[IsAuthenticated]
+    )
+    def shopping_list(self, request):
+        """Текущий агрегированный список покупок в JSON."""
+        items = (
+            ShoppingListItem.objects.filter(user=request.user)
+            .select_related("ingredient")
+            .order_by("ingredient__name")
+        )
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
     @action(
         detail=True,
         methods=["get"],
@@ -287,17 +518,137 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path="get-link",
     )
     def short_link(self, request, pk=None):
-        recipe = self.get_object()
-        try:
-            recipe_url = request.build_absolute_uri(
-                reverse("recipes-detail", kwargs={"pk": recipe.pk})
-            )
-            generated_short_link = recipe_url
-        except Exception:
-            return Response(
-                {"detail": "Не удалось сгенерировать ссылку."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
+        recipe = get_object_or_404(Recipe.objects.only("pk"), pk=pk)
+        code = ShortLink.objects.get_code(recipe)
+        short_link = request.build_absolute_uri(
+            reverse("short-link", kwargs={"code": code})
+        )
+        return Response({"short-link": short_link}, status=status.HTTP_200_OK)
+
+
+def short_link_redirect(request, code):
+    """Перенаправляет с короткой ссылки на страницу рецепта."""
+    entry = short_link_resolver.resolve(code)
+    if entry is None:
+        raise Http404("Ссылка не найдена.")
+    link_id, recipe_id = entry
+    short_link_resolver.record_hit(link_id)
+    return HttpResponseRedirect(f"/recipes/{recipe_id}")
+
+
+def serve_media(request, path):
+    """Отдаёт медиафайл с заголовками кэширования.
+
+    При MEDIA_ACCEL_REDIRECT = True файл передаёт nginx по заголовку
+    X-Accel-Redirect из внутреннего location, иначе его читает Django.
+    Файлы с именами по хешу содержимого кэшируются бессрочно, остальные
+    на MEDIA_CACHE_MAX_AGE секунд.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        full_path = default_storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404("Файл не найден.")
+    if not os.path.isfile(full_path):
+        raise Http404("Файл не найден.")
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        content_type = mimetypes.guess_type(full_path)[0]
+        response = HttpResponse(
+            content_type=content_type or "application/octet-stream"
+        )
+        response["X-Accel-Redirect"] = (
+            settings.MEDIA_ACCEL_REDIRECT_LOCATION + quote(path)
+        )
+    else:
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
 
-        response_data = {"short-link": generated_short_link}
-        return Response(response_data, status=status.HTTP_200_OK)
+    if is_content_addressed(path):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE
+        )
+    return response
+
+
+def prometheus_metrics(request):
+    """Метрики процесса в формате Prometheus.
+
+    Доступны по заголовку Authorization: Bearer METRICS_TOKEN, а если
+    токен не задан, то администраторам.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(
+        render_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def profiles_admin(request):
+    """Страница админки с самыми долгими запросами по маршрутам."""
+    context = {
+        **admin.site.each_context(request),
+        "title": "Профили медленных запросов",
+        "enabled": settings.PROFILING_ENABLED,
+        "endpoints": get_worst_profiles(settings.PROFILING_WORST_PER_ENDPOINT),
+    }
+    return render(request, "admin/api/profiles.html", context)
+
+
+def profile_admin(request, name):
+    """Профиль запроса: SQL-запросы и самые частые стеки.
+
+    С параметром ?format=collapsed отдаёт стеки текстом для
+    flamegraph.pl или speedscope.
+    """
+    profile = load_profile(name)
+    if profile is None:
+        raise Http404("Профиль не найден.")
+    if request.GET.get("format") == "collapsed":
+        response = HttpResponse(
+            format_collapsed(profile["stacks"]),
+            content_type="text/plain; charset=utf-8",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{name.removesuffix(".json")}.txt"'
+        )
+        return response
+
+    samples = sum(profile["stacks"].values())
+    stacks = sorted(
+        profile["stacks"].items(), key=lambda item: item[1], reverse=True
+    )
+    context = {
+        **admin.site.each_context(request),
+        "title": f"{profile['method']} {profile['path']}",
+        "profile": profile,
+        "samples": samples,
+        "stacks": [
+            {
+                "frames": stack.split(";"),
+                "count": count,
+                "share": count / samples,
+            }
+            for stack, count in stacks[: settings.PROFILING_TOP_STACKS]
+        ],
+        "queries": sorted(
+            (
+                {**query, "duration": query["duration"] * 1000}
+                for query in profile["queries"]
+            ),
+            key=lambda query: query["duration"],
+            reverse=True,
+        ),
+    }
+    return render(request, "admin/api/profile.html", context)
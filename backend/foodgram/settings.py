@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
@@ -52,6 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.RequestMetricsMiddleware",
+    "api.profiling.ProfilingMiddleware",
+    "api.replicas.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -84,6 +88,16 @@ WSGI_APPLICATION = "foodgram.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Процессы и потоки gunicorn, WEB_CONCURRENCY gunicorn читает и сам.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", 1))
+
+# Пул соединений psycopg 3. С пулом соединения держит он, а не Django,
+# поэтому CONN_MAX_AGE должен быть 0.
+DB_POOL_ENABLED = os.getenv("DB_POOL_ENABLED", "False").lower() == "true"
+# max_connections PostgreSQL за вычетом резерва для администрирования.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 90))
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -92,8 +106,30 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
+        "CONN_MAX_AGE": (
+            0 if DB_POOL_ENABLED else int(os.getenv("DB_CONN_MAX_AGE", 60))
+        ),
+        "CONN_HEALTH_CHECKS": (
+            os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() == "true"
+        ),
+        "OPTIONS": {},
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
 
 
 # Password validation
@@ -136,6 +172,18 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+MEDIA_ACCEL_REDIRECT = (
+    os.getenv("MEDIA_ACCEL_REDIRECT", "False").lower() == "true"
+)
+MEDIA_ACCEL_REDIRECT_LOCATION = "/protected-media/"
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
+STORAGES = {
+    "default": {"BACKEND": "api.storage.ContentHashStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -153,8 +201,153 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 6,
     "PAGINATION_PARAM": "page",
     "PAGE_SIZE_QUERY_PARAM": "limit",
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+REQUEST_METRICS_ENABLED = (
+    os.getenv("REQUEST_METRICS_ENABLED", "True").lower() == "true"
+)
+SERVER_TIMING_ENABLED = (
+    os.getenv("SERVER_TIMING_ENABLED", str(DEBUG)).lower() == "true"
+)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Допустимое число SQL-запросов: {имя маршрута: {метод: число}}.
+QUERY_BUDGETS = {
+    "ingredients-list": {"GET": 3},
+    "ingredients-detail": {"GET": 3},
+    "recipes-list": {"GET": 5},
+    "recipes-detail": {"GET": 5, "DELETE": 19},
+    "recipes-favorite": {"POST": 8, "DELETE": 9},
+    "recipes-shopping-cart": {"POST": 12, "DELETE": 13},
+    "recipes-download-shopping-cart": {"GET": 3},
+    # Первый запрос создаёт короткую ссылку.
+    "recipes-short-link": {"GET": 9},
+    "users-list": {"GET": 4},
+    "users-detail": {"GET": 4},
+    "users-me": {"GET": 2},
+    "users-subscriptions": {"GET": 4},
+    "users-subscribe": {"POST": 10, "DELETE": 9},
+    # С IMAGE_PROCESSING_ASYNC = False вместе с обработкой изображения.
+    "users-avatar": {"PUT": 9, "DELETE": 11},
 }
 
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+# Доля запросов, профиль которых сохраняется в любом случае.
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+# Запросы дольше порога в секундах сохраняются всегда, 0 — не сохранять.
+PROFILING_SLOW_THRESHOLD = float(os.getenv("PROFILING_SLOW_THRESHOLD", 1))
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = os.getenv("PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 500))
+PROFILING_MAX_QUERIES = 1000
+PROFILING_WORST_PER_ENDPOINT = 5
+PROFILING_TOP_STACKS = 30
+
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.getenv("IMAGE_UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+)
+IMAGE_UPLOAD_MAX_DIMENSION = 10000
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+# Base64 длиннее исходных данных на треть, плюс запас на остальные поля.
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_UPLOAD_MAX_BYTES * 4 // 3 + 2**20
+
+IMAGE_PROCESSING_ASYNC = (
+    os.getenv("IMAGE_PROCESSING_ASYNC", "True").lower() == "true"
+)
+IMAGE_PROCESSING_WORKERS = int(os.getenv("IMAGE_PROCESSING_WORKERS", 2))
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "WEBP")
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_SIZES = {"large": 1280, "medium": 640, "small": 320}
+
+if DB_POOL_ENABLED:
+    # Пул у каждого процесса gunicorn свой. Соединение нужно каждому
+    # потоку запросов и каждому потоку обработки изображений.
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+        "max_size": int(
+            os.getenv(
+                "DB_POOL_MAX_SIZE",
+                GUNICORN_THREADS + IMAGE_PROCESSING_WORKERS,
+            )
+        ),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+    }
+
+# Реплики для чтения: host или host:port через запятую, остальные
+# параметры как у default. Безопасные запросы читают со случайной
+# реплики, кроме REPLICA_PIN_SECONDS секунд после изменяющего запроса.
+# В тестах реплика зеркалирует default; с DB_REPLICA_TEST_ISOLATED для
+# неё создаётся отдельная тестовая база, в которую не попадают записи,
+# как в реплику с отставанием.
+DB_REPLICAS = []
+DB_REPLICA_TEST_ISOLATED = (
+    os.getenv("DB_REPLICA_TEST_ISOLATED", "False").lower() == "true"
+)
+for index, address in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1
+):
+    host, _, port = address.strip().partition(":")
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": (
+            {"NAME": f"test_{DATABASES['default']['NAME']}_{alias}"}
+            if DB_REPLICA_TEST_ISOLATED
+            else {"MIRROR": "default"}
+        ),
+    }
+    DB_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["api.replicas.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+REPLICA_PIN_COOKIE = "primary_pin"
+
+SHORT_LINK_CODE_LENGTH = 6
+SHORT_LINK_CACHE_SIZE = int(os.getenv("SHORT_LINK_CACHE_SIZE", 10000))
+SHORT_LINK_HITS_FLUSH_SIZE = int(os.getenv("SHORT_LINK_HITS_FLUSH_SIZE", 100))
+SHORT_LINK_HITS_FLUSH_INTERVAL = int(
+    os.getenv("SHORT_LINK_HITS_FLUSH_INTERVAL", 30)
+)
+
+FAST_READ_SERIALIZERS_ENABLED = (
+    os.getenv("FAST_READ_SERIALIZERS_ENABLED", "True").lower() == "true"
+)
+
+# Кэшу ответов нужен общий для процессов кэш, по умолчанию он включён
+# только с Redis.
+RESPONSE_CACHE_ENABLED = os.getenv(
+    "RESPONSE_CACHE_ENABLED", str(bool(os.getenv("REDIS_URL")))
+).lower() == "true"
+RESPONSE_CACHE_ALIAS = "default"
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300))
+RESPONSE_CACHE_LOCAL_SIZE = int(os.getenv("RESPONSE_CACHE_LOCAL_SIZE", 512))
+
+PAGINATION_COUNT_CACHE_TTL = int(os.getenv("PAGINATION_COUNT_CACHE_TTL", 60))
+PAGINATION_COUNT_ESTIMATE_FROM = int(
+    os.getenv("PAGINATION_COUNT_ESTIMATE_FROM", 100000)
+)
+
+RECIPE_SEARCH_CONFIG = os.getenv("RECIPE_SEARCH_CONFIG", "russian")
+
+INGREDIENT_INDEX_ENABLED = (
+    os.getenv("INGREDIENT_INDEX_ENABLED", "True").lower() == "true"
+)
+INGREDIENT_INDEX_TTL = int(os.getenv("INGREDIENT_INDEX_TTL", 300))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+SHOPPING_LIST_PDF_SPOOL_SIZE = 1024 * 1024
+
 DJOSER = {
     "PASSWORD_RESET_CONFIRM_URL": "#/password/reset/confirm/{uid}/{token}",
     "USERNAME_RESET_CONFIRM_URL": "#/username/reset/confirm/{uid}/{token}",
@@ -1,17 +1,35 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import (
+    profile_admin,
+    profiles_admin,
+    prometheus_metrics,
+    serve_media,
+    short_link_redirect,
+)
+
 urlpatterns = [
+    path(
+        "admin/profiles/",
+        admin.site.admin_view(profiles_admin),
+        name="admin-profiles",
+    ),
+    path(
+        "admin/profiles/<str:name>/",
+        admin.site.admin_view(profile_admin),
+        name="admin-profile",
+    ),
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
     path("api/auth/", include("djoser.urls")),
     path("api/auth/", include("djoser.urls.authtoken")),
+    path("s/<str:code>/", short_link_redirect, name="short-link"),
+    path("metrics/", prometheus_metrics, name="metrics"),
+    path(
+        f"{settings.MEDIA_URL.strip('/')}/<path:path>",
+        serve_media,
+        name="media",
+    ),
 ]
-
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
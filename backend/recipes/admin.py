@@ -6,6 +6,8 @@ from .models import (
     IngredientInRecipe,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
+    ShortLink,
 )
 
 
@@ -38,19 +40,17 @@ class RecipeAdmin(admin.ModelAdmin):
         "author",
         "cooking_time",
         "pub_date",
-        "favorited_count",
+        "favorites_count",
     )
     search_fields = ("name", "author__username")
     list_filter = ("author", "name", "pub_date")
-    readonly_fields = ("pub_date", "favorited_count")
+    readonly_fields = ("pub_date", "favorites_count", "in_carts_count")
     inlines = (IngredientInRecipeInline,)
     empty_value_display = "-пусто-"
 
-    def favorited_count(self, obj):
-        """Вычисляет количество добавлений рецепта в избранное."""
-        return obj.favorited_by.count()
-
-    favorited_count.short_description = "В избранном (раз)"
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_vector()
 
 
 @admin.register(IngredientInRecipe)
@@ -80,3 +80,22 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "recipe__name")
     list_filter = ("added_date",)
     autocomplete_fields = ("user", "recipe")
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    """Административная панель для модели ShoppingListItem."""
+
+    list_display = ("id", "user", "ingredient", "total_amount")
+    search_fields = ("user__username", "ingredient__name")
+    autocomplete_fields = ("user", "ingredient")
+
+
+@admin.register(ShortLink)
+class ShortLinkAdmin(admin.ModelAdmin):
+    """Административная панель для модели ShortLink."""
+
+    list_display = ("id", "code", "recipe", "hits", "created")
+    search_fields = ("code", "recipe__name")
+    readonly_fields = ("hits",)
+    autocomplete_fields = ("recipe",)
@@ -0,0 +1,138 @@
+import json
+import shutil
+import zipfile
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from recipes.models import IngredientInRecipe, Recipe
+
+RECIPES_FILE = "recipes.jsonl"
+MEDIA_DIR = "media/"
+AUTHOR_FIELDS = ("email", "username", "first_name", "last_name")
+RECIPE_FIELDS = ("id", "name", "text", "cooking_time", "pub_date", "image")
+
+
+def iter_batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_ingredients(recipe_ids):
+    """Ингредиенты рецептов в виде {id рецепта: [словари]}."""
+    ingredients = defaultdict(list)
+    rows = (
+        IngredientInRecipe.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("pk")
+        .values_list(
+            "recipe_id",
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            "amount",
+        )
+    )
+    for recipe_id, name, measurement_unit, amount in rows:
+        ingredients[recipe_id].append(
+            {
+                "name": name,
+                "measurement_unit": measurement_unit,
+                "amount": amount,
+            }
+        )
+    return ingredients
+
+
+class Command(BaseCommand):
+    """Команда для выгрузки рецептов в архив."""
+
+    help = (
+        "Выгружает рецепты с ингредиентами и изображениями в ZIP-архив: "
+        f"{RECIPES_FILE} по рецепту на строку и файлы изображений "
+        f"в {MEDIA_DIR}. Архив загружается командой import_recipes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к создаваемому архиву.")
+        parser.add_argument(
+            "--author",
+            help="Выгрузить только рецепты автора с этим email.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество рецептов, читаемых из БД за раз.",
+        )
+
+    def _write_recipes(self, archive, queryset, batch_size):
+        """Пишет рецепты в архив и возвращает имена их изображений."""
+        images = set()
+        count = 0
+        rows = queryset.values(
+            *RECIPE_FIELDS, *(f"author__{field}" for field in AUTHOR_FIELDS)
+        ).iterator(chunk_size=batch_size)
+        info = zipfile.ZipInfo(RECIPES_FILE)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, "w", force_zip64=True) as file:
+            for batch in iter_batches(rows, batch_size):
+                ingredients = get_ingredients([row["id"] for row in batch])
+                for row in batch:
+                    recipe = {
+                        field: row[field]
+                        for field in RECIPE_FIELDS
+                        if field != "id"
+                    }
+                    recipe["author"] = {
+                        field: row[f"author__{field}"]
+                        for field in AUTHOR_FIELDS
+                    }
+                    recipe["ingredients"] = ingredients[row["id"]]
+                    file.write(
+                        json.dumps(
+                            recipe, cls=DjangoJSONEncoder, ensure_ascii=False
+                        ).encode()
+                        + b"\n"
+                    )
+                    images.add(row["image"])
+                    count += 1
+        return count, images
+
+    def _write_images(self, archive, images):
+        storage = Recipe._meta.get_field("image").storage
+        missing = 0
+        for name in sorted(images):
+            if not name or not storage.exists(name):
+                missing += 1
+                self.stderr.write(f"Файл изображения не найден: {name}")
+                continue
+            # Изображения уже сжаты, повторное сжатие только тратит время.
+            info = zipfile.ZipInfo(MEDIA_DIR + name)
+            info.compress_type = zipfile.ZIP_STORED
+            with storage.open(name) as source, archive.open(
+                info, "w", force_zip64=True
+            ) as target:
+                shutil.copyfileobj(source, target)
+        return missing
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.order_by("pk")
+        if options["author"]:
+            queryset = queryset.filter(author__email=options["author"])
+        with zipfile.ZipFile(options["path"], "w") as archive:
+            count, images = self._write_recipes(
+                archive, queryset, options["batch_size"]
+            )
+            missing = self._write_images(archive, images)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Выгружено рецептов: {count}, изображений: "
+                f"{len(images) - missing}."
+            )
+        )
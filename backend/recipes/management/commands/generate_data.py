@@ -0,0 +1,304 @@
+import io
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.expressions import RawSQL
+from PIL import Image
+
+from api.cache import response_cache
+from api.images import delete_variants
+from api.pagination import invalidate_table_count
+from api.signals import paused_sync
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+)
+from users.models import Subscription, User
+
+from .export_recipes import iter_batches
+from .load_ingredients import DATA_FILE_PATH
+
+EMAIL_DOMAIN = "example.com"
+PASSWORD = "benchmark"
+IMAGE_COUNT = 16
+FIRST_NAMES = ("Анна", "Иван", "Мария", "Олег", "Елена", "Пётр", "Ольга")
+LAST_NAMES = ("Иванова", "Петров", "Смирнова", "Кузнецов", "Попова")
+DISHES = ("Салат", "Суп", "Рагу", "Пирог", "Запеканка", "Паста", "Соус")
+
+
+class Command(BaseCommand):
+    """Команда для генерации синтетических данных для нагрузочных тестов."""
+
+    help = (
+        "Создаёт пользователей, рецепты с ингредиентами, избранное, "
+        "корзины и подписки пачками. Популярность рецептов и авторов "
+        "распределена неравномерно, как в живых данных; при одинаковом "
+        "--seed результат воспроизводится."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument(
+            "--ingredients-per-recipe",
+            type=int,
+            default=8,
+            help="Среднее число ингредиентов в рецепте.",
+        )
+        parser.add_argument(
+            "--favorites",
+            type=int,
+            default=20,
+            help="Среднее число рецептов в избранном у пользователя.",
+        )
+        parser.add_argument(
+            "--carts",
+            type=int,
+            default=5,
+            help="Среднее число рецептов в корзине у пользователя.",
+        )
+        parser.add_argument(
+            "--subscriptions",
+            type=int,
+            default=10,
+            help="Среднее число подписок у пользователя.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--prefix",
+            default="bench",
+            help="Префикс имён создаваемых пользователей.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Удалить ранее созданных с этим префиксом пользователей "
+            "вместе с их рецептами и изображениями и не создавать новых.",
+        )
+
+    def _validate_counts(self, options):
+        for name, minimum in (
+            ("users", 1),
+            ("recipes", 1),
+            ("ingredients_per_recipe", 1),
+            ("batch_size", 1),
+            ("favorites", 0),
+            ("carts", 0),
+            ("subscriptions", 0),
+        ):
+            if options[name] < minimum:
+                option = name.replace("_", "-")
+                raise CommandError(
+                    f"--{option} должно быть не меньше {minimum}."
+                )
+
+    def _get_generated_users(self, prefix):
+        return User.objects.filter(
+            username__startswith=prefix, email__endswith=f"@{EMAIL_DOMAIN}"
+        )
+
+    def _skewed_weights(self, count):
+        """Веса по закону Ципфа: несколько популярных и длинный хвост."""
+        weights = [1 / (rank + 1) for rank in range(count)]
+        self.rng.shuffle(weights)
+        return list(itertools.accumulate(weights))
+
+    def _sample(self, population, cum_weights, mean):
+        count = self.rng.randint(0, 2 * mean)
+        return set(
+            self.rng.choices(population, cum_weights=cum_weights, k=count)
+        )
+
+    def _save_images(self, count):
+        storage = Recipe._meta.get_field("image").storage
+        names = []
+        for index in range(count):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new("RGB", (640, 480), color).save(buffer, "JPEG")
+            names.append(
+                storage.save(
+                    f"recipes/images/bench_{index}.jpg",
+                    ContentFile(buffer.getvalue()),
+                )
+            )
+        return names
+
+    def _clear(self, prefix):
+        """Удаляет пользователей с префиксом, их рецепты и изображения.
+
+        Изображения и их варианты удаляются, только если на них больше
+        не ссылаются другие рецепты.
+        """
+        images = list(
+            Recipe.objects.filter(
+                author__in=self._get_generated_users(prefix)
+            )
+            .values_list("image", "image_variants")
+            .distinct()
+        )
+        # Списки покупок и счётчики пересчитываются после удаления.
+        with paused_sync():
+            deleted, _ = self._get_generated_users(prefix).delete()
+        storage = Recipe._meta.get_field("image").storage
+        for name, variants in images:
+            delete_variants(Recipe, "image", variants)
+            if name and not Recipe.objects.filter(image=name).exists():
+                storage.delete(name)
+        return deleted
+
+    def _create_users(self, prefix, count, batch_size):
+        password = make_password(PASSWORD)
+        users = (
+            User(
+                username=f"{prefix}{index}",
+                email=f"{prefix}{index}@{EMAIL_DOMAIN}",
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password=password,
+            )
+            for index in range(count)
+        )
+        user_ids = []
+        for batch in iter_batches(users, batch_size):
+            user_ids += [user.pk for user in User.objects.bulk_create(batch)]
+        return user_ids
+
+    def _create_recipes(self, author_ids, count, mean, batch_size):
+        ingredients = list(Ingredient.objects.values_list("pk", "name"))
+        # Каждое изображение достаётся хотя бы одному рецепту, иначе
+        # --clear не нашёл бы его.
+        images = self._save_images(min(IMAGE_COUNT, count))
+        author_weights = self._skewed_weights(len(author_ids))
+        recipe_ids = []
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            contents = [
+                self.rng.sample(
+                    ingredients,
+                    min(
+                        len(ingredients),
+                        self.rng.randint(max(1, mean - 4), mean + 4),
+                    ),
+                )
+                for _ in range(size)
+            ]
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=self.rng.choices(
+                        author_ids, cum_weights=author_weights
+                    )[0],
+                    name=f"{self.rng.choice(DISHES)} «{content[0][1]}»",
+                    text=(
+                        "Смешайте "
+                        + ", ".join(name for _, name in content)
+                        + " и готовьте до готовности."
+                    ),
+                    cooking_time=self.rng.randint(5, 180),
+                    image=images[(offset + index) % len(images)],
+                )
+                for index, content in enumerate(contents)
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500),
+                )
+                for recipe, content in zip(recipes, contents)
+                for ingredient_id, _ in content
+            )
+            recipe_ids += [recipe.pk for recipe in recipes]
+        # Даты публикации разносятся на год назад от текущего момента.
+        Recipe.objects.filter(author_id__in=author_ids).update(
+            pub_date=RawSQL(
+                "now() - (id * 7919 %% 525600) * interval '1 minute'", ()
+            )
+        )
+        return recipe_ids
+
+    def _create_relations(self, model, field, user_ids, targets, mean, size):
+        """Связи пользователей с рецептами или авторами."""
+        cum_weights = self._skewed_weights(len(targets))
+        relations = (
+            model(user_id=user_id, **{f"{field}_id": target})
+            for user_id in user_ids
+            for target in self._sample(targets, cum_weights, mean)
+            # Подписка на самого себя запрещена ограничением модели.
+            if not (model is Subscription and target == user_id)
+        )
+        created = 0
+        for batch in iter_batches(relations, size):
+            created += len(model.objects.bulk_create(batch))
+        return created
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        prefix = options["prefix"]
+        batch_size = options["batch_size"]
+
+        if options["clear"]:
+            deleted = self._clear(prefix)
+        else:
+            self._validate_counts(options)
+            if self._get_generated_users(prefix).exists():
+                raise CommandError(
+                    f"Пользователи с префиксом {prefix} уже есть. "
+                    "Удалите их через --clear или задайте --prefix."
+                )
+            if not Ingredient.objects.exists():
+                call_command("load_ingredients", DATA_FILE_PATH)
+            if not Ingredient.objects.exists():
+                raise CommandError("Нет ингредиентов для рецептов.")
+
+            user_ids = self._create_users(prefix, options["users"], batch_size)
+            recipe_ids = self._create_recipes(
+                user_ids,
+                options["recipes"],
+                options["ingredients_per_recipe"],
+                batch_size,
+            )
+            self.stdout.write(
+                f"Пользователей: {len(user_ids)}, рецептов: "
+                f"{len(recipe_ids)}."
+            )
+            for model, field, targets, mean in (
+                (Favorite, "recipe", recipe_ids, options["favorites"]),
+                (ShoppingCart, "recipe", recipe_ids, options["carts"]),
+                (Subscription, "author", user_ids, options["subscriptions"]),
+            ):
+                created = self._create_relations(
+                    model, field, user_ids, targets, mean, batch_size
+                )
+                self.stdout.write(
+                    f"{model._meta.verbose_name_plural}: {created}."
+                )
+
+        for command in (
+            "reconcile_counters",
+            "rebuild_shopping_lists",
+            "update_search_vectors",
+        ):
+            call_command(command, stdout=self.stdout)
+        for model in (Recipe, User):
+            invalidate_table_count(model)
+        for tag in ("recipes", "users"):
+            response_cache.invalidate(tag)
+        if options["clear"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"Удалено объектов: {deleted}.")
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Данные созданы. Пароль пользователей: {PASSWORD}."
+                )
+            )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe, ShortLink
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    """Команда для создания коротких ссылок на существующие рецепты."""
+
+    help = "Создаёт короткие ссылки для всех рецептов, у которых их нет."
+
+    def handle(self, *args, **options):
+        created = 0
+        batch = []
+        recipe_ids = (
+            Recipe.objects.filter(short_link__isnull=True)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        for recipe_id in recipe_ids.iterator(chunk_size=BATCH_SIZE):
+            batch.append(recipe_id)
+            if len(batch) >= BATCH_SIZE:
+                created += len(ShortLink.objects.generate(batch))
+                batch = []
+        if batch:
+            created += len(ShortLink.objects.generate(batch))
+        self.stdout.write(
+            self.style.SUCCESS(f"Создано коротких ссылок: {created}.")
+        )
@@ -0,0 +1,213 @@
+import json
+import zipfile
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils.dateparse import parse_datetime
+
+from api.cache import response_cache
+from api.pagination import invalidate_table_count
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import User
+
+from .export_recipes import (
+    AUTHOR_FIELDS,
+    MEDIA_DIR,
+    RECIPES_FILE,
+    iter_batches,
+)
+from .reconcile_counters import count_subquery
+
+
+class Command(BaseCommand):
+    """Команда для загрузки рецептов из архива export_recipes."""
+
+    help = (
+        "Загружает рецепты из архива export_recipes пачками, каждая "
+        "в своей транзакции. Ингредиенты сопоставляются по названию и "
+        "единице измерения, авторы — по email; недостающие создаются. "
+        "Рецепты, которые уже есть у автора с тем же названием, "
+        "пропускаются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к архиву.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Количество рецептов в одной транзакции.",
+        )
+
+    def _load_ingredients(self):
+        return {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                "pk", "name", "measurement_unit"
+            )
+        }
+
+    def _resolve_ingredients(self, batch):
+        missing = {
+            (item["name"], item["measurement_unit"])
+            for recipe in batch
+            for item in recipe["ingredients"]
+        } - self.ingredients.keys()
+        if missing:
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in missing
+                ],
+                ignore_conflicts=True,
+            )
+            self.ingredients = self._load_ingredients()
+
+    def _resolve_authors(self, batch):
+        authors = {
+            recipe["author"]["email"]: recipe["author"] for recipe in batch
+        }
+        existing = dict(
+            User.objects.filter(email__in=authors).values_list("email", "pk")
+        )
+        new_users = []
+        for email, author in authors.items():
+            if email not in existing:
+                user = User(
+                    **{field: author[field] for field in AUTHOR_FIELDS}
+                )
+                user.set_unusable_password()
+                new_users.append(user)
+        for user in User.objects.bulk_create(new_users):
+            existing[user.email] = user.pk
+        return existing
+
+    def _save_image(self, archive, name):
+        if name not in self.images:
+            try:
+                with archive.open(MEDIA_DIR + name) as source:
+                    self.images[name] = self.storage.save(
+                        name, File(source, name)
+                    )
+            except KeyError:
+                raise CommandError(f"В архиве нет изображения {name}.")
+            self.batch_images.append(name)
+        return self.images[name]
+
+    def _import_batch(self, archive, batch):
+        """Загружает пачку в транзакции.
+
+        Изображения записываются до фиксации, поэтому при ошибке файлы,
+        сохранённые для пачки, удаляются, если на них не ссылаются
+        другие рецепты.
+        """
+        self.batch_images = []
+        try:
+            with transaction.atomic():
+                return self._create_recipes(archive, batch)
+        except BaseException:
+            for name in self.batch_images:
+                stored = self.images.pop(name)
+                if not Recipe.objects.filter(image=stored).exists():
+                    self.storage.delete(stored)
+            raise
+
+    def _create_recipes(self, archive, batch):
+        self._resolve_ingredients(batch)
+        authors = self._resolve_authors(batch)
+        existing = set(
+            Recipe.objects.filter(
+                author_id__in=authors.values(),
+                name__in={recipe["name"] for recipe in batch},
+            ).values_list("author_id", "name")
+        )
+        new_recipes = []
+        for data in batch:
+            key = (authors[data["author"]["email"]], data["name"])
+            if key in existing:
+                continue
+            existing.add(key)
+            new_recipes.append(
+                (
+                    Recipe(
+                        author_id=key[0],
+                        name=data["name"],
+                        text=data["text"],
+                        cooking_time=data["cooking_time"],
+                        image=self._save_image(archive, data["image"]),
+                    ),
+                    data,
+                )
+            )
+        if not new_recipes:
+            return 0
+
+        recipes = Recipe.objects.bulk_create(
+            [recipe for recipe, _ in new_recipes]
+        )
+        recipe_ids = [recipe.pk for recipe in recipes]
+        queryset = Recipe.objects.filter(pk__in=recipe_ids)
+        # auto_now_add при вставке подставляет текущее время.
+        queryset.update(
+            pub_date=Case(
+                *(
+                    When(
+                        pk=recipe.pk,
+                        then=Value(parse_datetime(data["pub_date"])),
+                    )
+                    for recipe, data in new_recipes
+                ),
+                output_field=DateTimeField(),
+            )
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=self.ingredients[
+                    (item["name"], item["measurement_unit"])
+                ],
+                amount=item["amount"],
+            )
+            for recipe, data in new_recipes
+            for item in data["ingredients"]
+        )
+        queryset.update_search_vector()
+        User.objects.filter(
+            pk__in={recipe.author_id for recipe in recipes}
+        ).update(recipes_count=count_subquery(Recipe, "author"))
+        return len(recipes)
+
+    def handle(self, *args, **options):
+        self.ingredients = self._load_ingredients()
+        self.storage = Recipe._meta.get_field("image").storage
+        self.images = {}
+        imported = total = 0
+        try:
+            with zipfile.ZipFile(options["path"]) as archive, archive.open(
+                RECIPES_FILE
+            ) as file:
+                lines = (json.loads(line) for line in file if line.strip())
+                for batch in iter_batches(lines, options["batch_size"]):
+                    total += len(batch)
+                    imported += self._import_batch(archive, batch)
+        except FileNotFoundError:
+            raise CommandError(f"Файл не найден: {options['path']}")
+        except (zipfile.BadZipFile, KeyError, json.JSONDecodeError) as error:
+            raise CommandError(f"Некорректный архив: {error}")
+        except IntegrityError as error:
+            raise CommandError(f"Не удалось загрузить пачку: {error}")
+        finally:
+            if imported:
+                invalidate_table_count(Recipe)
+                for tag in ("ingredients", "recipes", "users"):
+                    response_cache.invalidate(tag)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Загружено рецептов: {imported}, пропущено: "
+                f"{total - imported}. Уменьшенные копии изображений "
+                "создаёт команда generate_image_variants."
+            )
+        )
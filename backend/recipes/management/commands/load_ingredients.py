@@ -1,75 +1,179 @@
+import csv
 import json
 import os
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 
+from api.cache import response_cache
 from recipes.models import Ingredient
 
-DATA_FILE_PATH = os.path.join(settings.BASE_DIR, "data", "ingredients.json")
+DATA_FILE_PATH = os.path.join(settings.BASE_DIR, "data", "ingredients.csv")
+FORMATS = ("csv", "json", "jsonl")
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Строки CSV вида «название,единица», заголовок пропускается."""
+    for index, row in enumerate(csv.reader(file)):
+        if index == 0 and row == ["name", "measurement_unit"]:
+            continue
+        yield row[:2] if len(row) >= 2 else None
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json(file):
+    """Элементы JSON-массива, прочитанные из файла по частям."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("Ожидается JSON-массив.")
+    position, eof = 1, False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if buffer.startswith("]", position):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        # Значение в конце буфера может оказаться обрезанным.
+        if end is None or (end == len(buffer) and not eof):
+            chunk = file.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+READERS = {"csv": read_csv, "json": read_json, "jsonl": read_jsonl}
+
+
+def clean_item(item):
+    """Возвращает (название, единица) или None для некорректной записи."""
+    if isinstance(item, dict):
+        item = (item.get("name"), item.get("measurement_unit"))
+    if (
+        not isinstance(item, (list, tuple))
+        or len(item) != 2
+        or not all(isinstance(value, str) for value in item)
+    ):
+        return None
+    row = tuple(value.strip() for value in item)
+    for value, field in zip(row, ("name", "measurement_unit")):
+        if not 0 < len(value) <= Ingredient._meta.get_field(field).max_length:
+            return None
+    return row
+
+
+def insert_ingredients(rows):
+    """Добавляет ингредиенты, которых ещё нет, и возвращает их число.
+
+    Пачка передаётся двумя массивами одним запросом INSERT ... SELECT
+    FROM unnest, конфликты с unique_ingredient_unit пропускаются.
+    """
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (name, measurement_unit, updated_at) "
+            "SELECT name, measurement_unit, now() "
+            "FROM unnest(%s::text[], %s::text[]) "
+            "AS batch (name, measurement_unit) "
+            "ON CONFLICT ON CONSTRAINT unique_ingredient_unit DO NOTHING",
+            [[row[0] for row in rows], [row[1] for row in rows]],
+        )
+        return cursor.rowcount
 
 
 class Command(BaseCommand):
-    """Команда для загрузки ингредиентов из JSON файла."""
+    """Команда для загрузки ингредиентов из CSV, JSON или JSONL."""
 
-    help = f"Loads ingredients from {DATA_FILE_PATH}"
+    help = (
+        "Загружает ингредиенты из файла потоково, пачками. Уже "
+        "существующие ингредиенты пропускаются, поэтому команду можно "
+        "запускать повторно."
+    )
 
-    def handle(self, *args, **options):
-        """Обрабатывает загрузку ингредиентов."""
-        if not Ingredient.objects.exists():
-            self.stdout.write(
-                self.style.WARNING(
-                    "База ингредиентов пуста. Загружаем данные..."
-                )
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=DATA_FILE_PATH,
+            help=f"Файл с ингредиентами, по умолчанию {DATA_FILE_PATH}.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Формат файла, по умолчанию определяется по расширению.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Количество строк в одном запросе.",
+        )
+
+    def _get_format(self, path, file_format):
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f"Неизвестный формат файла: {path}. Укажите --format."
             )
-            try:
-                with open(DATA_FILE_PATH, "r", encoding="utf-8") as file:
-                    ingredients_data = json.load(file)
-
-                ingredients_to_create = []
-                for item in ingredients_data:
-                    name = item.get("name")
-                    measurement_unit = item.get("measurement_unit")
-                    if name and measurement_unit:
-                        ingredients_to_create.append(
-                            Ingredient(
-                                name=name.strip(),
-                                measurement_unit=measurement_unit.strip(),
-                            )
-                        )
-                    else:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f"Пропущен ингредиент с неполными данными:"
-                                f"{item}"
+        return file_format
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        batch_size = options["batch_size"]
+        read = READERS[self._get_format(path, options["format"])]
+        inserted = existing = skipped = 0
+        batch = {}
+
+        def flush():
+            nonlocal inserted, existing
+            created = insert_ingredients(list(batch))
+            inserted += created
+            existing += len(batch) - created
+            batch.clear()
+
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as file:
+                for item in read(file):
+                    row = clean_item(item)
+                    if row is None or row in batch:
+                        skipped += 1
+                        if options["verbosity"] > 1:
+                            self.stdout.write(
+                                self.style.WARNING(f"Пропущена запись: {item}")
                             )
-                        )
-
-                Ingredient.objects.bulk_create(ingredients_to_create)
-
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Успешно. Ингредиентов: {len(ingredients_to_create)}."
-                    )
-                )
-
-            except FileNotFoundError:
-                self.stdout.write(
-                    self.style.ERROR(f"Файл не найден: {DATA_FILE_PATH}")
-                )
-            except json.JSONDecodeError:
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"Ошибка декодирования JSON файла: {DATA_FILE_PATH}"
-                    )
-                )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"Произошла ошибка при загрузке: {e}")
-                )
-        else:
-            self.stdout.write(
-                self.style.WARNING(
-                    "В базе уже есть ингредиенты. Загрузка не требуется."
-                )
+                        continue
+                    batch[row] = None
+                    if len(batch) >= batch_size:
+                        flush()
+                if batch:
+                    flush()
+        except FileNotFoundError:
+            raise CommandError(f"Файл не найден: {path}")
+        except (json.JSONDecodeError, csv.Error, UnicodeDecodeError) as error:
+            raise CommandError(f"Ошибка чтения файла {path}: {error}")
+        finally:
+            if inserted:
+                response_cache.invalidate("ingredients")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Добавлено: {inserted}, уже были в базе: {existing}, "
+                f"пропущено: {skipped}."
             )
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Команда для пересчёта агрегированных списков покупок."""
+
+    help = (
+        "Пересчитывает таблицу ShoppingListItem по содержимому корзин "
+        "всех или указанных пользователей."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="emails",
+            default=[],
+            help="Email пользователя (можно указать несколько раз).",
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options["emails"]:
+            users = User.objects.filter(email__in=options["emails"])
+
+        with transaction.atomic():
+            created = ShoppingListItem.objects.rebuild(users=users)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Списки покупок пересчитаны. Позиций: {created}."
+            )
+        )
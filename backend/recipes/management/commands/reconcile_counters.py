@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.cache import response_cache
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+def count_subquery(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на OuterRef."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    """Команда для сверки денормализованных счётчиков."""
+
+    help = (
+        "Пересчитывает favorites_count и in_carts_count у рецептов, "
+        "recipes_count и followers_count у пользователей."
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        # update() не обновляет auto_now, а от updated_at зависят ETag.
+        now = timezone.now()
+        recipes = Recipe.objects.update(
+            favorites_count=count_subquery(Favorite, "recipe"),
+            in_carts_count=count_subquery(ShoppingCart, "recipe"),
+            updated_at=now,
+        )
+        users = User.objects.update(
+            recipes_count=count_subquery(Recipe, "author"),
+            followers_count=count_subquery(Subscription, "author"),
+            updated_at=now,
+        )
+        response_cache.invalidate("recipes", "users")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Счётчики пересчитаны. Рецептов: {recipes}, "
+                f"пользователей: {users}."
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Команда для пересчёта поисковых векторов рецептов."""
+
+    help = (
+        "Пересчитывает search_vector всех рецептов, например после "
+        "переименования ингредиентов."
+    )
+
+    def handle(self, *args, **options):
+        updated = Recipe.objects.update_search_vector()
+        self.stdout.write(
+            self.style.SUCCESS(f"Поисковые векторы обновлены: {updated}.")
+        )
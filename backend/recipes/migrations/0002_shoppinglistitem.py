@@ -0,0 +1,92 @@
+# Generated by Django 5.2 on 2026-10-17 06:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def build_shopping_lists(apps, schema_editor):
+    IngredientInRecipe = apps.get_model("recipes", "IngredientInRecipe")
+    ShoppingListItem = apps.get_model("recipes", "ShoppingListItem")
+    totals = (
+        IngredientInRecipe.objects.filter(
+            recipe__in_shopping_cart_of__isnull=False
+        )
+        .values("recipe__in_shopping_cart_of__user", "ingredient")
+        .annotate(total_amount=Sum("amount"))
+        .order_by()
+    )
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=total["recipe__in_shopping_cart_of__user"],
+                ingredient_id=total["ingredient"],
+                total_amount=total["total_amount"],
+            )
+            for total in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShoppingListItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "total_amount",
+                    models.PositiveIntegerField(
+                        verbose_name="Общее количество"
+                    ),
+                ),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shopping_list_items",
+                        to="recipes.ingredient",
+                        verbose_name="Ингредиент",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shopping_list_items",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Позиция списка покупок",
+                "verbose_name_plural": "Позиции списка покупок",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "ingredient"),
+                        name="unique_user_shopping_list_ingredient",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            build_shopping_lists, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-17 06:55
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_search_vectors(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    IngredientInRecipe = apps.get_model("recipes", "IngredientInRecipe")
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(recipe=OuterRef("pk"))
+        .values("recipe")
+        .annotate(names=StringAgg("ingredient__name", delimiter=" "))
+        .values("names")
+    )
+    Recipe.objects.update(
+        search_vector=(
+            SearchVector("name", weight="A", config=config)
+            + SearchVector(
+                Coalesce(
+                    ingredient_names, Value(""), output_field=TextField()
+                ),
+                weight="B",
+                config=config,
+            )
+            + SearchVector("text", weight="C", config=config)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0002_shoppinglistitem"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name="Поисковый вектор"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="recipe_search_vector_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="recipe_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.RunPython(
+            fill_search_vectors, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 06:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0003_recipe_search_vector"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["name", "id"], name="recipe_name_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["cooking_time", "id"],
+                name="recipe_cooking_time_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-17 07:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Favorite = apps.get_model("recipes", "Favorite")
+    ShoppingCart = apps.get_model("recipes", "ShoppingCart")
+    Recipe.objects.update(
+        favorites_count=count_subquery(Favorite, "recipe"),
+        in_carts_count=count_subquery(ShoppingCart, "recipe"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_recipe_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В избранном (раз)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="in_carts_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="В списках покупок (раз)",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["favorites_count", "id"],
+                name="recipe_favorites_count_id_idx",
+            ),
+        ),
+        migrations.RunPython(
+            fill_counters, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_recipe_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата изменения",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата изменения",
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0008_recipe_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ingredient",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Дата изменения"
+            ),
+        ),
+    ]
@@ -1,11 +1,21 @@
+import hashlib
+
 from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, TextField, Value
+from django.db.models.functions import Coalesce, Greatest
 
 MIN_INGREDIENT_AMOUNT = 1
 MAX_INGREDIENT_AMOUNT = 32000
 MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 32000
+BASE62_ALPHABET = (
+    "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+)
 
 
 class Ingredient(models.Model):
@@ -21,6 +31,9 @@ class Ingredient(models.Model):
         max_length=64,
         help_text="Введите единицу измерения",
     )
+    updated_at = models.DateTimeField(
+        "Дата изменения", auto_now=True, db_index=True
+    )
 
     class Meta:
         verbose_name = "Ингредиент"
@@ -37,6 +50,34 @@ class Ingredient(models.Model):
         return f"{self.name}, {self.measurement_unit}"
 
 
+class RecipeQuerySet(models.QuerySet):
+    def update_search_vector(self):
+        """Пересчитывает поисковый вектор по названию, ингредиентам и тексту.
+
+        Вес A — название, B — названия ингредиентов, C — описание.
+        """
+        config = settings.RECIPE_SEARCH_CONFIG
+        ingredient_names = Subquery(
+            IngredientInRecipe.objects.filter(recipe=OuterRef("pk"))
+            .values("recipe")
+            .annotate(names=StringAgg("ingredient__name", delimiter=" "))
+            .values("names")
+        )
+        return self.update(
+            search_vector=(
+                SearchVector("name", weight="A", config=config)
+                + SearchVector(
+                    Coalesce(
+                        ingredient_names, Value(""), output_field=TextField()
+                    ),
+                    weight="B",
+                    config=config,
+                )
+                + SearchVector("text", weight="C", config=config)
+            )
+        )
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
 
@@ -57,6 +98,9 @@ class Recipe(models.Model):
         upload_to="recipes/images/",
         help_text="Загрузите изображение рецепта",
     )
+    image_variants = models.JSONField(
+        "Варианты изображения", default=dict, blank=True, editable=False
+    )
     text = models.TextField(
         "Описание рецепта", help_text="Введите описание рецепта"
     )
@@ -82,11 +126,44 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         "Дата публикации", auto_now_add=True, db_index=True
     )
+    updated_at = models.DateTimeField(
+        "Дата изменения", auto_now=True, db_index=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        "В избранном (раз)", default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        "В списках покупок (раз)", default=0, editable=False
+    )
+    search_vector = SearchVectorField(
+        "Поисковый вектор", null=True, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=["name", "id"], name="recipe_name_id_idx"),
+            models.Index(
+                fields=["favorites_count", "id"],
+                name="recipe_favorites_count_id_idx",
+            ),
+            models.Index(
+                fields=["cooking_time", "id"],
+                name="recipe_cooking_time_id_idx",
+            ),
+            GinIndex(
+                fields=["search_vector"], name="recipe_search_vector_idx"
+            ),
+            GinIndex(
+                fields=["name"],
+                opclasses=["gin_trgm_ops"],
+                name="recipe_name_trgm_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} (автор: {self.author.username})"
@@ -194,3 +271,270 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'"{self.recipe.name}" в списке покупок у {self.user.username}'
+
+
+class ShoppingListItemManager(models.Manager):
+    """Менеджер агрегированного списка покупок.
+
+    Все изменения применяются инкрементально через F()-выражения,
+    поэтому список не пересчитывается целиком при каждом изменении
+    корзины или состава рецепта. Изменения ShoppingCart и
+    IngredientInRecipe применяются сигналами из api.signals.
+    """
+
+    def apply_amounts(self, user_ids, amounts):
+        """Прибавляет к спискам пользователей {ingredient_id: delta}.
+
+        Строки с нулевым или отрицательным итогом удаляются.
+        """
+        amounts = {
+            ingredient_id: delta
+            for ingredient_id, delta in amounts.items()
+            if delta
+        }
+        if not amounts:
+            return
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+
+        # Для уменьшения строки не создаются: отсутствующая строка
+        # с отрицательным итогом всё равно была бы удалена.
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=0,
+                )
+                for user_id in user_ids
+                for ingredient_id, delta in amounts.items()
+                if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        ingredients_by_delta = {}
+        for ingredient_id, delta in amounts.items():
+            ingredients_by_delta.setdefault(delta, []).append(ingredient_id)
+        for delta, ingredient_ids in ingredients_by_delta.items():
+            self.filter(
+                user_id__in=user_ids, ingredient_id__in=ingredient_ids
+            ).update(total_amount=Greatest(F("total_amount") + delta, 0))
+        self.filter(
+            user_id__in=user_ids,
+            ingredient_id__in=amounts,
+            total_amount__lte=0,
+        ).delete()
+
+    def recipe_amounts(self, recipe_id, sign=1):
+        """Количества ингредиентов рецепта {ingredient_id: amount}."""
+        return {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in IngredientInRecipe.objects.filter(
+                recipe_id=recipe_id
+            ).values_list("ingredient_id", "amount")
+        }
+
+    def add_recipe(self, user_id, recipe_id):
+        """Учитывает рецепт, добавленный в список покупок пользователя."""
+        self.apply_amounts([user_id], self.recipe_amounts(recipe_id))
+
+    def remove_recipe(self, user_id, recipe_id):
+        """Учитывает рецепт, удалённый из списка покупок пользователя."""
+        self.apply_amounts([user_id], self.recipe_amounts(recipe_id, -1))
+
+    def apply_recipe_amounts(self, recipe_id, amounts):
+        """Прибавляет {ingredient_id: delta} к спискам всех пользователей,
+        у кого рецепт в списке покупок."""
+        self.apply_amounts(
+            ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+                "user_id", flat=True
+            ),
+            amounts,
+        )
+
+    def remove_recipe_for_all(self, recipe_id):
+        """Убирает рецепт из списков всех пользователей, у кого он есть."""
+        self.apply_recipe_amounts(
+            recipe_id, self.recipe_amounts(recipe_id, -1)
+        )
+
+    def rebuild(self, users=None):
+        """Полностью пересчитывает списки покупок по корзинам."""
+        items = self.all()
+        # Суммы считаются по строкам корзины: на каждую пару (корзина,
+        # ингредиент рецепта) приходится ровно одна строка соединения.
+        carts = ShoppingCart.objects.all()
+        if users is not None:
+            items = items.filter(user__in=users)
+            carts = carts.filter(user__in=users)
+        items.delete()
+        totals = (
+            carts.values(
+                "user", ingredient=F("recipe__recipe_ingredients__ingredient")
+            )
+            .annotate(total_amount=Sum("recipe__recipe_ingredients__amount"))
+            .order_by()
+        )
+        created = self.bulk_create(
+            (
+                self.model(
+                    user_id=total["user"],
+                    ingredient_id=total["ingredient"],
+                    total_amount=total["total_amount"],
+                )
+                for total in totals.iterator()
+                # Рецепт без ингредиентов даёт строку с NULL.
+                if total["ingredient"] is not None
+            ),
+            batch_size=1000,
+        )
+        return len(created)
+
+
+class ShoppingListItem(models.Model):
+    """Агрегированный список покупок пользователя.
+
+    Хранит суммарное количество каждого ингредиента по всем рецептам
+    из списка покупок, чтобы выгрузка не пересчитывала сумму заново.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name="Ингредиент",
+    )
+    total_amount = models.PositiveIntegerField("Общее количество")
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Позиции списка покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_user_shopping_list_ingredient",
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.ingredient.name} ({self.total_amount} "
+            f"{self.ingredient.measurement_unit}) у {self.user.username}"
+        )
+
+
+def make_short_code(recipe_id, length):
+    """Детерминированный base62-код рецепта из хеша id и SECRET_KEY."""
+    digest = hashlib.sha256(
+        f"{settings.SECRET_KEY}:short-link:{recipe_id}".encode()
+    ).digest()
+    number = int.from_bytes(digest, "big")
+    code = []
+    for _ in range(length):
+        number, index = divmod(number, len(BASE62_ALPHABET))
+        code.append(BASE62_ALPHABET[index])
+    return "".join(code)
+
+
+class ShortLinkManager(models.Manager):
+    """Менеджер коротких ссылок на рецепты."""
+
+    def generate(self, recipe_ids):
+        """Создаёт короткие ссылки для рецептов, у которых их ещё нет.
+
+        Код — первые SHORT_LINK_CODE_LENGTH символов base62 от хеша id;
+        при коллизии код удлиняется на символ. Возвращает словарь
+        {id рецепта: код} созданных ссылок.
+        """
+        created = {}
+        length = settings.SHORT_LINK_CODE_LENGTH
+        # Внутри транзакции чтение идёт с primary, поэтому вставленные
+        # строки видны сразу, а не после репликации.
+        with transaction.atomic(savepoint=False):
+            recipe_ids = set(recipe_ids) - set(
+                self.filter(recipe_id__in=recipe_ids).values_list(
+                    "recipe_id", flat=True
+                )
+            )
+            while recipe_ids:
+                codes = {
+                    recipe_id: make_short_code(recipe_id, length)
+                    for recipe_id in recipe_ids
+                }
+                taken = set(
+                    self.filter(code__in=codes.values()).values_list(
+                        "code", flat=True
+                    )
+                )
+                links, seen = [], set()
+                for recipe_id, code in sorted(codes.items()):
+                    if code not in taken and code not in seen:
+                        seen.add(code)
+                        links.append(
+                            self.model(recipe_id=recipe_id, code=code)
+                        )
+                self.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+                # Строки, пропущенные из-за параллельной вставки того же
+                # кода, не появятся, и для них код удлиняется.
+                inserted = dict(
+                    self.filter(recipe_id__in=recipe_ids).values_list(
+                        "recipe_id", "code"
+                    )
+                )
+                created.update(inserted)
+                recipe_ids -= inserted.keys()
+                length += 1
+        return created
+
+    def get_code(self, recipe):
+        """Код короткой ссылки рецепта, при необходимости создаёт её."""
+        code = (
+            self.filter(recipe=recipe).values_list("code", flat=True).first()
+        )
+        if code is None:
+            # Чтение вне транзакции могло пойти на отстающую реплику:
+            # если ссылка уже есть, generate() её не вернёт, и код
+            # читается с primary.
+            with transaction.atomic():
+                code = self.generate([recipe.pk]).get(recipe.pk)
+                if code is None:
+                    code = (
+                        self.filter(recipe=recipe)
+                        .values_list("code", flat=True)
+                        .get()
+                    )
+        return code
+
+
+class ShortLink(models.Model):
+    """Короткая ссылка на рецепт со счётчиком переходов."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="short_link",
+        verbose_name="Рецепт",
+    )
+    code = models.CharField("Код", max_length=16, unique=True)
+    hits = models.PositiveBigIntegerField(
+        "Переходы", default=0, editable=False
+    )
+    created = models.DateTimeField("Дата создания", auto_now_add=True)
+
+    objects = ShortLinkManager()
+
+    class Meta:
+        verbose_name = "Короткая ссылка"
+        verbose_name_plural = "Короткие ссылки"
+
+    def __str__(self):
+        return f"{self.code} → {self.recipe.name}"
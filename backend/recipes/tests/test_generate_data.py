@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from api.images import process_image
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+
+class GenerateDataTests(TestCase):
+    """Генерация и удаление синтетических данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"ингредиент {number}", measurement_unit="г")
+            for number in range(10)
+        )
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def generate(self, *args):
+        call_command("generate_data", *args, stdout=StringIO())
+
+    def get_media_files(self):
+        return [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(self.media_root)
+            for name in names
+        ]
+
+    def test_invalid_counts(self):
+        for args in (
+            ("--users", "0"),
+            ("--recipes", "0"),
+            ("--favorites", "-1"),
+            ("--batch-size", "0"),
+        ):
+            with self.subTest(args=args):
+                with self.assertRaises(CommandError):
+                    self.generate(*args)
+        self.assertFalse(User.objects.exists())
+
+    def test_clear_deletes_images_and_variants(self):
+        self.generate("--users", "5", "--recipes", "20")
+        self.assertEqual(Recipe.objects.count(), 20)
+        recipe = Recipe.objects.first()
+        self.assertTrue(process_image(Recipe, recipe.pk, "image"))
+        self.assertTrue(self.get_media_files())
+
+        self.generate("--clear")
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.get_media_files(), [])
@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import User
+
+
+class ExportImportTests(TestCase):
+    """Рецепты, выгруженные export_recipes, загружаются import_recipes."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.path = os.path.join(self.media_root, "export.zip")
+        self.storage = Recipe._meta.get_field("image").storage
+
+        salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        milk = Ingredient.objects.create(name="молоко", measurement_unit="мл")
+        for number, (email, ingredients) in enumerate(
+            (
+                ("cook@example.com", ((salt, 5), (milk, 200))),
+                ("cook@example.com", ((salt, 10),)),
+                ("baker@example.com", ((milk, 300),)),
+            )
+        ):
+            author, _ = User.objects.get_or_create(
+                email=email,
+                defaults={
+                    "username": email.split("@")[0],
+                    "first_name": "Имя",
+                    "last_name": "Фамилия",
+                },
+            )
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f"Рецепт {number}",
+                text="Описание",
+                cooking_time=number + 1,
+                image=self.storage.save(
+                    "recipes/images/test.jpg",
+                    ContentFile(f"image {number % 2}".encode()),
+                ),
+            )
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=datetime(2025, 1, number + 1, tzinfo=timezone.utc)
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+                for ingredient, amount in ingredients
+            )
+        self.exported = self.get_recipes()
+        call_command("export_recipes", self.path, stdout=StringIO())
+
+        # Загрузка идёт в пустую базу и пустое хранилище.
+        User.objects.all().delete()
+        Ingredient.objects.all().delete()
+        shutil.rmtree(os.path.join(self.media_root, "recipes"))
+
+    def get_recipes(self):
+        """Рецепты в виде, не зависящем от первичных ключей."""
+        return sorted(
+            (
+                recipe.name,
+                recipe.text,
+                recipe.cooking_time,
+                recipe.pub_date,
+                recipe.author.email,
+                recipe.author.username,
+                recipe.author.recipes_count,
+                sorted(
+                    (
+                        item.ingredient.name,
+                        item.ingredient.measurement_unit,
+                        item.amount,
+                    )
+                    for item in recipe.recipe_ingredients.all()
+                ),
+                recipe.image.name,
+                self.storage.open(recipe.image.name).read(),
+            )
+            for recipe in Recipe.objects.select_related("author")
+        )
+
+    def load(self):
+        output = StringIO()
+        call_command(
+            "import_recipes", self.path, "--batch-size", "2", stdout=output
+        )
+        return output.getvalue()
+
+    def get_media_files(self):
+        return sorted(
+            name
+            for _, _, names in os.walk(self.media_root)
+            for name in names
+            if name != "export.zip"
+        )
+
+    def test_round_trip(self):
+        output = self.load()
+
+        self.assertIn("Загружено рецептов: 3, пропущено: 0", output)
+        self.assertEqual(self.get_recipes(), self.exported)
+        self.assertEqual(len(self.get_media_files()), 2)
+
+    def test_rerun_skips_existing(self):
+        self.load()
+
+        output = self.load()
+
+        self.assertIn("Загружено рецептов: 0, пропущено: 3", output)
+        self.assertEqual(self.get_recipes(), self.exported)
+
+    def test_failed_batch_removes_images(self):
+        with mock.patch.object(
+            IngredientInRecipe.objects,
+            "bulk_create",
+            side_effect=IntegrityError("duplicate"),
+        ):
+            with self.assertRaises(CommandError):
+                self.load()
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.get_media_files(), [])
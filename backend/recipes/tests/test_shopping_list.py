@@ -0,0 +1,163 @@
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from users.models import User
+
+
+class ShoppingListTestCase(APITestCase):
+    """Два пользователя с рецептами в списках покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = (
+            User.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                first_name=name,
+                last_name=name,
+                password="password",
+            )
+            for name in ("buyer", "other")
+        )
+        cls.salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        cls.pepper = Ingredient.objects.create(
+            name="перец", measurement_unit="г"
+        )
+        cls.soup = cls._create_recipe("Суп", {cls.salt: 10, cls.pepper: 5})
+        cls.stew = cls._create_recipe("Рагу", {cls.salt: 20})
+        cls.empty = cls._create_recipe("Пустой", {})
+        for recipe in (cls.soup, cls.stew, cls.empty):
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        ShoppingCart.objects.create(user=cls.other, recipe=cls.soup)
+
+    @classmethod
+    def _create_recipe(cls, name, amounts):
+        recipe = Recipe.objects.create(
+            author=cls.other,
+            name=name,
+            text=name,
+            cooking_time=10,
+            image="recipes/images/test.jpg",
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=a)
+            for ingredient, a in amounts.items()
+        )
+        return recipe
+
+    def get_totals(self, user):
+        return dict(
+            ShoppingListItem.objects.filter(user=user).values_list(
+                "ingredient__name", "total_amount"
+            )
+        )
+
+
+class ShoppingListRebuildTests(ShoppingListTestCase):
+    """Пересчёт агрегированных списков покупок по корзинам."""
+
+    def test_rebuild_sums_shared_ingredient_once_per_recipe(self):
+        created = ShoppingListItem.objects.rebuild()
+
+        self.assertEqual(created, 4)
+        self.assertEqual(self.get_totals(self.user), {"соль": 30, "перец": 5})
+        self.assertEqual(self.get_totals(self.other), {"соль": 10, "перец": 5})
+
+    def test_rebuild_for_selected_users(self):
+        ShoppingListItem.objects.filter(
+            user=self.other, ingredient=self.salt
+        ).update(total_amount=999)
+
+        created = ShoppingListItem.objects.rebuild(
+            users=User.objects.filter(pk=self.user.pk)
+        )
+
+        self.assertEqual(created, 2)
+        self.assertEqual(self.get_totals(self.user), {"соль": 30, "перец": 5})
+        self.assertEqual(
+            self.get_totals(self.other), {"соль": 999, "перец": 5}
+        )
+
+
+class ShoppingListSyncTests(ShoppingListTestCase):
+    """Инкрементальное обновление списков при изменении корзин и рецептов."""
+
+    def assertTotals(self, user_totals, other_totals):
+        self.assertEqual(self.get_totals(self.user), user_totals)
+        self.assertEqual(self.get_totals(self.other), other_totals)
+        ShoppingListItem.objects.rebuild()
+        self.assertEqual(self.get_totals(self.user), user_totals)
+        self.assertEqual(self.get_totals(self.other), other_totals)
+
+    def test_cart_rows_added(self):
+        self.assertTotals({"соль": 30, "перец": 5}, {"соль": 10, "перец": 5})
+
+    def test_add_and_remove_recipe(self):
+        ShoppingListItem.objects.add_recipe(self.other.pk, self.stew.pk)
+        self.assertEqual(self.get_totals(self.other), {"соль": 30, "перец": 5})
+
+        ShoppingListItem.objects.remove_recipe(self.other.pk, self.soup.pk)
+        self.assertEqual(self.get_totals(self.other), {"соль": 20})
+
+        ShoppingListItem.objects.remove_recipe(self.other.pk, self.stew.pk)
+        self.assertEqual(self.get_totals(self.other), {})
+
+    def test_cart_rows_deleted(self):
+        ShoppingCart.objects.filter(user=self.user, recipe=self.soup).delete()
+
+        self.assertTotals({"соль": 20}, {"соль": 10, "перец": 5})
+
+    def test_cart_row_changed(self):
+        cart = ShoppingCart.objects.get(user=self.other, recipe=self.soup)
+        cart.recipe = self.stew
+        cart.save()
+
+        self.assertTotals({"соль": 30, "перец": 5}, {"соль": 20})
+
+    def test_recipe_deleted(self):
+        self.soup.delete()
+
+        self.assertTotals({"соль": 20}, {})
+
+    def test_author_deleted(self):
+        self.other.delete()
+
+        self.assertEqual(self.get_totals(self.user), {})
+
+    def test_recipe_ingredients_edited(self):
+        row = IngredientInRecipe.objects.get(
+            recipe=self.soup, ingredient=self.salt
+        )
+        row.amount = 15
+        row.save()
+        IngredientInRecipe.objects.filter(
+            recipe=self.soup, ingredient=self.pepper
+        ).delete()
+        IngredientInRecipe.objects.create(
+            recipe=self.stew, ingredient=self.pepper, amount=3
+        )
+
+        self.assertTotals({"соль": 35, "перец": 3}, {"соль": 15})
+
+    def test_ingredient_deleted(self):
+        self.pepper.delete()
+
+        self.assertTotals({"соль": 30}, {"соль": 10})
+
+    def test_recipe_update_applies_ingredient_delta(self):
+        self.client.force_authenticate(self.other)
+
+        response = self.client.patch(
+            f"/api/recipes/{self.soup.pk}/",
+            {"ingredients": [{"id": self.salt.pk, "amount": 12}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTotals({"соль": 32}, {"соль": 12})
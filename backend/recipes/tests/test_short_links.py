@@ -0,0 +1,83 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+
+from recipes.models import Recipe, ShortLink, make_short_code
+from users.models import User
+
+
+def colliding_code(recipe_id, length):
+    """Один и тот же код базовой длины для всех рецептов."""
+    if length == 6:
+        return "aaaaaa"
+    return make_short_code(recipe_id, length)
+
+
+@override_settings(SHORT_LINK_CODE_LENGTH=6)
+class ShortLinkGenerateTests(TestCase):
+    """Создание коротких ссылок с коллизиями кодов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="author@example.com",
+            username="author",
+            first_name="author",
+            last_name="author",
+            password="password",
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author,
+                name=f"Рецепт {number}",
+                text="Описание",
+                cooking_time=10,
+                image="recipes/images/test.jpg",
+            )
+            for number in range(3)
+        ]
+
+    @mock.patch("recipes.models.make_short_code", colliding_code)
+    def test_collisions_get_longer_codes(self):
+        ids = [recipe.pk for recipe in self.recipes]
+
+        created = ShortLink.objects.generate(ids)
+
+        self.assertEqual(created.keys(), set(ids))
+        self.assertEqual(
+            created,
+            dict(ShortLink.objects.values_list("recipe_id", "code")),
+        )
+        self.assertEqual(len(set(created.values())), 3)
+        self.assertEqual(sorted(map(len, created.values())), [6, 7, 7])
+
+    @mock.patch("recipes.models.make_short_code", colliding_code)
+    def test_code_taken_by_other_recipe(self):
+        first, second = self.recipes[:2]
+        ShortLink.objects.create(recipe=first, code="aaaaaa")
+
+        code = ShortLink.objects.get_code(second)
+
+        self.assertEqual(code, make_short_code(second.pk, 7))
+        self.assertEqual(ShortLink.objects.get(recipe=second).code, code)
+
+    def test_get_code_when_replica_lags(self):
+        recipe = self.recipes[0]
+        code = ShortLink.objects.get_code(recipe)
+
+        # Реплика ещё не получила ссылку, созданную на primary.
+        with mock.patch.object(QuerySet, "first", return_value=None):
+            self.assertEqual(ShortLink.objects.get_code(recipe), code)
+        self.assertEqual(ShortLink.objects.count(), 1)
+
+    def test_existing_links_are_not_counted(self):
+        ShortLink.objects.generate([self.recipes[0].pk])
+        out = StringIO()
+
+        call_command("generate_short_links", stdout=out)
+
+        self.assertIn("Создано коротких ссылок: 2.", out.getvalue())
+        self.assertEqual(ShortLink.objects.count(), 3)
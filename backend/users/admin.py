@@ -16,11 +16,16 @@ class UserAdmin(BaseUserAdmin):
         "last_name",
         "is_staff",
         "is_active",
+        "recipes_count",
+        "followers_count",
     )
     search_fields = ("email", "username", "first_name", "last_name")
     list_filter = ("is_staff", "is_active", "date_joined")
 
-    fieldsets = BaseUserAdmin.fieldsets + ((None, {"fields": ("avatar",)}),)
+    fieldsets = BaseUserAdmin.fieldsets + (
+        (None, {"fields": ("avatar", "recipes_count", "followers_count")}),
+    )
+    readonly_fields = ("recipes_count", "followers_count")
     add_fieldsets = BaseUserAdmin.add_fieldsets + (
         (None, {"fields": ("first_name", "last_name", "email", "avatar")}),
     )
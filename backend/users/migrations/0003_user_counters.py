@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-17 07:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    Recipe = apps.get_model("recipes", "Recipe")
+    Subscription = apps.get_model("users", "Subscription")
+    User.objects.update(
+        recipes_count=count_subquery(Recipe, "author"),
+        followers_count=count_subquery(Subscription, "author"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_auto_20250412_2321"),
+        ("recipes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="followers_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Количество подписчиков",
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="recipes_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество рецептов"
+            ),
+        ),
+        migrations.RunPython(
+            fill_counters, reverse_code=migrations.RunPython.noop
+        ),
+    ]
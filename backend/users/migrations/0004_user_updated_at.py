@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_user_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="relations_updated_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Дата изменения избранного, покупок и подписок",
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата изменения",
+            ),
+            preserve_default=False,
+        ),
+    ]
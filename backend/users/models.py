@@ -47,6 +47,22 @@ class User(AbstractUser):
         null=True,
         help_text="Загрузите ваш аватар",
     )
+    avatar_variants = models.JSONField(
+        "Варианты аватара", default=dict, blank=True, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        "Количество рецептов", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        "Количество подписчиков", default=0, editable=False
+    )
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+    relations_updated_at = models.DateTimeField(
+        "Дата изменения избранного, покупок и подписок",
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Пользователь"